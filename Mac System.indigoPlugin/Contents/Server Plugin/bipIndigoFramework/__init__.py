@@ -1,5 +1,5 @@
 __author__ = 'bip-philippe'
-__version__ = '1.4.0'
+__version__ = '1.5.0'
 
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
@@ -52,5 +52,16 @@ __version__ = '1.4.0'
                  - new log of properties and states mechanism
                 Some bugs corrections, including:
                  - applescript library error filter
+    Rev 1.5.0 : Performance enhancements
+                Enhancements:
+                 - single-flight execution and short time cache of identical shell scripts
+                 - sleepNext can be woken up by an event
+                 - applescripts are compiled once and kept in a least recently used cache
+                 - optional persistent applescript host (osahost)
+                 - count of the processes started by shellscript and osascript
+                 - record and replay of the shellscript and osascript commands output (capture)
+                 - device and plugin properties updated in one call, dumps skipped if not debugging
+                 - shell scripts can run on remote hosts through persistent sessions (transport)
+                 - asyncio engine running the probes of a cycle concurrently into the shell cache (asyncengine)
 """
 ####################################################################################
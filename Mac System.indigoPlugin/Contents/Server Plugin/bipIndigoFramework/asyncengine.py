@@ -0,0 +1,134 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+""" asyncio execution engine of shell probes for Indigo plugins
+
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    The read only scripts a dialog cycle needs (probes) are started together from an event loop hosted by the
+    calling thread, at most max_concurrency at a time, each one within a deadline. Their results are put in the
+    shellscript cache, where the synchronous shellscript.run calls of the devices find them: the probes of a cycle
+    take the time of the slowest one instead of the sum of all of them.
+    A probe is a tuple (pscript, cache_ttl, cache_tag, host), with the arguments the devices give to
+    shellscript.run. Remote hosts probes run through their transport, in the default executor.
+
+    A probe that fails or runs out of its deadline is cached with its error, so that the cycle does not run it a
+    second time. The action callbacks keep the synchronous shellscript.run and osascript.run.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import asyncio
+import threading
+import time
+from bipIndigoFramework import capture, core, shellscript, transport
+
+# default bounds of the probes
+MAX_CONCURRENCY = 4
+DEADLINE = 30
+
+# event loop of each thread using the engine
+_local = threading.local()
+
+
+########################################
+def _loop():
+    """ Event loop of the calling thread, created the first time """
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _local.loop = loop
+    return loop
+
+
+########################################
+def close():
+    """ Close the event loop of the calling thread """
+    loop = getattr(_local, 'loop', None)
+    if loop is not None and not loop.is_closed():
+        loop.close()
+    _local.loop = None
+
+
+########################################
+async def execute(pscript: str, semaphore: asyncio.Semaphore, deadline: float = DEADLINE, host: str = None):
+    """ Run a shell script as a subprocess of the event loop
+
+        :param str pscript: shell script as text
+        :param asyncio.Semaphore semaphore: bounds the number of scripts running at the same time
+        :param float deadline: the script is killed after this number of seconds
+        :param str host: host to run the script on, through its transport, or None for this host
+        :returns tuple: (stdout, stderr) as bytes - an error message in stderr if the deadline is over
+    """
+    kind = 'shell' if host is None else f'shell@{host}'
+    if capture.mode == capture.REPLAY:
+        return capture.replay(kind, pscript)
+
+    async with semaphore:
+        start = time.time()
+        if host is not None:
+            result = await asyncio.get_running_loop().run_in_executor(None, transport.get(host).run, pscript)
+        else:
+            shellscript.count_fork()
+            proc = await asyncio.create_subprocess_exec(
+                '/bin/sh', '-c', pscript, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                result = await asyncio.wait_for(proc.communicate(), deadline)
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+                result = (b'', f'no result in {deadline} seconds\n'.encode('utf-8'))
+        capture.record(kind, pscript, result, time.time() - start)
+    return result
+
+
+########################################
+async def gather(probes: list, max_concurrency: int = MAX_CONCURRENCY, deadline: float = DEADLINE):
+    """ Run probes concurrently
+
+        :param list probes: (pscript, cache_ttl, cache_tag, host) tuples
+        :param int max_concurrency: maximum number of probes running at the same time
+        :param float deadline: maximum run time of each probe in seconds
+        :returns list: (stdout, stderr) of each probe, in the same order
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    return await asyncio.gather(*(execute(pscript, semaphore, deadline, host) for (pscript, _, _, host) in probes))
+
+
+########################################
+def prefetch(probes: list, max_concurrency: int = MAX_CONCURRENCY, deadline: float = DEADLINE):
+    """ Run the probes of a cycle concurrently and put their results in the shellscript cache - the probes already
+        cached and the duplicates are skipped
+
+        :param list probes: (pscript, cache_ttl, cache_tag, host) tuples
+        :param int max_concurrency: maximum number of probes running at the same time
+        :param float deadline: maximum run time of each probe in seconds
+        :returns int: number of probes run
+    """
+    pending = {}
+    for probe in probes:
+        (pscript, _, _, host) = probe
+        if (host, pscript) not in pending and not shellscript.is_cached(pscript, host):
+            pending[(host, pscript)] = probe
+    if not pending:
+        return 0
+
+    start = time.time()
+    probes = list(pending.values())
+    results = _loop().run_until_complete(gather(probes, max_concurrency, deadline))
+    for ((pscript, cache_ttl, cache_tag, host), result) in zip(probes, results):
+        shellscript.store(pscript, result, cache_ttl, cache_tag, host)
+    core.logger(trace_log=f'{len(probes)} probes run in {time.time() - start:.3f} seconds')
+    return len(probes)
+
@@ -0,0 +1,178 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+""" Record and replay of the commands run by indigo Plugin
+
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    In record mode, each shell script and applescript run, its output, its errors and its duration are written to a
+    capture file: one JSON object per line, gzip compressed.
+        {"k": "shell", "c": "ps -awxc ...", "o": "output", "e": "errors", "t": 0.0123, "at": 1445000000.0}
+    In replay mode, the outputs of the capture file are served instead of running the commands, in the recorded
+    order for a command recorded several times, the last one being repeated.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import gzip
+import json
+import os
+import threading
+import time
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# current mode: None, RECORD or REPLAY
+mode = None
+_lock = threading.Lock()
+_file = None
+_recorded = 0
+_maxRecords = 10000
+_replay = {}            # (kind, command) -> [records, index of next]
+
+
+########################################
+def default_path():
+    """ Capture file in the plugin preferences folder """
+    return os.path.join(
+        indigo.server.getInstallFolderPath(), 'Preferences', 'Plugins', indigo.activePlugin.pluginId,
+        'capture.jsonl.gz'
+    )
+
+
+########################################
+def init(capture_mode: str = None, path: str = None, max_records: int = 10000):
+    """ Start recording or replaying, or stop both
+
+        :param str capture_mode: RECORD, REPLAY or None to run the commands without capture
+        :param str path: capture file, default_path() if None
+        :param int max_records: recording stops after this number of commands
+    """
+    global mode, _file, _recorded, _maxRecords, _replay
+
+    stop()
+    if capture_mode is None:
+        return
+    if path is None:
+        path = default_path()
+
+    with _lock:
+        if capture_mode == RECORD:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _file = gzip.open(path, 'at', encoding='utf-8')
+            except OSError as err:
+                core.logger(err_log=f'commands cannot be recorded in {path} because {err}')
+                return
+            _recorded = 0
+            _maxRecords = max_records
+        elif capture_mode == REPLAY:
+            _replay = {}
+            for record in load(path):
+                _replay.setdefault((record['k'], record['c']), [[], 0])[0].append(record)
+        else:
+            core.logger(err_log=f'unknown capture mode {capture_mode}')
+            return
+        mode = capture_mode
+    core.logger(msg_log=f'commands {capture_mode} using {path}')
+
+
+########################################
+def stop():
+    """ Stop recording or replaying """
+    global mode, _file
+
+    with _lock:
+        mode = None
+        if _file is not None:
+            _file.close()
+            _file = None
+
+
+########################################
+def load(path: str):
+    """ Read a capture file - a file truncated by an abrupt stop is read up to the truncation
+
+        :param str path: capture file
+        :returns list: records as dictionaries
+    """
+    records = []
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as capture_file:
+            for line in capture_file:
+                records.append(json.loads(line))
+    except (EOFError, ValueError) as err:
+        core.logger(trace_log=f'capture file {path} is truncated: {err}')
+    except OSError as err:
+        core.logger(err_log=f'capture file {path} cannot be read because {err}')
+    return records
+
+
+########################################
+def record(kind: str, command: str, result: tuple, elapsed: float):
+    """ Record one command run - nothing if not recording
+
+        :param str kind: 'shell' or 'applescript'
+        :param str command: the script
+        :param tuple result: (stdout, stderr) as bytes
+        :param float elapsed: run time in seconds
+    """
+    global _file, _recorded
+
+    if mode != RECORD:
+        return
+    line = json.dumps({
+        'k': kind,
+        'c': command,
+        'o': result[0].decode('utf-8', 'surrogateescape'),
+        'e': result[1].decode('utf-8', 'surrogateescape'),
+        't': round(elapsed, 4),
+        'at': round(time.time(), 1)
+    }) + '\n'
+    with _lock:
+        if _file is None:
+            return
+        _file.write(line)
+        _recorded += 1
+        if _recorded >= _maxRecords:
+            core.logger(msg_log=f'{_recorded} commands recorded, recording stops')
+            _file.close()
+            _file = None
+
+
+########################################
+def replay(kind: str, command: str):
+    """ Recorded result of a command
+
+        :param str kind: 'shell' or 'applescript'
+        :param str command: the script
+        :returns tuple: (stdout, stderr) as bytes - an error if the command has not been recorded
+    """
+    with _lock:
+        entry = _replay.get((kind, command))
+        if entry is None:
+            core.logger(trace_log=f'{kind} {command.splitlines()[0] if command else ""} not in the capture file')
+            return b'', b'command not in the capture file\n'
+        (records, index) = entry
+        entry[1] = min(index + 1, len(records) - 1)
+    return (
+        records[index]['o'].encode('utf-8', 'surrogateescape'),
+        records[index]['e'].encode('utf-8', 'surrogateescape')
+    )
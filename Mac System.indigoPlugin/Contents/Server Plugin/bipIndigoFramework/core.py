@@ -204,21 +204,25 @@ def dumppluginproperties():
 
 ########################################
 def dumpdevicestates(dev: indigo.Device):
-    """ Dump device states
+    """ Dump device states - the states are not even read if not in debug mode
 
         :param indigo.Device dev: device object
         :returns:
     """
+    if not indigo.activePlugin.logLevel & MSG_DEBUG:
+        return
     dumpdict(dev.states, '"' + dev.name + '" state %s is %s', level=MSG_DEBUG)
 
 
 ########################################
 def dumpdeviceproperties(dev: indigo.Device):
-    """ Dump device properties
+    """ Dump device properties - the properties are not even read if not in debug mode
 
         :param indigo.Device dev: device object
         :returns:
     """
+    if not indigo.activePlugin.logLevel & MSG_DEBUG:
+        return
     dumpdict(dev.pluginProps, '"' + dev.name + '" property %s is %s', level=MSG_DEBUG)
 
 
@@ -294,9 +298,11 @@ def updatedeviceprops(dev: indigo.Device, values_dict: dict):
         else:
             logger(trace_raw=f'"{key}" value : {formatdump(local_props[key])} == {formatdump(value)}')
 
-        if len(update_dict) > 0:
-            indigo.activePlugin.sleep(0.2)
-            dumpdict(update_dict, input_format='"' + dev.name + '" property %s updated to %s', level=MSG_MAIN_EVENTS)
+    # one server update for all the changed properties
+    if len(update_dict) > 0:
+        dev.replacePluginPropsOnServer(local_props)
+        indigo.activePlugin.sleep(0.2)
+        dumpdict(update_dict, input_format='"' + dev.name + '" property %s updated to %s', level=MSG_MAIN_EVENTS)
 
     return update_dict
 
@@ -325,9 +331,9 @@ def updatepluginprops(values_dict: dict):
         else:
             logger(trace_raw=f'property {key} value: {formatdump(actual_value)} == {formatdump(value)}')
 
-        if len(update_dict) > 0:
-            indigo.activePlugin.sleep(0.2)
-            dumpdict(update_dict, input_format='plugin property %s updated to %s', level=MSG_MAIN_EVENTS)
+    if len(update_dict) > 0:
+        indigo.activePlugin.sleep(0.2)
+        dumpdict(update_dict, input_format='plugin property %s updated to %s', level=MSG_MAIN_EVENTS)
 
     return update_dict
 
@@ -362,7 +368,7 @@ def upgradeDeviceProperties(dev: indigo.Device, upgrade_property_dict):
         dumpdict(update_dict, '"' + dev.name + '" property %s created with value %s', level=MSG_DEBUG)
         logger(msg_log=f'"{dev.name}" new properties added')
     else:
-        logger(msg_log=f'"{dev.name}" property list is up to date')
+        logger(trace_log=f'"{dev.name}" property list is up to date')
 
     return update_dict
 
@@ -383,12 +389,12 @@ def upgradeDeviceStates(dev: indigo.Device, upgrade_states_list: dict):
     for newStateName in upgrade_states_list:
         if newStateName not in dev.states:
             logger(trace_raw=f'"{dev.name}" state {newStateName} missing')
-            update_list = update_list + newStateName
+            update_list = update_list + (newStateName,)
     if len(update_list) > 0:
         dev.stateListOrDisplayStateIdChanged()
         dumplist(update_list, f'"{dev.name}" states added', level=MSG_DEBUG)
         logger(msg_log=f'"{dev.name}" new states added')
     else:
-        logger(msg_log=f'"{dev.name}" state list is up to date')
+        logger(trace_log=f'"{dev.name}" state list is up to date')
 
     return update_list
@@ -18,6 +18,7 @@
 """
 ####################################################################################
 
+import threading
 import time
 from threading import Timer
 from bipIndigoFramework import core
@@ -62,10 +63,11 @@ def isUpdateRequested(dev: indigo.Device):
 
 
 ########################################
-def sleepNext(sleep_time: int):
+def sleepNext(sleep_time: int, wake_event: threading.Event = None):
     """ Calculate sleep time according main dialog pace
 
         :param int sleep_time: time in seconds between two dialog calls
+        :param threading.Event wake_event: event that ends the sleep before time, or None
         :returns:
     """
     next_delay = sleep_time - (time.time() - indigo.activePlugin.wakeup)
@@ -75,7 +77,18 @@ def sleepNext(sleep_time: int):
         next_delay = 0.5
 
     core.logger(trace_log=f'going to sleep for {next_delay} seconds')
-    indigo.activePlugin.sleep(next_delay)
+    if wake_event is None:
+        indigo.activePlugin.sleep(next_delay)
+        return
+
+    # sleep by slices to be able to wake up on event
+    wake_time = time.time() + next_delay
+    while not wake_event.is_set():
+        next_delay = wake_time - time.time()
+        if next_delay <= 0:
+            return
+        indigo.activePlugin.sleep(min(next_delay, 0.25))
+    core.logger(trace_log='woken up before time')
 
 
 def sleepWake():
@@ -103,6 +116,7 @@ class DialogTimer:
         self.initial_interval = initial_interval
         self.interval = interval
         self.timeElapsed = True
+        self.nextDue = None
         core.logger(trace_log=f'initiating dialog timer "{self.timer_name}" on a {interval} seconds pace')
         self._run()
 
@@ -116,10 +130,29 @@ class DialogTimer:
         core.logger(trace_log=f'time elapsed for dialog timer "{self.timer_name}"')
         self.timeElapsed = True
         if self.initial_interval > 0:
-            self._timer = Timer(self.initial_interval, self._run)
+            delay = self.initial_interval
             self.initial_interval = 0
         else:
-            self._timer = Timer(self.interval, self._run)
+            delay = self.interval
+        self.nextDue = time.time() + delay
+        self._timer = Timer(delay, self._run)
+        self._timer.start()
+
+    def restore(self, next_due: float):
+        """ Resume a schedule saved before a restart: the timer elapses at next_due instead of now
+
+            :param float next_due: time (epoch) of the next elapse, ignored if already past
+            :returns:
+        """
+        delay = next_due - time.time()
+        if delay <= 0 or delay > self.interval:
+            return
+        core.logger(trace_log=f'dialog timer "{self.timer_name}" resumed, next elapse in {delay:.0f} seconds')
+        self._timer.cancel()
+        self.timeElapsed = False
+        self.initial_interval = 0
+        self.nextDue = next_due
+        self._timer = Timer(delay, self._run)
         self._timer.start()
 
     def changeInterval(self, interval: int):
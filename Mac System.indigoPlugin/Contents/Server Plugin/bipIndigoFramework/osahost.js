@@ -0,0 +1,61 @@
+// Persistent applescript host - JavaScript for Automation
+// By Bernard Philippe (bip.philippe) (C) 2015
+//
+// Reads one JSON request per line on stdin: {"id": n, "script": "applescript source"}
+// Writes one JSON result per line on stdout: {"id": n, "result": "text", "error": "message or empty"}
+// Compiled scripts are kept by source, so a script is compiled only once per host life.
+
+ObjC.import('Foundation');
+
+function execute(scripts, source) {
+    var error = Ref();
+    var script = scripts[source];
+    if (script === undefined) {
+        script = $.NSAppleScript.alloc.initWithSource(source);
+        if (!script.compileAndReturnError(error)) {
+            return {result: '', error: ObjC.unwrap(error[0].objectForKey('NSAppleScriptErrorMessage'))};
+        }
+        scripts[source] = script;
+    }
+
+    var descriptor = script.executeAndReturnError(error);
+    if (descriptor.isNil()) {
+        return {result: '', error: ObjC.unwrap(error[0].objectForKey('NSAppleScriptErrorMessage'))};
+    }
+    var text = descriptor.stringValue;
+    return {result: text.isNil() ? '' : text.js, error: ''};
+}
+
+function run(argv) {
+    var stdin = $.NSFileHandle.fileHandleWithStandardInput;
+    var stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+    var scripts = {};
+    var buffer = '';
+
+    while (true) {
+        var data = stdin.availableData;
+        if (data.length === 0) {
+            // end of input: the plugin stopped
+            break;
+        }
+        buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+        var lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (var i = 0; i < lines.length; i++) {
+            if (lines[i].length === 0) {
+                continue;
+            }
+            var request = JSON.parse(lines[i]);
+            var response;
+            try {
+                response = execute(scripts, request.script);
+            } catch (e) {
+                response = {result: '', error: String(e)};
+            }
+            response.id = request.id;
+            var frame = $.NSString.alloc.initWithUTF8String(JSON.stringify(response) + '\n');
+            stdout.writeData(frame.dataUsingEncoding($.NSUTF8StringEncoding));
+        }
+    }
+}
@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+""" Persistent applescript host for indigo Plugin
+
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    One long-lived child process runs all the applescripts: no process start per script.
+    Requests and results are framed as one JSON object per line:
+        request  {"id": 12, "script": "tell application \"Music\" to quit"}
+        result   {"id": 12, "result": "text returned by the script", "error": "error message or empty"}
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import itertools
+import json
+import os
+import subprocess
+import sys
+import threading
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+
+########################################
+class ScriptHost:
+    """ Client side of the applescript host: sends requests, dispatches results to the waiting callers, restarts
+        the host when it dies or does not answer in time
+    """
+    def __init__(self, command: list = None, timeout: float = 30):
+        """ Constructor
+
+            :param list command: host command line, the JavaScript for Automation host if None on macOS,
+                                 the python stand-in host if None on other systems
+            :param float timeout: default time to wait for a result, in seconds
+        """
+        if command is not None:
+            self.command = command
+        elif sys.platform == 'darwin':
+            self.command = ['osascript', '-l', 'JavaScript', os.path.join(os.path.dirname(__file__), 'osahost.js')]
+        else:
+            self.command = [sys.executable, os.path.join(os.path.dirname(__file__), 'osahoststandin.py')]
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._proc = None
+        self._ids = itertools.count(1)
+        self._pending = {}          # request id -> [threading.Event, result dict]
+
+    def stop(self):
+        """ Stop the host """
+        with self._lock:
+            self._kill()
+
+    def run(self, ascript: str, timeout: float = None):
+        """ Run a script in the host
+
+            :param str ascript: applescript as text
+            :param float timeout: time to wait for the result in seconds, default timeout if None
+            :returns tuple: (result, error) as strings, error is empty on success
+        """
+        request_id = next(self._ids)
+        waiter = [threading.Event(), None]
+        frame = (json.dumps({'id': request_id, 'script': ascript}) + '\n').encode('utf-8')
+
+        with self._lock:
+            self._pending[request_id] = waiter
+            try:
+                if self._proc is None or self._proc.poll() is not None:
+                    self._start()
+                self._proc.stdin.write(frame)
+                self._proc.stdin.flush()
+            except OSError as err:
+                del self._pending[request_id]
+                self._kill()
+                return '', f'applescript host failed because {err}'
+
+        if not waiter[0].wait(self.timeout if timeout is None else timeout):
+            core.logger(err_log=f'applescript host did not answer request {request_id} in time, restarting it')
+            with self._lock:
+                self._pending.pop(request_id, None)
+                self._kill()
+            return '', 'applescript host timeout'
+
+        return waiter[1].get('result', ''), waiter[1].get('error', '')
+
+    def _start(self):
+        """ Start the host process and its reader thread - lock must be held """
+        core.logger(trace_log=f'starting applescript host {" ".join(self.command)}')
+        self._proc = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=True
+        )
+        threading.Thread(target=self._read, args=(self._proc,), name='applescript host reader', daemon=True).start()
+
+    def _kill(self):
+        """ Stop the host process and fail the pending requests - lock must be held """
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._proc.stdin.close()
+            self._proc = None
+        for waiter in self._pending.values():
+            waiter[1] = {'error': 'applescript host stopped'}
+            waiter[0].set()
+        self._pending.clear()
+
+    def _read(self, proc: subprocess.Popen):
+        """ Reader thread: dispatch the results until the host ends
+
+            :param subprocess.Popen proc: host process
+        """
+        for line in proc.stdout:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                core.logger(trace_log=f'applescript host unexpected output {core.str_utf8(line).strip()}')
+                continue
+            with self._lock:
+                waiter = self._pending.pop(result.get('id'), None)
+            if waiter is not None:
+                waiter[1] = result
+                waiter[0].set()
+        proc.stdout.close()
+
+        with self._lock:
+            if self._proc is proc:
+                core.logger(err_log='applescript host stopped, it will be restarted on next request')
+                self._kill()
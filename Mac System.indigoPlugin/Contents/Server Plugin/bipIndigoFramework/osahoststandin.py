@@ -0,0 +1,72 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+""" Stand-in for the applescript host (osahost.js) on systems without applescript
+
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Speaks the same protocol as the real host, and understands just enough of applescript to test it:
+        return "some text"      -> result is the text
+        error "some message"    -> error is the message
+        delay n                 -> waits n seconds
+    Any other line is ignored. The script result is the last returned text, or empty.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import json
+import re
+import sys
+import time
+
+_repStatement = re.compile(r'\s*(return|error|delay)\s+"?(.*?)"?\s*$')
+
+
+def execute(script):
+    """ Interpret the script
+
+        :param str script: applescript as text
+        :returns dict: result and error
+    """
+    result = ''
+    for line in script.splitlines():
+        match = _repStatement.match(line)
+        if match is None:
+            continue
+        (statement, argument) = match.groups()
+        if statement == 'return':
+            result = argument
+        elif statement == 'error':
+            return {'result': '', 'error': argument}
+        else:
+            time.sleep(float(argument))
+    return {'result': result, 'error': ''}
+
+
+def main():
+    """ Answer the requests until stdin is closed """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        response = execute(request['script'])
+        response['id'] = request['id']
+        sys.stdout.write(json.dumps(response) + '\n')
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
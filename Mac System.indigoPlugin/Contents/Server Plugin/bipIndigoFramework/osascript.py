@@ -18,9 +18,13 @@
 """
 ####################################################################################
 
+import hashlib
+import os
 import re
 import subprocess
-from bipIndigoFramework import core
+import threading
+import time
+from bipIndigoFramework import capture, core, osahost
 
 try:
     import indigo  # noqa
@@ -30,13 +34,175 @@ except ImportError:
 _repCloseAppErrorFilter = re.compile(r".Library.ScriptingAdditions.")
 _valueConvertDict = {'True': True, 'true': True, 'False': False, 'false': False}
 
+# compiled scripts cache
+_compiledLock = threading.Lock()
+_compiledDir = None
+_compiledMax = 64
+
+# persistent applescript host, if used
+_host = None
+# number of processes started since the plugin start (osacompile and osascript), for measurements
+_forkLock = threading.Lock()
+forkCount = 0
+
 
 ########################################
-def init():
-    """ Initiate special applescript error handling """
+def init(cache_dir: str = None, max_compiled: int = 64, use_host: bool = False):
+    """ Initiate special applescript error handling and the compiled scripts cache
+
+        :param str cache_dir: directory of the compiled scripts, in the plugin preferences folder if None,
+                              or '' to always run scripts from their source
+        :param int max_compiled: number of compiled scripts kept, the least recently used are deleted
+        :param bool use_host: run the scripts in a persistent applescript host instead of one osascript per script
+    """
+    global _compiledDir, _compiledMax, _host
+
+    shutdown()
+    if use_host:
+        _host = osahost.ScriptHost()
+
     indigo.activePlugin._retryLog = {}
     indigo.activePlugin._errorMsg = {}
 
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            indigo.server.getInstallFolderPath(), 'Preferences', 'Plugins', indigo.activePlugin.pluginId, 'scpt'
+        )
+    _compiledMax = max_compiled
+    _compiledDir = None
+    if cache_dir:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _compiledDir = cache_dir
+        except OSError as err:
+            core.logger(err_log=f'applescript compiled scripts cache disabled because {err}')
+
+
+########################################
+def shutdown():
+    """ Stop the persistent applescript host if any """
+    global _host
+
+    if _host is not None:
+        _host.stop()
+        _host = None
+
+
+########################################
+def _compiled_path(ascript: str):
+    """ Path of the compiled form of a script in the cache
+
+        :param str ascript: applescript as text
+        :returns str: path of the .scpt file
+    """
+    return os.path.join(_compiledDir, hashlib.sha1(ascript.encode('utf-8')).hexdigest() + '.scpt')
+
+
+########################################
+def invalidate(ascript: str = None):
+    """ Delete the compiled form of a script, or of all scripts
+
+        :param str ascript: applescript as text, or None for all
+        :returns:
+    """
+    if _compiledDir is None:
+        return
+    with _compiledLock:
+        if ascript is None:
+            paths = [os.path.join(_compiledDir, name) for name in os.listdir(_compiledDir) if name.endswith('.scpt')]
+        else:
+            paths = [_compiled_path(ascript)]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    core.logger(trace_log=f'{len(paths)} compiled applescript removed from cache')
+
+
+########################################
+def _compile(ascript: str):
+    """ Returns the compiled form of a script, compiling it with osacompile the first time
+
+        :param str ascript: applescript as text
+        :returns str: path of the .scpt file, or None if the script cannot be compiled
+    """
+    if _compiledDir is None:
+        return None
+
+    path = _compiled_path(ascript)
+    with _compiledLock:
+        try:
+            # mark it as recently used
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        core.logger(trace_log=f'compiling applescript {ascript.splitlines()[0]}')
+        temp_path = path + '.tmp'
+        _count_fork()
+        result = subprocess.run(
+            ['osacompile', '-o', temp_path, '-e', ascript], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            close_fds=True
+        )
+        if result.returncode != 0:
+            core.logger(trace_log=f'applescript not compiled because {core.str_utf8(result.stderr).strip()}')
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            return None
+        os.replace(temp_path, path)
+
+        # least recently used eviction
+        compiled = [entry for entry in os.scandir(_compiledDir) if entry.name.endswith('.scpt')]
+        if len(compiled) > _compiledMax:
+            compiled.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in compiled[:len(compiled) - _compiledMax]:
+                os.remove(entry.path)
+    return path
+
+
+########################################
+def _count_fork():
+    """ Count one more process started """
+    global forkCount
+
+    with _forkLock:
+        forkCount += 1
+
+
+########################################
+def _execute(ascript: str):
+    """ Run the script in the persistent host, or in an osascript process
+
+        :param str ascript: applescript as text
+        :returns tuple: (output, errors) as bytes, output being terminated by a new line as osascript does
+    """
+    if capture.mode == capture.REPLAY:
+        return capture.replay('applescript', ascript)
+
+    start = time.time()
+    if _host is not None:
+        output, error = _host.run(ascript)
+        if error:
+            error += '\n'
+        result = ((output + '\n').encode('utf-8'), error.encode('utf-8'))
+    else:
+        # Send the script, compiled once for all if possible
+        compiled_path = _compile(ascript)
+        if compiled_path is None:
+            osa_command = ['osascript', '-e', ascript]
+        else:
+            osa_command = ['osascript', compiled_path]
+        _count_fork()
+        with subprocess.Popen(osa_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True) as osa:
+            indigo.activePlugin.sleep(0.25)
+            result = osa.communicate()
+    capture.record('applescript', ascript, result, time.time() - start)
+    return result
+
 
 ########################################
 # def run(ascript: str, akeys: list = None, errorHandling=None):
@@ -60,12 +226,7 @@ def run(ascript, akeys=None, errorHandling=None):
         trace_raw=f'going to call applescript {ascript}'
     )
 
-    # Send the script
-    with subprocess.Popen(
-            ['osascript', '-e', ascript], stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True) as osa:
-        indigo.activePlugin.sleep(0.25)
-        osa_values, osa_error = osa.communicate()
-
+    osa_values, osa_error = _execute(ascript)
     if len(osa_error) > 0:
         core.logger(
                     trace_log=f'warning: applescript {osa_name} error {osa_error}',
@@ -132,6 +293,7 @@ def run(ascript, akeys=None, errorHandling=None):
                 indigo.activePlugin._errorMsg[osa_name] = ''  # noqa
 
     # return value without error
+    osa_values = core.str_utf8(osa_values)
     if akeys is None:
         # return text if no keys
         osa_values = core.str_utf8(osa_values[:-1])
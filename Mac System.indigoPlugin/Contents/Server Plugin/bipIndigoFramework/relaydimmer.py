@@ -53,7 +53,19 @@ def start_action(dev, action):
             None or action to provide
     """
 
-    action_id = action.deviceAction
+    return check_action(dev, action.deviceAction)
+
+
+################################################################################
+def check_action(dev, action_id):
+    """ Same as start_action, for an action given by its id
+
+        Args:
+            dev: current device
+            action_id: indigo action id (kDimmerRelayAction or kDeviceGeneralAction)
+        Returns:
+            None or action to provide
+    """
     core.logger(trace_log=f'requesting device "{dev.name}" action {_kDimmerRelayActionDict[action_id]}')
     # work on toggling
     if action_id == indigo.kDimmerRelayAction.Toggle:
@@ -19,21 +19,186 @@
 ####################################################################################
 
 import subprocess
-from bipIndigoFramework import core
+import threading
+import time
+from bipIndigoFramework import capture, core, transport
 
 try:
     import indigo  # noqa
 except ImportError:
     pass
 
+# shared results of cached scripts: (host, pscript) -> _Flight
+_cacheLock = threading.Lock()
+_cache = {}
+_inFlight = {}
+_cacheGeneration = 0
+# number of processes started since the plugin start, for measurements
+forkCount = 0
+
+
+########################################
+class _Flight:
+    """ One execution of a script, shared by every caller asking for the same script meanwhile """
+    def __init__(self, generation: int):
+        self.event = threading.Event()
+        self.generation = generation
+        self.result = None
+        self.expiry = 0
+        self.tags = set()
+
 
 ########################################
 def init():
     """ Initiate some handlings """
+    invalidate()
+
+
+########################################
+def invalidate(tag: str = None):
+    """ Forget cached script results, so that the next call runs the script again
+
+        :param str tag: only forget results requested with this cache tag, or None to forget everything
+        :returns:
+    """
+    global _cacheGeneration
+
+    with _cacheLock:
+        _cacheGeneration += 1
+        if tag is None:
+            _cache.clear()
+        else:
+            for key in [key for key, flight in _cache.items() if tag in flight.tags]:
+                del _cache[key]
+
+    core.logger(trace_log=f'shell cache invalidated for tag {core.formatdump(tag)}')
+
+
+########################################
+def count_fork():
+    """ Count one process started to run a shell script outside of this module (asyncengine) """
+    global forkCount
+
+    with _cacheLock:
+        forkCount += 1
+
+
+########################################
+def is_cached(pscript: str, host: str = None):
+    """ True if a result of the script is cached and not expired
+
+        :param str pscript: shell script as text
+        :param str host: host the script runs on, or None for this host
+    """
+    with _cacheLock:
+        flight = _cache.get((host, pscript))
+        return flight is not None and flight.expiry > time.time()
+
+
+########################################
+def store(pscript: str, result: tuple, cache_ttl: float, cache_tag: str = None, host: str = None):
+    """ Cache the result of a script run elsewhere (asyncengine), as if run with cache_ttl - failures and timeouts
+        are kept too, so that the callers get the error instead of running the script again
+
+        :param str pscript: shell script as text
+        :param tuple result: (stdout, stderr) as bytes
+        :param float cache_ttl: time to live of the result in seconds
+        :param str cache_tag: tag used by invalidate, or None
+        :param str host: host the script ran on, or None for this host
+    """
+    with _cacheLock:
+        flight = _Flight(_cacheGeneration)
+        flight.result = result
+        flight.expiry = time.time() + cache_ttl
+        if cache_tag is not None:
+            flight.tags.add(cache_tag)
+        flight.event.set()
+        _cache[(host, pscript)] = flight
+
+
+########################################
+def _execute(pscript: str, host: str = None):
+    """ Run the script in a shell
+
+        :param str pscript: shell script as text
+        :param str host: host to run the script on, through its transport, or None for this host
+        :returns tuple: (stdout, stderr) as bytes
+    """
+    global forkCount
+
+    kind = 'shell' if host is None else f'shell@{host}'
+    if capture.mode == capture.REPLAY:
+        return capture.replay(kind, pscript)
+
+    if host is not None:
+        start = time.time()
+        result = transport.get(host).run(pscript)
+        capture.record(kind, pscript, result, time.time() - start)
+        return result
+
+    with _cacheLock:
+        forkCount += 1
+    start = time.time()
+    with subprocess.Popen(
+        pscript, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, close_fds=True) as proc:
+        indigo.activePlugin.sleep(0.1)
+        result = proc.communicate()
+    capture.record('shell', pscript, result, time.time() - start)
+    return result
 
 
 ########################################
-def run(pscript, rule=None, akeys=None):
+def _shared_execute(pscript: str, cache_ttl: float, cache_tag: str, host: str = None):
+    """ Run the script once for all concurrent callers and keep the result cache_ttl seconds
+
+        :param str pscript: shell script as text
+        :param float cache_ttl: time to live of the result in seconds
+        :param str cache_tag: tag used by invalidate, or None
+        :param str host: host to run the script on, or None for this host
+        :returns tuple: (stdout, stderr) as bytes
+    """
+    key = (host, pscript)
+    while True:
+        with _cacheLock:
+            flight = _cache.get(key)
+            if flight is not None and flight.expiry > time.time():
+                if cache_tag is not None:
+                    flight.tags.add(cache_tag)
+                return flight.result
+
+            flight = _inFlight.get(key)
+            is_owner = flight is None
+            if is_owner:
+                flight = _Flight(_cacheGeneration)
+                _inFlight[key] = flight
+            if cache_tag is not None:
+                flight.tags.add(cache_tag)
+
+        if is_owner:
+            break
+
+        # somebody else is running the same script: wait for its result
+        flight.event.wait()
+        if flight.result is not None:
+            core.logger(trace_log=f'shared result of shell {pscript.split("|")[0]}...')
+            return flight.result
+
+    try:
+        flight.result = _execute(pscript, host)
+    finally:
+        with _cacheLock:
+            del _inFlight[key]
+            # do not keep failures nor results that started before an invalidation
+            if flight.result is not None and len(flight.result[1]) == 0 and flight.generation == _cacheGeneration:
+                flight.expiry = time.time() + cache_ttl
+                _cache[key] = flight
+        flight.event.set()
+
+    return flight.result
+
+
+########################################
+def run(pscript, rule=None, akeys=None, cache_ttl=0, cache_tag=None, host=None):
     """ Calls shell script and returns the result
 
         Args:
@@ -44,6 +209,10 @@ def run(pscript, rule=None, akeys=None):
                   or None for no action on text
             akeys: list of keys, ordered the same way that output data of the shell,
                    or None
+            cache_ttl: if > 0, identical scripts called meanwhile share one execution, and its result is
+                       reused during cache_ttl seconds (only for scripts without side effects)
+            cache_tag: tag of the cached result, used by invalidate
+            host: host to run the script on, through a persistent session (see transport), or None for this host
         Returns:
             python dictionary of the states names and values,
             or string returned by the script is akeys is None,
@@ -56,10 +225,10 @@ def run(pscript, rule=None, akeys=None):
         trace_log=f'going to call shell {log_script}...',
         trace_raw=f'going to call shell {pscript}')
 
-    with subprocess.Popen(
-        pscript, stdout=subprocess.PIPE, stderr=subprocess.PIPE, shell=True, close_fds=True) as proc:
-        indigo.activePlugin.sleep(0.1)
-        p_values, p_error = proc.communicate()
+    if cache_ttl > 0:
+        p_values, p_error = _shared_execute(pscript, cache_ttl, cache_tag, host)
+    else:
+        p_values, p_error = _execute(pscript, host)
 
     if len(p_error) > 0:
         # test if error
@@ -67,41 +236,56 @@ def run(pscript, rule=None, akeys=None):
         core.logger(err_log=f'shell script failed because {err}')
         return None
 
+    return_value = parse(p_values, rule, akeys)
+
+    core.logger(
+        trace_log=f'returned from shell {log_script}...',
+        trace_raw=f'returned from shell: {core.formatdump(return_value)}'
+    )
+
+    return return_value
+
+
+########################################
+def parse(p_values, rule=None, akeys=None):
+    """ Cut a shell output into states values
+
+        Args:
+            p_values: text output of the shell, as bytes or string
+            rule: same as run
+            akeys: same as run
+        Returns:
+            python dictionary of the states names and values,
+            or string if akeys is None
+    """
+    p_values = core.str_utf8(p_values)
+
     if akeys is None:
         # return text if no keys
-        return_value = p_values.strip().decode('utf-8')
+        return_value = p_values.strip()
 
     elif rule is None:
-        return_value = {akeys[0]: p_values.strip().decode('utf-8')}
+        return_value = {akeys[0]: p_values.strip()}
 
     elif isinstance(rule, list):
         # split using position
         return_value = {}
         for key, (firstchar, lastchar) in zip(akeys, rule):
-            return_value[key] = core.str_utf8(p_values[firstchar:lastchar].strip())
+            return_value[key] = p_values[firstchar:lastchar].strip()
 
     elif isinstance(rule, str):
         # just use split
-        p_values = p_values.decode('utf-8')
         return_value = dict(zip(akeys, p_values.split(rule)))
-        # for key, value in p_values.items():
         for key, value in return_value.items():
-            return_value[key] = core.str_utf8(value.strip())
+            return_value[key] = value.strip()
     else:
         # split using regex
         return_value = {}
         try:
-            p_values = p_values.decode('utf-8')
-
             for key, value in zip(akeys, rule.match(p_values).groups()):
-                return_value[key] = core.str_utf8(value.strip())
+                return_value[key] = value.strip()
         except:
             for key in akeys:
                 return_value[key] = ''
 
-    core.logger(
-        trace_log=f'returned from shell {log_script}...',
-        trace_raw=f'returned from shell: {core.formatdump(return_value)}'
-    )
-
     return return_value
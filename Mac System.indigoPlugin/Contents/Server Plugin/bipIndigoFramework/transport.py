@@ -0,0 +1,245 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+""" Remote shell transport for Indigo plugins
+
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Shell scripts of a remote host run in long-lived shell sessions on that host instead of one ssh connection per
+    script. A session is a /bin/sh started once through ssh; each script is sent to it and its output and its errors
+    are read up to a sentinel line, unique to the session:
+        (eval 'script') </dev/null; printf '\n<sentinel>\n'; printf '\n<sentinel>\n' >&2
+    Each host has a small pool of sessions, so that scripts of the same host can run at the same time. A session that
+    times out or dies is dropped; a host that cannot be reached is tried again after a growing delay.
+
+    The host STANDIN_HOST runs its sessions as a local /bin/sh, to use remote devices without any network.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import select
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+from bipIndigoFramework import core
+
+# host which sessions are local shells
+STANDIN_HOST = 'localhost-sh'
+# command starting a session on a host, {host} being replaced by the host name
+SSH_COMMAND = ['ssh', '-T', '-o', 'BatchMode=yes', '-o', 'ConnectTimeout=10', '-o', 'ServerAliveInterval=30',
+               '{host}', '/bin/sh']
+_MAX_BACKOFF = 300
+
+_transportsLock = threading.Lock()
+_transports = {}            # host -> HostTransport
+_timeout = 30
+_poolSize = 2
+
+
+########################################
+def init(timeout: float = 30, pool_size: int = 2):
+    """ Set the default settings of the hosts transports
+
+        :param float timeout: maximum run time of a script in seconds, the session is dropped after it
+        :param int pool_size: maximum number of sessions per host
+    """
+    global _timeout, _poolSize
+
+    _timeout = timeout
+    _poolSize = pool_size
+
+
+########################################
+def get(host: str):
+    """ Transport of a host, created the first time
+
+        :param str host: host name, as known by ssh
+        :returns HostTransport: the transport
+    """
+    with _transportsLock:
+        transport = _transports.get(host)
+        if transport is None:
+            transport = HostTransport(host, timeout=_timeout, pool_size=_poolSize)
+            _transports[host] = transport
+        return transport
+
+
+########################################
+def shutdown():
+    """ Close all the sessions of all the hosts """
+    with _transportsLock:
+        for transport in _transports.values():
+            transport.close()
+        _transports.clear()
+
+
+########################################
+class Session:
+    """ One long-lived shell, running one script at a time """
+    def __init__(self, command: list):
+        """ Constructor - starts the shell
+
+            :param list command: command starting the shell
+        """
+        self.sentinel = f'__bip_{uuid.uuid4().hex}__'.encode('ascii')
+        self._proc = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, close_fds=True
+        )
+
+    @property
+    def alive(self):
+        """ True if the shell is still running """
+        return self._proc.poll() is None
+
+    def close(self, kill: bool = False):
+        """ End the shell
+
+            :param bool kill: True to kill it at once, as when it is running a script
+        """
+        if self.alive:
+            try:
+                if kill:
+                    self._proc.kill()
+                else:
+                    self._proc.stdin.close()
+                self._proc.wait(2)
+            except (OSError, subprocess.TimeoutExpired):
+                self._proc.kill()
+        for pipe in (self._proc.stdin, self._proc.stdout, self._proc.stderr):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def run(self, pscript: str, timeout: float):
+        """ Run a script in the shell
+
+            :param str pscript: shell script as text
+            :param float timeout: maximum run time in seconds
+            :returns tuple: (stdout, stderr) as bytes, or None if the session failed or timed out - it is then
+                            unusable
+        """
+        sentinel = self.sentinel.decode('ascii')
+        framed = (
+            f"(eval {shlex.quote(pscript)}) </dev/null; "
+            f"printf '\\n{sentinel}\\n'; printf '\\n{sentinel}\\n' >&2\n"
+        )
+        try:
+            self._proc.stdin.write(framed.encode('utf-8'))
+            self._proc.stdin.flush()
+        except OSError:
+            return None
+
+        outputs = {self._proc.stdout.fileno(): b'', self._proc.stderr.fileno(): b''}
+        pending = set(outputs)
+        deadline = time.time() + timeout
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return None
+            ready, _, _ = select.select(list(pending), [], [], remaining)
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    return None
+                outputs[fd] += chunk
+                # complete when the sentinel line ends the output
+                if outputs[fd].endswith(b'\n' + self.sentinel + b'\n'):
+                    outputs[fd] = outputs[fd][:-len(self.sentinel) - 2]
+                    pending.discard(fd)
+        return outputs[self._proc.stdout.fileno()], outputs[self._proc.stderr.fileno()]
+
+
+########################################
+class HostTransport:
+    """ Pool of shell sessions of a host """
+    def __init__(self, host: str, timeout: float = 30, pool_size: int = 2):
+        """ Constructor - no session is started before the first script
+
+            :param str host: host name, as known by ssh, or STANDIN_HOST
+            :param float timeout: maximum run time of a script in seconds
+            :param int pool_size: maximum number of sessions
+        """
+        self.host = host
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._available = threading.Semaphore(pool_size)
+        self._idle = []
+        self._backoff = 0
+        self._retryTime = 0
+
+    def _command(self):
+        """ Command starting a session """
+        if self.host == STANDIN_HOST:
+            return ['/bin/sh']
+        return [self.host if part == '{host}' else part for part in SSH_COMMAND]
+
+    def _session(self):
+        """ An idle session, or a new one
+
+            :returns Session: the session, or None if the host cannot be reached for now
+        """
+        with self._lock:
+            while self._idle:
+                session = self._idle.pop()
+                if session.alive:
+                    return session
+                session.close()
+            if time.time() < self._retryTime:
+                return None
+        try:
+            session = Session(self._command())
+        except OSError as err:
+            core.logger(err_log=f'no session on {self.host} because {err}')
+            self._failed()
+            return None
+        core.logger(trace_log=f'new shell session on {self.host}')
+        return session
+
+    def _failed(self):
+        """ Delay the next connection, longer after each failure in a row """
+        with self._lock:
+            self._backoff = min(max(self._backoff * 2, 1), _MAX_BACKOFF)
+            self._retryTime = time.time() + self._backoff
+        core.logger(trace_log=f'{self.host} tried again in {self._backoff} seconds')
+
+    def run(self, pscript: str):
+        """ Run a script on the host
+
+            :param str pscript: shell script as text
+            :returns tuple: (stdout, stderr) as bytes - an error message in stderr if the host cannot be reached
+        """
+        with self._available:
+            session = self._session()
+            if session is None:
+                return b'', f'{self.host} cannot be reached for now\n'.encode('utf-8')
+            result = session.run(pscript, self.timeout)
+            if result is None:
+                # timed out, or the connection is lost: the session is out of sync
+                session.close(kill=True)
+                self._failed()
+                return b'', f'no answer from {self.host} in {self.timeout} seconds\n'.encode('utf-8')
+            with self._lock:
+                self._backoff = 0
+                self._idle.append(session)
+        return result
+
+    def close(self):
+        """ Close the idle sessions """
+        with self._lock:
+            for session in self._idle:
+                session.close()
+            self._idle = []
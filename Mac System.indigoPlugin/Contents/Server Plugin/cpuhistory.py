@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in cpu usage history
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    The cumulative cpu time of each tracked process is sampled once per dialog cycle into a fixed size ring buffer.
+    Usage over any window is the cpu time spent in the window divided by its duration: the instantaneous value is
+    the usage since the previous sample, unlike the decaying average printed by ps.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+from array import array
+
+# averaging windows in seconds, and the state that publishes each of them
+WINDOWS = ((60, 'PCpuAvg1'), (300, 'PCpuAvg5'), (900, 'PCpuAvg15'))
+# samples closer than this to the previous one are not recorded (early cycles after a wake up)
+_MIN_SPACING = 4
+
+
+########################################
+class _Ring:
+    """ Samples of one process: (time, cumulative cpu seconds) pairs interleaved in one array of doubles """
+    __slots__ = ('start', 'samples', 'head', 'count')
+
+    def __init__(self, capacity: int, start):
+        self.start = start
+        self.samples = array('d', bytes(16 * capacity))
+        self.head = 0
+        self.count = 0
+
+
+########################################
+class CpuHistory:
+    """ Ring buffers of cpu time samples for the tracked processes, and the usage figures computed from them """
+    def __init__(self, capacity: int = 128):
+        """ Constructor
+
+            :param int capacity: samples kept per process, 128 covers the longest window at the 10 s dialog pace
+        """
+        self.capacity = capacity
+        self._rings = {}        # pid -> _Ring
+        self._usage = {}        # pid -> dict of states values
+
+    def track(self, pid: int):
+        """ Record the cpu time of the process from the next update on
+
+            :param int pid: process id
+        """
+        if pid not in self._rings:
+            self._rings[pid] = None
+
+    def tracked(self):
+        """ True if at least one process is tracked """
+        return len(self._rings) > 0
+
+    def usage(self, pid: int):
+        """ Usage figures of the process as of the last update
+
+            :param int pid: process id
+            :returns dict: PCpu, PCpuAvg1, PCpuAvg5, PCpuAvg15 and PCpuPeak in %, or None if less than two samples
+        """
+        return self._usage.get(pid)
+
+    def update(self, snapshot):
+        """ Add one sample per tracked process and compute its usage figures, in a single pass
+            Processes that are gone are no longer tracked.
+
+            :param processes.Snapshot snapshot: process table
+        """
+        now = snapshot.timestamp
+        capacity = self.capacity
+        for pid, ring in list(self._rings.items()):
+            process = snapshot.get(pid)
+            if process is None or process.cputime is None:
+                del self._rings[pid]
+                self._usage.pop(pid, None)
+                continue
+
+            # a new process with a reused pid starts a new history - its cpu time may be the only clue
+            last = 2 * ((ring.head - 1) % capacity) if ring is not None else 0
+            if (ring is None or ring.start != process.start or
+                    (ring.count > 0 and process.cputime < ring.samples[last + 1])):
+                ring = self._rings[pid] = _Ring(capacity, process.start)
+                self._usage.pop(pid, None)
+
+            samples = ring.samples
+            if ring.count > 0 and now - samples[last] < _MIN_SPACING:
+                continue
+            samples[2 * ring.head] = now
+            samples[2 * ring.head + 1] = process.cputime
+            ring.head = (ring.head + 1) % capacity
+            ring.count = min(ring.count + 1, capacity)
+            if ring.count < 2:
+                continue
+
+            # walk back from the newest sample: interval usages give the peak, the oldest sample inside each
+            # window gives its average - the closest older one if the window holds no older sample (samples
+            # farther apart than the window), and one sample closes all the windows it crosses
+            usage = {}
+            peak = 0.0
+            window = 0
+            (newer_time, newer_cpu) = (now, process.cputime)
+            for age in range(1, ring.count):
+                index = 2 * ((ring.head - 1 - age) % capacity)
+                (older_time, older_cpu) = (samples[index], samples[index + 1])
+                interval = _percent(newer_cpu - older_cpu, newer_time - older_time)
+                if age == 1:
+                    usage['PCpu'] = interval
+                peak = max(peak, interval)
+                while window < len(WINDOWS) and now - older_time > WINDOWS[window][0]:
+                    (span_time, span_cpu) = (older_time, older_cpu) if newer_time == now else (newer_time, newer_cpu)
+                    usage[WINDOWS[window][1]] = _percent(process.cputime - span_cpu, now - span_time)
+                    window += 1
+                if window == len(WINDOWS):
+                    break
+                (newer_time, newer_cpu) = (older_time, older_cpu)
+            # windows longer than the history use all of it
+            for (_, key) in WINDOWS[window:]:
+                usage[key] = _percent(process.cputime - newer_cpu, now - newer_time)
+            usage['PCpuPeak'] = peak
+            self._usage[pid] = usage
+
+
+########################################
+def _percent(cpu_time: float, duration: float):
+    """ Cpu usage in % rounded to one decimal
+
+        :param float cpu_time: cpu seconds spent
+        :param float duration: wall clock seconds
+        :returns float: usage
+    """
+    if duration <= 0:
+        return 0.0
+    return round(max(cpu_time, 0) * 100 / duration, 1)
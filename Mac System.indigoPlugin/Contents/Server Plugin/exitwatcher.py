@@ -0,0 +1,212 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in process exit watcher
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import select
+import threading
+import time
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# an exit is reported once: the pid is not watched again during this number of seconds (zombies, pid reuse)
+_REPORTED_TTL = 300
+
+
+########################################
+class ExitWatcher:
+    """ Watch running processes and report their exit as soon as it happens
+
+        One thread multiplexes all the watched pids: kqueue EVFILT_PROC/NOTE_EXIT on macOS, pidfd_open and poll on
+        Linux. Exits are collected until the polling thread reads them; event is set on each exit so that the polling
+        thread can wake up - it is up to the polling thread to clear it.
+    """
+    def __init__(self, event: threading.Event = None):
+        """ Constructor
+
+            :param threading.Event event: event set on each exit, a new one if None
+        """
+        if hasattr(select, 'kqueue'):
+            self.method = 'kqueue'
+        elif hasattr(os, 'pidfd_open') and hasattr(select, 'poll'):
+            self.method = 'pidfd'
+        else:
+            self.method = None
+
+        self.event = threading.Event() if event is None else event
+        self._lock = threading.Lock()
+        self._watched = {}          # pid -> pidfd (pidfd method) or None (kqueue method)
+        self._pidfds = {}           # pidfd -> pid
+        self._exited = set()
+        self._reported = {}         # pid -> time its exit was reported
+        self._thread = None
+        self._stopping = False
+        self._kqueue = None
+        self._poll = None
+        self._wakeup_read, self._wakeup_write = (None, None)
+
+    @property
+    def supported(self):
+        """ True if this system can watch processes """
+        return self.method is not None
+
+    def start(self):
+        """ Start the watcher thread """
+        if not self.supported:
+            core.logger(trace_log='process exit watching is not supported on this system')
+            return
+
+        self._stopping = False
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        if self.method == 'kqueue':
+            self._kqueue = select.kqueue()
+            self._kqueue.control([select.kevent(self._wakeup_read, select.KQ_FILTER_READ, select.KQ_EV_ADD)], 0)
+        else:
+            self._poll = select.poll()
+            self._poll.register(self._wakeup_read, select.POLLIN)
+
+        self._thread = threading.Thread(target=self._run, name='process exit watcher', daemon=True)
+        self._thread.start()
+        core.logger(trace_log=f'process exit watcher started using {self.method}')
+
+    def stop(self):
+        """ Stop the watcher thread and forget all the watched processes """
+        if self._thread is None:
+            return
+        self._stopping = True
+        os.write(self._wakeup_write, b'x')
+        self._thread.join(2)
+        self._thread = None
+
+        with self._lock:
+            for pidfd in self._pidfds:
+                os.close(pidfd)
+            self._pidfds.clear()
+            self._watched.clear()
+        if self._kqueue is not None:
+            self._kqueue.close()
+            self._kqueue = None
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+    def watch(self, pid: int):
+        """ Start watching a running process
+
+            :param int pid: process id
+            :returns bool: True if the process is watched (or already ended and reported now), False if it cannot be
+                           watched or its exit has already been reported
+        """
+        if self._thread is None:
+            return False
+
+        with self._lock:
+            if pid in self._watched:
+                return True
+            reported = self._reported.get(pid)
+            if reported is not None:
+                if time.time() - reported < _REPORTED_TTL:
+                    # ended but still listed (zombie): reporting it again would wake the polling thread in a loop
+                    return False
+                # the pid may have been reused since
+                del self._reported[pid]
+            try:
+                if self.method == 'kqueue':
+                    self._kqueue.control(
+                        [select.kevent(
+                            pid, select.KQ_FILTER_PROC, select.KQ_EV_ADD | select.KQ_EV_ONESHOT, select.KQ_NOTE_EXIT
+                        )], 0
+                    )
+                    self._watched[pid] = None
+                else:
+                    pidfd = os.pidfd_open(pid)
+                    self._watched[pid] = pidfd
+                    self._pidfds[pidfd] = pid
+                    self._poll.register(pidfd, select.POLLIN)
+                    # poll takes the new fd in account on its next call
+                    os.write(self._wakeup_write, b'x')
+            except ProcessLookupError:
+                # already ended
+                self._exited.add(pid)
+                self._reported[pid] = time.time()
+                self.event.set()
+                return True
+            except OSError as err:
+                core.logger(trace_log=f'process {pid} cannot be watched because {err}')
+                return False
+
+        core.logger(trace_log=f'watching process {pid} exit')
+        return True
+
+    def is_watched(self, pid: int):
+        """ True if the process is running and watched
+
+            :param int pid: process id
+        """
+        return pid in self._watched
+
+    def exited(self):
+        """ Processes that ended since the last call
+
+            :returns set: pids
+        """
+        with self._lock:
+            exited = self._exited
+            self._exited = set()
+            now = time.time()
+            for pid in [pid for pid, reported in self._reported.items() if now - reported >= _REPORTED_TTL]:
+                del self._reported[pid]
+        return exited
+
+    def _ended(self, pid: int):
+        """ Record the exit of a process
+
+            :param int pid: process id
+        """
+        with self._lock:
+            pidfd = self._watched.pop(pid, None)
+            if pidfd is not None:
+                del self._pidfds[pidfd]
+                self._poll.unregister(pidfd)
+                os.close(pidfd)
+            self._exited.add(pid)
+            self._reported[pid] = time.time()
+            self.event.set()
+        core.logger(trace_log=f'process {pid} exit detected')
+
+    def _run(self):
+        """ Watcher thread """
+        while not self._stopping:
+            if self.method == 'kqueue':
+                for event in self._kqueue.control(None, 64, None):
+                    if event.filter == select.KQ_FILTER_PROC:
+                        self._ended(event.ident)
+                    else:
+                        os.read(self._wakeup_read, 64)
+            else:
+                for (fd, _) in self._poll.poll():
+                    if fd == self._wakeup_read:
+                        os.read(self._wakeup_read, 64)
+                        continue
+                    pid = self._pidfds.get(fd)
+                    if pid is not None:
+                        self._ended(pid)
@@ -0,0 +1,249 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in host settings
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Host wide settings are read in one command, parsed once in a typed dictionary and shared until they are too old.
+    Host metrics (load, memory, swap) are read the same way, in one command on macOS and without any on Linux.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import re
+import sys
+import time
+from bipIndigoFramework import core, shellscript
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# " sleep                0 (sleep prevented by coreaudiod)" -> key, value, note
+_repSetting = re.compile(r"^\s+(\S.*?)\s+(-?[0-9]+|\S+)(?:\s+\((.*)\))?\s*$")
+# "{ sec = 1445000000, usec = 0 } Fri Oct 16 ..." -> sec
+_repBootTime = re.compile(r"sec = ([0-9]+)")
+# "vm.swapusage: total = 2048.00M  used = 1024.50M  free = 1023.50M  (encrypted)" -> name, value, unit
+_repSwapUsage = re.compile(r"(total|used|free) = ([0-9.]+)([KMGT]?)")
+# "Pages free:                               12345." -> name, count
+_repVmStat = re.compile(r"^(.+?):\s+([0-9]+)\.?$", re.MULTILINE)
+_UNITS = {'': 1, 'K': 1024, 'M': 1048576, 'G': 1073741824, 'T': 1099511627776}
+# host metrics command on macOS: sysctl values then vm_stat pages counts
+HOST_METRICS_COMMAND = 'sysctl hw.memsize kern.memorystatus_level vm.swapusage 2>/dev/null; vm_stat'
+
+
+########################################
+def boot_time():
+    """ Time the host started, from sysctl on macOS and /proc/stat elsewhere
+
+        :returns int: boot time (epoch), 0 if unknown
+    """
+    if sys.platform == 'darwin':
+        boottime = shellscript.run(pscript='sysctl -n kern.boottime')
+        match = _repBootTime.search(boottime or '')
+        return int(match.group(1)) if match is not None else 0
+    try:
+        with open('/proc/stat', 'rb') as stat_file:
+            for line in stat_file:
+                if line.startswith(b'btime '):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+########################################
+def parse_settings(text: str):
+    """ Parse "key value (note)" lines as printed by pmset -g, header lines are ignored
+
+        :param str text: command output
+        :returns tuple: (settings dictionary with integer values when numeric, notes dictionary)
+    """
+    settings = {}
+    notes = {}
+    for line in text.split('\n'):
+        match = _repSetting.match(line)
+        if match is None:
+            continue
+        (key, value, note) = match.groups()
+        try:
+            settings[key] = int(value)
+        except ValueError:
+            settings[key] = value
+        if note:
+            notes[key] = note
+    return settings, notes
+
+
+########################################
+def parse_host_memory(text: str):
+    """ Parse the output of HOST_METRICS_COMMAND, as printed on macOS
+
+        :param str text: command output
+        :returns dict: memory and swap sizes in bytes (memTotal, memAvailable, swapTotal, swapUsed) and memory pressure
+                       in % (memPressure), only the ones found
+    """
+    sysctl = {}
+    for line in text.split('\n'):
+        (name, sep, value) = line.partition(': ')
+        if sep and '.' in name and ' ' not in name:
+            sysctl[name] = value.strip()
+
+    memory = {}
+    if sysctl.get('hw.memsize', '').isdigit():
+        memory['memTotal'] = int(sysctl['hw.memsize'])
+    if sysctl.get('kern.memorystatus_level', '').isdigit():
+        # percentage of memory free as seen by the memory pressure monitor
+        memory['memPressure'] = 100 - int(sysctl['kern.memorystatus_level'])
+    swapusage = _repSwapUsage.findall(sysctl.get('vm.swapusage', ''))
+    swap = {name: float(value) * _UNITS[unit] for (name, value, unit) in swapusage}
+    if 'total' in swap and 'used' in swap:
+        memory['swapTotal'] = int(swap['total'])
+        memory['swapUsed'] = int(swap['used'])
+
+    # "Mach Virtual Memory Statistics: (page size of 16384 bytes)"
+    page_size = re.search(r"page size of ([0-9]+) bytes", text)
+    pages = {name.strip('" '): int(count) for (name, count) in _repVmStat.findall(text)}
+    if page_size is not None and 'Pages free' in pages:
+        # free pages, and pages the system can reclaim without swapping
+        available = sum(pages.get(name, 0) for name in ('Pages free', 'Pages inactive', 'Pages speculative'))
+        memory['memAvailable'] = available * int(page_size.group(1))
+    return memory
+
+
+########################################
+def parse_meminfo(text: str):
+    """ Parse /proc/meminfo, as on Linux
+
+        :param str text: file content
+        :returns dict: memory and swap sizes in bytes (memTotal, memAvailable, swapTotal, swapUsed), only the ones found
+    """
+    values = {}
+    for line in text.split('\n'):
+        fields = line.split()
+        if len(fields) >= 2 and fields[1].isdigit():
+            values[fields[0].rstrip(':')] = int(fields[1]) * 1024
+
+    memory = {}
+    for (key, name) in (('memTotal', 'MemTotal'), ('memAvailable', 'MemAvailable'), ('swapTotal', 'SwapTotal')):
+        if name in values:
+            memory[key] = values[name]
+    if 'SwapTotal' in values and 'SwapFree' in values:
+        memory['swapUsed'] = values['SwapTotal'] - values['SwapFree']
+    return memory
+
+
+########################################
+class HostMetrics:
+    """ Load, memory and swap of the host, read at most once per ttl """
+    def __init__(self, ttl: float = 10, meminfo: str = '/proc/meminfo'):
+        """ Constructor
+
+            :param float ttl: time in seconds during which the metrics are reused
+            :param str meminfo: memory information file, used when not on macOS
+        """
+        self.ttl = ttl
+        self.meminfo = meminfo
+        self._timestamp = 0
+        self._metrics = None
+
+    def _memory(self):
+        """ Memory and swap, from one command on macOS and from the meminfo file elsewhere
+
+            :returns dict: as parse_host_memory, None if they cannot be read
+        """
+        if sys.platform == 'darwin':
+            output = shellscript.run(HOST_METRICS_COMMAND)
+            return None if output is None else parse_host_memory(output)
+        try:
+            with open(self.meminfo) as meminfo_file:
+                return parse_meminfo(meminfo_file.read())
+        except OSError as err:
+            core.logger(err_log=f'cannot read {self.meminfo} because {err}')
+            return None
+
+    def metrics(self):
+        """ Current metrics
+
+            :returns dict: load1, load5, load15, and the memory and swap values, or None if they cannot be read
+        """
+        if self._metrics is None or time.time() - self._timestamp >= self.ttl:
+            memory = self._memory()
+            if memory is None:
+                return self._metrics
+            (memory['load1'], memory['load5'], memory['load15']) = os.getloadavg()
+            if 'memPressure' not in memory and memory.get('memTotal') and 'memAvailable' in memory:
+                # no pressure level on this system, the share of memory not available instead
+                memory['memPressure'] = round(100 - memory['memAvailable'] * 100 / memory['memTotal'])
+            self._metrics = memory
+            self._timestamp = time.time()
+            core.logger(trace_log='host metrics read')
+        return self._metrics
+
+
+########################################
+class PowerSettings:
+    """ Power management settings of the host (pmset -g), read at most once per ttl """
+    def __init__(self, ttl: float = 60, command: str = 'pmset -g'):
+        """ Constructor
+
+            :param float ttl: time in seconds during which the settings are reused
+            :param str command: command printing the settings
+        """
+        self.ttl = ttl
+        self.command = command
+        self._timestamp = 0
+        self._settings = None
+        self._notes = {}
+
+    def invalidate(self):
+        """ Read the settings again on next request """
+        self._timestamp = 0
+
+    def settings(self):
+        """ Current settings
+
+            :returns dict: setting name -> value (int or str), or None if they cannot be read
+        """
+        if self._settings is None or time.time() - self._timestamp >= self.ttl:
+            output = shellscript.run(self.command)
+            if output is None:
+                return self._settings
+            (self._settings, self._notes) = parse_settings(output)
+            self._timestamp = time.time()
+            core.logger(trace_log=f'{len(self._settings)} power settings read')
+        return self._settings
+
+    def get(self, key: str, default=None):
+        """ One setting
+
+            :param str key: setting name, as disksleep
+            :param default: value returned if the setting is unknown
+            :returns: the setting value
+        """
+        settings = self.settings()
+        if settings is None:
+            return default
+        return settings.get(key, default)
+
+    def note(self, key: str):
+        """ Note printed after the value of a setting, as "sleep prevented by coreaudiod"
+
+            :param str key: setting name
+            :returns str: the note, '' if none
+        """
+        self.settings()
+        return self._notes.get(key, '')
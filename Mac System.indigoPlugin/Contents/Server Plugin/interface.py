@@ -18,27 +18,338 @@
 """
 ####################################################################################
 
+import os
 import re
 import pipes
+import sys
+import threading
 import time
-from bipIndigoFramework import osascript, shellscript
+import cpuhistory
+import exitwatcher
+import hostinfo
+import keepalive
+import processes
+import usagehistory
+import volumewatcher
+from bipIndigoFramework import asyncengine, capture, core, osascript, shellscript, transport
 
-try:
-    from shlex import quote as cmd_quote
-except ImportError:
-    from pipes import quote as cmd_quote
 
-
-_repProcessStatus = re.compile(r" *([0-9]+) +(.).+$")
-_repProcessData = re.compile(r"(.+?)  +([0-9.,]+) +([0-9.,]+) +(.+)$")
 _repVolumeData2 = re.compile(r".+? [0-9]+ +([0-9]+) +([0-9]+) .+")
 
+# probes results are shared by all devices during one dialog cycle
+_PROBE_TTL = 5
+_TAG_PROCESS = 'process'
+_TAG_VOLUME = 'volume'
+_TAG_LAUNCHD = 'launchd'
+# system commands and folders - module variables so that they can be redirected (benchmarks, other systems)
+VOLUMES_DIR = '/Volumes'
+DISKUTIL = '/usr/sbin/diskutil'
+DF = '/bin/df'
+# size of the blocks counted by df
+DF_BLOCK_SIZE = 512
+if sys.platform == 'darwin':
+    LAUNCHCTL = 'launchctl'
+else:
+    # stand-in listing the running processes as jobs
+    LAUNCHCTL = pipes.quote(sys.executable) + ' ' + pipes.quote(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'launchctlhelper.py')
+    )
+
+# source of the process table, see processes.get_source
+_processSource = processes.PsSource(_PROBE_TTL)
+# process tables of the remote hosts: host -> processes.PsSource
+_hostSources = {}
+# events that should wake the dialog thread up: process exits, mounts and unmounts
+_wakeEvent = threading.Event()
+# running processes of the devices, watched to detect their exit immediately
+_exitWatcher = exitwatcher.ExitWatcher(_wakeEvent)
+# cpu time history of the running processes of the devices
+_cpuHistory = cpuhistory.CpuHistory()
+# launchd jobs indexes built from the last "launchctl list" output of each host, None for this host:
+# host -> (output, {label: (pid, last exit status)})
+_launchdJobs = {}
+# power management settings of the host
+_powerSettings = hostinfo.PowerSettings()
+# load, memory and swap of the host
+_hostMetrics = hostinfo.HostMetrics()
+# keep-alive checks of the volumes that should not sleep
+_keepAlive = keepalive.KeepAlive()
+# mounted volumes, updated as soon as a volume is mounted or unmounted
+_volumeWatcher = volumewatcher.VolumeWatcher(VOLUMES_DIR, event=_wakeEvent)
+# used bytes history of the volumes: device id -> usagehistory.UsageHistory
+_usageHistories = {}
+_historyFolder = None
+
+
+def init(process_source='ps', applescript_host=False, capture_mode=None, capture_path=None, history_folder=None):
+    """ Standard init method
+
+        Args:
+            process_source: name of the process table source, see processes.get_source
+            applescript_host: True to run applescripts in a persistent host
+            capture_mode: None, 'record' or 'replay' the commands output, see capture
+            capture_path: capture file, or None for the default one
+            history_folder: folder of the volumes usage history files, or None for the default one
+    """
+    global _processSource, _cpuHistory, _historyFolder
 
-def init():
-    """ Standard init method """
-    osascript.init()
+    capture.init(capture_mode, capture_path)
+    osascript.init(use_host=applescript_host)
     shellscript.init()
 
+    _processSource.stop()
+    _processSource = processes.get_source(process_source)
+    core.logger(trace_log=f'process table source is {_processSource.name}')
+    _processSource.start()
+    _cpuHistory = cpuhistory.CpuHistory()
+
+    _exitWatcher.stop()
+    _exitWatcher.start()
+
+    _volumeWatcher.stop()
+    _volumeWatcher.mount_dir = VOLUMES_DIR
+    _volumeWatcher.start()
+
+    _historyFolder = history_folder
+
+
+def prewarm():
+    """ Reads the process table and the volumes probes in the background, so that they are ready for the first cycle
+        of the dialog thread while the devices are started
+    """
+    def _prewarm():
+        _processSource.snapshot()
+        _processSource.prefetch_start_times()
+        _probe(_probeCommands()['disks'], _TAG_VOLUME)
+        _probe(_probeCommands()['free'], _TAG_VOLUME)
+        core.logger(trace_log='process table and volumes probes read')
+
+    threading.Thread(target=_prewarm, name='prewarm', daemon=True).start()
+
+
+def shutdown():
+    """ Standard shutdown method """
+    _volumeWatcher.stop()
+    _exitWatcher.stop()
+    _processSource.stop()
+    osascript.shutdown()
+    transport.shutdown()
+    for history in _usageHistories.values():
+        history.close()
+    _usageHistories.clear()
+    capture.stop()
+
+
+def wakeEvent():
+    """ Event set when something happened that the dialog thread should process without waiting """
+    return _wakeEvent
+
+
+def processExits():
+    """ Returns the processes that ended since the last call - to be called first in the dialog loop
+
+        Returns:
+            set of process ids
+    """
+    _wakeEvent.clear()
+    exited = _exitWatcher.exited()
+    if len(exited) > 0:
+        # the process table is obsolete
+        _processSource.invalidate()
+        shellscript.invalidate(_TAG_PROCESS)
+    return exited
+
+
+def sampleCpu(read_data=False):
+    """ Records the cpu time of the running processes of the devices - to be called once in the dialog loop
+        A process table read by ps is not read only for this: it is sampled when it is already read for the devices,
+        and at each data read. The other sources are sampled on every cycle.
+
+        Args:
+            read_data: True if the data of the process devices are read in this cycle
+    """
+    if not _cpuHistory.tracked():
+        return
+    if (not read_data and _processSource.name == 'ps' and _processSource.needs_capture() and
+            not shellscript.is_cached(processes.PS_COMMAND)):
+        return
+    snapshot = _processSource.snapshot()
+    if snapshot is not None:
+        _cpuHistory.update(snapshot)
+
+
+def volumeChanges():
+    """ Returns the volumes mounted or unmounted since the last call
+
+        Returns:
+            set of volume names
+    """
+    return _volumeWatcher.changed()
+
+
+def isProcessWatched(pid):
+    """ True if the process is known to be running, its exit being watched
+
+        Args:
+            pid: process id
+    """
+    return _exitWatcher.is_watched(pid)
+
+
+def processStartTimes():
+    """ Returns the process start times read so far, to be kept across a restart
+
+        Returns:
+            dictionary of process id: (start time, start time as text)
+    """
+    return _processSource.start_times()
+
+
+def restoreProcessStartTimes(start_times):
+    """ Reuse the process start times read before a restart, saving one ps per process
+
+        Args:
+            start_times: dictionary of process id: (start time, start time as text)
+    """
+    _processSource.restore_start_times(start_times)
+    core.logger(trace_log=f'{len(start_times)} process start times restored')
+
+
+def invalidate(dev):
+    """ Forget the shared probes results the device relies on, typically after an action on it
+
+        Args:
+            dev: current device
+    """
+    if dev.deviceTypeId == 'bip.ms.volume':
+        shellscript.invalidate(_TAG_VOLUME)
+    else:
+        shellscript.invalidate(_TAG_PROCESS)
+        shellscript.invalidate(_TAG_LAUNCHD)
+        _source(deviceHost(dev)).invalidate()
+
+
+def deviceHost(dev):
+    """ Returns the host the device is on, as set in its host property
+
+        Args:
+            dev: current device
+        Returns:
+            ssh host name, or None if the device is on this Mac
+    """
+    return dev.pluginProps.get('host', '').strip() or None
+
+
+def _source(host):
+    """ Returns the process table source of a host, created the first time
+
+        Args:
+            host: ssh host name, or None for this Mac
+    """
+    if host is None:
+        return _processSource
+    source = _hostSources.get(host)
+    if source is None:
+        source = processes.PsSource(_PROBE_TTL, host=host)
+        _hostSources[host] = source
+    return source
+
+
+def _probe(pscript, tag, host=None):
+    """ Run a read only shell script, sharing its result with any other device asking for it in the cycle
+
+        Args:
+            pscript: shell script as text
+            tag: cache tag of the probe
+            host: host to run the script on, or None for this Mac
+        Returns:
+            the script output as text, or None if error
+    """
+    return shellscript.run(pscript, cache_ttl=_PROBE_TTL, cache_tag=tag, host=host)
+
+
+def _probeCommands(host=None):
+    """ Returns the shell scripts of the shared probes of a host
+
+        Args:
+            host: ssh host name, or None for this Mac
+        Returns:
+            dictionary of launchd, volumes, disks and free: shell script - remote hosts being Macs
+    """
+    if host is None:
+        return {
+            'launchd': f"{LAUNCHCTL} list",
+            'volumes': f"ls -1 {pipes.quote(VOLUMES_DIR)}",
+            'disks': f"{DISKUTIL} list",
+            'free': DF
+        }
+    return {
+        'launchd': 'launchctl list',
+        'volumes': 'ls -1 /Volumes',
+        'disks': '/usr/sbin/diskutil list',
+        'free': '/bin/df'
+    }
+
+
+def prefetchProbes(devices, exited_pids, read_processes, read_volumes):
+    """ Runs at once, concurrently, the probes the devices will ask for in this cycle, so that each device then
+        finds their results in the shared results
+
+        Args:
+            devices: the devices of the plugin
+            exited_pids: processes that ended since the last cycle
+            read_processes: True if the data of the process devices are read in this cycle
+            read_volumes: True if the data of the volume devices are read in this cycle
+        Returns:
+            number of probes run
+    """
+    probes = []
+
+    def add(pscript, tag, host):
+        probes.append((pscript, _PROBE_TTL, tag, host))
+
+    # the cpu history samples the local process table at each data read
+    need_table = {None} if _cpuHistory.tracked() and read_processes else set()
+    for dev in devices:
+        if not (dev.configured and dev.enabled):
+            continue
+        host = deviceHost(dev)
+        if dev.deviceTypeId in ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon'):
+            pid = int(dev.states['ProcessID'] or 0)
+            if not (read_processes or pid in exited_pids or host is not None or not isProcessWatched(pid)):
+                continue
+            if dev.deviceTypeId == 'bip.ms.daemon' and dev.pluginProps.get('statusSource') == 'launchd':
+                add(_probeCommands(host)['launchd'], _TAG_LAUNCHD, host)
+            else:
+                need_table.add(host)
+        elif dev.deviceTypeId == 'bip.ms.volume':
+            if host is not None or not _volumeWatcher.running:
+                add(_probeCommands(host)['volumes'], _TAG_VOLUME, host)
+            if read_volumes:
+                add(_probeCommands(host)['disks'], _TAG_VOLUME, host)
+                add(_probeCommands(host)['free'], _TAG_VOLUME, host)
+
+    # process tables read by ps, only when the source would read it again
+    for host in need_table:
+        source = _source(host)
+        if source.name == 'ps' and source.needs_capture():
+            add(processes.PS_COMMAND, _TAG_PROCESS, host)
+
+    return asyncengine.prefetch(probes)
+
+
+def _grep(text, pattern):
+    """ Returns the first line of the text matching the pattern, or '' if none
+
+        Args:
+            text: multi-lines text
+            pattern: regular expression, searched in each line
+    """
+    match = re.search(pattern, text, re.MULTILINE)
+    if match is None:
+        return ''
+    return text[text.rfind('\n', 0, match.start()) + 1:].split('\n', 1)[0]
+
 
 ##########
 # Application device
@@ -65,26 +376,105 @@ def getProcessStatus(dev, values_dict):
             success: True if success, False if not
             values_dict updated with new data if success, equals to the input if not
     """
+    if dev.deviceTypeId == 'bip.ms.daemon' and dev.pluginProps.get('statusSource') == 'launchd':
+        return getLaunchdStatus(dev, values_dict)
+
+    host = deviceHost(dev)
     repProcessName = f" {dev.pluginProps['ApplicationProcessName']}( -psn[0-9_]*)*$"
-    pslist = shellscript.run(
-        f"ps -awxc -opid,state,args | egrep {cmd_quote(repProcessName)}", _repProcessStatus, ['ProcessID', 'PStatus']
-    )
+    # one process table for all the devices of a host
+    snapshot = _source(host).snapshot()
+    if snapshot is None:
+        return False, values_dict
+    process = snapshot.find(repProcessName)
 
-    if pslist['ProcessID'] == '':
+    if process is None:
         values_dict['onOffState'] = False
         values_dict['ProcessID'] = 0
         values_dict['PStatus'] = "off"
     else:
         values_dict['onOffState'] = True
-        values_dict.update(pslist)
+        values_dict['ProcessID'] = str(process.pid)
+        # a zombie has already ended: watching it would report its exit on every pass
+        if host is None and process.state != 'Z':
+            _exitWatcher.watch(process.pid)
+            _cpuHistory.track(process.pid)
         # special update for process status
-        p_status = values_dict['PStatus']
-        values_dict['PStatus'] = pStatusDict.get(p_status, f"unknown code - {p_status}")
+        values_dict['PStatus'] = pStatusDict.get(process.state, f"unknown code - {process.state}")
 
     return True, values_dict
 
 
-def getProcessData(values_dict):
+def launchdJobs(host=None):
+    """ Returns the launchd jobs, read once per cycle for all the daemons of a host
+
+        Args:
+            host: ssh host name, or None for this Mac
+        Returns:
+            dictionary of job label: (process id or 0 if not running, last exit status), or None if error
+    """
+    joblist = _probe(_probeCommands(host)['launchd'], _TAG_LAUNCHD, host)
+    if joblist is None:
+        return None
+    (known, jobs) = _launchdJobs.get(host, (None, {}))
+    # each call returns a new string, even from the shared result: compared by value, far cheaper than parsing
+    if joblist != known:
+        jobs = parseLaunchdJobs(joblist)
+        _launchdJobs[host] = (joblist, jobs)
+    return jobs
+
+
+def parseLaunchdJobs(joblist):
+    """ Parse the output of launchctl list
+
+        Args:
+            joblist: launchctl list output, header line included
+        Returns:
+            dictionary of job label: (process id or 0 if not running, last exit status)
+    """
+    jobs = {}
+    for line in joblist.split('\n')[1:]:
+        fields = line.split('\t')
+        if len(fields) == 3:
+            jobs[fields[2]] = (
+                int(fields[0]) if fields[0].isdigit() else 0,
+                int(fields[1]) if fields[1].lstrip('-').isdigit() else 0
+            )
+    return jobs
+
+
+def getLaunchdStatus(dev, values_dict):
+    """ Finds the daemon in the launchd jobs and returns onOff states
+
+        Args:
+            dev: current device
+            values_dict: dictionary of the status values so far
+        Returns:
+            success: True if success, False if not
+            values_dict updated with new data if success, equals to the input if not
+    """
+    host = deviceHost(dev)
+    jobs = launchdJobs(host)
+    if jobs is None:
+        return False, values_dict
+    (pid, status) = jobs.get(dev.pluginProps['launchdLabel'], (0, 0))
+
+    values_dict['LastExitStatus'] = status
+    if pid == 0:
+        values_dict['onOffState'] = False
+        values_dict['ProcessID'] = 0
+        values_dict['PStatus'] = "off"
+    else:
+        values_dict['onOffState'] = True
+        values_dict['ProcessID'] = str(pid)
+        values_dict['PStatus'] = "running"
+        if host is None:
+            _exitWatcher.watch(pid)
+            _cpuHistory.track(pid)
+
+    return True, values_dict
+
+
+def getProcessData(dev, values_dict):
     """ Searches for the task in system tasklist and returns states data
 
         Args:
@@ -94,13 +484,13 @@ def getProcessData(values_dict):
             success: True if success, False if not
             values_dict updated with new data if success, equals to the input if not
     """
-    pslist = shellscript.run(
-        pscript=f"ps -wxc -olstart,pcpu,pmem,etime -p{values_dict['ProcessID']} | sed 1d",
-        rule=_repProcessData,
-        akeys=['LStart', 'PCpu', 'PMem', 'ETime']
-    )
+    host = deviceHost(dev)
+    pslist = _source(host).details(int(values_dict['ProcessID']))
 
-    if pslist['LStart'] == '':
+    if pslist is None:
+        return False, values_dict
+
+    if len(pslist) == 0:
         values_dict['onOffState'] = False
         values_dict['ProcessID'] = 0
         values_dict['PStatus'] = "off"
@@ -108,20 +498,175 @@ def getProcessData(values_dict):
         values_dict['ETime'] = 0
         values_dict['PCpu'] = 0
         values_dict['PMem'] = 0
+        for (_, key) in cpuhistory.WINDOWS:
+            values_dict[key] = 0
+        values_dict['PCpuPeak'] = 0
     else:
         values_dict.update(pslist)
-        # special update for elapsed time : convert to seconds
-        try:
-            (longday, longtime) = values_dict['ETime'].split('-')
-        except:
-            longtime = values_dict['ETime']
-            longday = 0
-        try:
-            (longh, longm, longs) = longtime.split(':')
-        except:
-            (longm, longs) = longtime.split(':')
-            longh = 0
-        values_dict['ETime'] = ((int(longday) * 24 + int(longh)) * 60 + int(longm)) * 60 + int(longs)
+        # usage measured from the cpu time history, when there is enough of it - local processes only
+        if host is None:
+            values_dict.update(_cpuHistory.usage(int(values_dict['ProcessID'])) or {})
+
+    return True, values_dict
+
+
+def getProcessGroupData(dev, values_dict):
+    """ Aggregates the data of the process and of all its child processes (helpers) from the process table
+
+        Args:
+            dev: current device
+            values_dict: dictionary of the status values so far
+        Returns:
+            success: True if success, False if not
+            values_dict updated with new data if success, equals to the input if not
+    """
+    snapshot = _source(deviceHost(dev)).snapshot()
+    if snapshot is None:
+        return False, values_dict
+
+    pid = int(values_dict.get('ProcessID') or 0)
+    process = snapshot.get(pid) if pid > 0 else None
+    if process is None:
+        values_dict['TotalCpu'] = 0
+        values_dict['TotalRss'] = 0
+        values_dict['ChildCount'] = 0
+    else:
+        group = [process] + snapshot.descendants(pid)
+        values_dict['TotalCpu'] = round(sum(member.pcpu or 0 for member in group), 1)
+        values_dict['TotalRss'] = round(sum(member.rss or 0 for member in group) / 1048576, 1)
+        values_dict['ChildCount'] = len(group) - 1
+
+    return True, values_dict
+
+
+##########
+# Top processes device
+########################
+TOP_MAX = 5
+
+
+def getTopProcesses(dev, values_dict):
+    """ Finds the processes using the most cpu and the most memory in the shared process table
+
+        Args:
+            dev: current device
+            values_dict: dictionary of the status values so far
+        Returns:
+            success: True if success, False if not
+            values_dict updated with new data if success, equals to the input if not
+    """
+    snapshot = _processSource.snapshot()
+    if snapshot is None:
+        return False, values_dict
+
+    count = min(int(dev.pluginProps.get('topCount', TOP_MAX)), TOP_MAX)
+    top_cpu = snapshot.top(count, 'pcpu')
+    top_mem = snapshot.top(count, 'rss')
+    for rank in range(1, TOP_MAX + 1):
+        if rank <= len(top_cpu):
+            values_dict[f'TopCpuName{rank}'] = top_cpu[rank - 1].args
+            values_dict[f'TopCpuValue{rank}'] = round(top_cpu[rank - 1].pcpu or 0, 1)
+        else:
+            values_dict[f'TopCpuName{rank}'] = ''
+            values_dict[f'TopCpuValue{rank}'] = 0
+        if rank <= len(top_mem):
+            values_dict[f'TopMemName{rank}'] = top_mem[rank - 1].args
+            values_dict[f'TopMemValue{rank}'] = round((top_mem[rank - 1].rss or 0) / 1048576, 1)
+        else:
+            values_dict[f'TopMemName{rank}'] = ''
+            values_dict[f'TopMemValue{rank}'] = 0
+
+    return True, values_dict
+
+
+##########
+# Power settings
+########################
+# pmset settings to device states
+powerStatesDict = {
+    'sleep': 'SystemSleep',
+    'displaysleep': 'DisplaySleep',
+    'disksleep': 'DiskSleep',
+    'standby': 'Standby',
+    'hibernatemode': 'HibernateMode',
+    'powernap': 'PowerNap',
+    'lowpowermode': 'LowPowerMode',
+    'womp': 'WakeOnLan',
+    'tcpkeepalive': 'TcpKeepAlive'
+}
+
+
+def getPowerSettings(refresh=False):
+    """ Returns the power management settings of the host, read once for all the users
+
+        Args:
+            refresh: True to read them again even if they are recent
+        Returns:
+            dictionary of setting name: value (int or str), or None if error
+    """
+    if refresh:
+        _powerSettings.invalidate()
+    return _powerSettings.settings()
+
+
+def getPowerStatus(values_dict):
+    """ Returns the power settings device states
+
+        Args:
+            values_dict: dictionary of the status values so far
+        Returns:
+            success: True if success, False if not
+            values_dict updated with new data if success, equals to the input if not
+    """
+    settings = _powerSettings.settings()
+    if settings is None:
+        return False, values_dict
+
+    for (key, state) in powerStatesDict.items():
+        value = settings.get(key, 0)
+        values_dict[state] = value if isinstance(value, int) else 0
+    # "sleep prevented by coreaudiod, powerd"
+    note = _powerSettings.note('sleep')
+    values_dict['SleepPreventedBy'] = note.partition('prevented by ')[2]
+
+    return True, values_dict
+
+
+##########
+# System device
+########################
+# host metrics to device states, sizes in bytes converted to MB
+systemStatesDict = {
+    'load1': ('LoadAvg1', 1),
+    'load5': ('LoadAvg5', 1),
+    'load15': ('LoadAvg15', 1),
+    'memTotal': ('MemTotal', 1048576),
+    'memAvailable': ('MemAvailable', 1048576),
+    'memPressure': ('MemPressure', 1),
+    'swapTotal': ('SwapTotal', 1048576),
+    'swapUsed': ('SwapUsed', 1048576)
+}
+
+
+def getSystemStatus(values_dict):
+    """ Returns the system device states: load, memory, swap and number of processes
+
+        Args:
+            values_dict: dictionary of the status values so far
+        Returns:
+            success: True if success, False if not
+            values_dict updated with new data if success, equals to the input if not
+    """
+    metrics = _hostMetrics.metrics()
+    if metrics is None:
+        return False, values_dict
+
+    for (key, (state, unit)) in systemStatesDict.items():
+        values_dict[state] = round(metrics.get(key, 0) / unit, 2)
+    # the process table shared with the process devices
+    snapshot = _processSource.snapshot()
+    if snapshot is not None:
+        values_dict['ProcessCount'] = len(snapshot.processes)
 
     return True, values_dict
 
@@ -139,8 +684,17 @@ def getVolumeStatus(dev, values_dict):
             success: True if success, False if not
             values_dict updated with new data if success, equals to the input if not
     """
-    # check if mounted
-    if shellscript.run(pscript=f"ls -1 /Volumes | grep ^{pipes.quote(dev.pluginProps['VolumeID'])}$") > '':
+    # check if mounted - the watcher knows, unless it is not running on this system or the volume is remote
+    host = deviceHost(dev)
+    if host is None and _volumeWatcher.running:
+        volumes = _volumeWatcher.volumes
+    else:
+        volumes = _probe(_probeCommands(host)['volumes'], _TAG_VOLUME, host)
+        if volumes is None:
+            return False, values_dict
+        volumes = volumes.split('\n')
+
+    if dev.pluginProps['VolumeID'] in volumes:
         values_dict['onOffState'] = True
         values_dict['VStatus'] = "on"
     else:
@@ -159,11 +713,11 @@ def getVolumeData(dev, values_dict):
             success: True if success, False if not
             values_dict updated with new data if success, equals to the input if not
         """
-    pslist = shellscript.run(
-        pscript=f"/usr/sbin/diskutil list | grep {pipes.quote(dev.pluginProps['VolumeID'])}",
-        rule=[(6, 32), (57, 67), (68, -1)],
-        akeys=['VolumeType', 'VolumeSize', 'VolumeDevice']
-    )
+    host = deviceHost(dev)
+    disklist = _probe(_probeCommands(host)['disks'], _TAG_VOLUME, host)
+    if disklist is None:
+        return False, values_dict
+    pslist = parseDiskList(disklist, dev.pluginProps['VolumeID'])
 
     if pslist['VolumeDevice'] == '':
         values_dict['onOffState'] = False
@@ -171,11 +725,16 @@ def getVolumeData(dev, values_dict):
     else:
         values_dict.update(pslist)
         # find free space
-        pslist = shellscript.run(
-            pscript=f"/bin/df | grep '{values_dict['VolumeDevice']}'", rule=_repVolumeData2, akeys=['Used', 'Available']
-        )
+        dflist = _probe(_probeCommands(host)['free'], _TAG_VOLUME, host)
+        if dflist is None:
+            return False, values_dict
+        pslist = parseDiskFree(dflist, values_dict['VolumeDevice'])
         if pslist['Used'] != '':
             values_dict['pcUsed'] = (int(pslist['Used']) * 100) / (int(pslist['Used']) + int(pslist['Available']))
+            values_dict = getVolumeForecast(
+                dev, values_dict,
+                int(pslist['Used']) * DF_BLOCK_SIZE, (int(pslist['Used']) + int(pslist['Available'])) * DF_BLOCK_SIZE
+            )
             values_dict['onOffState'] = True
             values_dict['VStatus'] = 'on'
         else:
@@ -185,8 +744,126 @@ def getVolumeData(dev, values_dict):
     return True, values_dict
 
 
+def _usageHistoryFolder():
+    """ Returns the folder of the volumes usage history files """
+    return usagehistory.default_folder() if _historyFolder is None else _historyFolder
+
+
+def deleteVolumeHistory(dev):
+    """ Deletes the usage history file of a volume device
+
+        Args:
+            dev: deleted device
+    """
+    history = _usageHistories.pop(dev.id, None)
+    if history is None:
+        history = usagehistory.UsageHistory(usagehistory.file_path(_usageHistoryFolder(), dev.id))
+    history.delete()
+
+
+def pruneVolumeHistories(devices):
+    """ Deletes the usage history files of the volume devices deleted while the plugin was not running
+
+        Args:
+            devices: the devices of the plugin
+    """
+    usagehistory.prune(_usageHistoryFolder(), [dev.id for dev in devices if dev.deviceTypeId == 'bip.ms.volume'])
+
+
+def getVolumeForecast(dev, values_dict, used, capacity):
+    """ Adds the used bytes to the volume history and returns the fill rate and time to full states
+
+        Args:
+            dev: current device
+            values_dict: dictionary of the status values so far
+            used: used bytes
+            capacity: volume size in bytes
+        Returns:
+            values_dict updated with FillRate (MB per hour), TimeToFull (hours, 0 if not filling) and FullDate
+    """
+    history = _usageHistories.get(dev.id)
+    if history is None:
+        history = usagehistory.UsageHistory(usagehistory.file_path(_usageHistoryFolder(), dev.id))
+        _usageHistories[dev.id] = history
+
+    now = time.time()
+    history.add(now, used)
+    forecast = history.forecast(capacity, now)
+    if forecast is None:
+        # not enough history yet
+        return values_dict
+
+    (rate, time_to_full) = forecast
+    values_dict['FillRate'] = round(rate / 1048576, 1)
+    if time_to_full is None:
+        values_dict['TimeToFull'] = 0
+        values_dict['FullDate'] = ''
+    else:
+        values_dict['TimeToFull'] = round(time_to_full / 3600, 1)
+        values_dict['FullDate'] = time.strftime('%c', time.localtime(now + time_to_full))
+    return values_dict
+
+
+def parseDiskList(disklist, volume_id):
+    """ Finds a volume in the output of diskutil list
+
+        Args:
+            disklist: diskutil list output
+            volume_id: volume name
+        Returns:
+            dictionary of VolumeType, VolumeSize and VolumeDevice, empty strings if the volume is not found
+    """
+    return shellscript.parse(
+        _grep(disklist, re.escape(volume_id)),
+        rule=[(6, 32), (57, 67), (68, None)],
+        akeys=['VolumeType', 'VolumeSize', 'VolumeDevice']
+    )
+
+
+def parseDiskFree(dflist, volume_device):
+    """ Finds a device in the output of df
+
+        Args:
+            dflist: df output
+            volume_device: device name, as disk2s1
+        Returns:
+            dictionary of Used and Available blocks, empty strings if the device is not found
+    """
+    return shellscript.parse(_grep(dflist, re.escape(volume_device)), rule=_repVolumeData2, akeys=['Used', 'Available'])
+
+
+def setDiskSleepTime(disk_sleep):
+    """ Sets the keep-alive interval of the kept-awake disks from the disk sleep setting
+
+        Args:
+            disk_sleep: disk sleep time in minutes, 0 if disks never sleep
+    """
+    if disk_sleep > 0:
+        _keepAlive.changeInterval((disk_sleep - 1) * 60)
+    else:
+        _keepAlive.changeInterval(600)
+
+
+def keepAliveChecks():
+    """ Returns the next keep-alive check of the volumes, to be kept across a restart
+
+        Returns:
+            dictionary of device id: time of next check
+    """
+    return _keepAlive.checks()
+
+
+def restoreKeepAliveChecks(checks):
+    """ Resume the keep-alive checks scheduled before a restart
+
+        Args:
+            checks: dictionary of device id: time of next check
+    """
+    _keepAlive.restoreChecks(checks)
+
+
 def spinVolume(dev, values_dict):
-    """ Touch a file to keep the disk awaken
+    """ Touch a file to keep the disk awaken, when its keep-alive check is due and the disk has been idle
 
         Args:
             dev: current device
@@ -196,9 +873,27 @@ def spinVolume(dev, values_dict):
             values_dict updated with new data if success, equals to the input if not
         """
 
-    if dev.states['VStatus'] == 'on' and dev.pluginProps['keepAwaken']:
-        psvalue = shellscript.run(pscript=f"touch /Volumes/{pipes.quote(dev.pluginProps['VolumeID'])}/.spinner")
-        if psvalue is None:
+    if dev.states['VStatus'] != 'on' or not dev.pluginProps['keepAwaken']:
+        _keepAlive.forget(dev.id)
+        return True, values_dict
+
+    if not _keepAlive.isDue(dev.id):
+        return True, values_dict
+
+    host = deviceHost(dev)
+    if host is not None:
+        # the disk activity of a remote host is not known, the file is touched through its transport
+        spinner = pipes.quote(f"/Volumes/{dev.pluginProps['VolumeID']}/.spinner")
+        if shellscript.run(f"touch {spinner}", host=host) is None:
             return False, values_dict
         values_dict['LastPing'] = time.strftime('%c', time.localtime())
+        return True, values_dict
+
+    if _keepAlive.wasActive(dev.id, dev.states['VolumeDevice']):
+        core.logger(trace_log=f'volume {dev.pluginProps["VolumeID"]} was in use, no keep-alive needed')
+        return True, values_dict
+
+    if not _keepAlive.touch(f"{VOLUMES_DIR}/{dev.pluginProps['VolumeID']}/.spinner"):
+        return False, values_dict
+    values_dict['LastPing'] = time.strftime('%c', time.localtime())
     return True, values_dict
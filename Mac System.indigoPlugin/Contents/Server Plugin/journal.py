@@ -0,0 +1,231 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in process events journal
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    The starts, stops and status changes of the process devices are appended to a local SQLite database, so that
+    the history of a device can be queried ("how many times did this daemon restart last week?"):
+        events(at, device_id, device_name, event, pid, old_status, new_status, cpu, mem, exit_status)
+    The dialog thread only adds the events to a list; the list is handed once per cycle to a writer thread that
+    writes it in one transaction. The database is in WAL mode, so that queries run while it is written, and the
+    events older than the retention are deleted every hour.
+    Queries use the (device_id, at) index: they read the events of one device in the period, and the last one
+    before the period, never the whole journal.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+START = 'start'
+STOP = 'stop'
+STATE = 'state'
+# retention is applied at most once per this number of seconds
+_PURGE_INTERVAL = 3600
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS events ('
+    'at REAL NOT NULL, device_id INTEGER NOT NULL, device_name TEXT, event TEXT NOT NULL, pid INTEGER, '
+    'old_status TEXT, new_status TEXT, cpu REAL, mem REAL, exit_status INTEGER)',
+    'CREATE INDEX IF NOT EXISTS events_device ON events (device_id, at)',
+    'CREATE INDEX IF NOT EXISTS events_at ON events (at)'
+)
+_INSERT = 'INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+
+
+########################################
+def _number(value, default=0):
+    """ State value as a number """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+########################################
+class Journal:
+    """ Process events journal, written by its own thread """
+    def __init__(self, path: str = None, retention_days: float = 30):
+        """ Constructor
+
+            :param str path: database file, journal.sqlite in the plugin preferences folder if None
+            :param float retention_days: events older than this number of days are deleted
+        """
+        if path is None:
+            path = os.path.join(
+                indigo.server.getInstallFolderPath(), 'Preferences', 'Plugins', indigo.activePlugin.pluginId,
+                'journal.sqlite'
+            )
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._pending = []
+        self._queue = queue.Queue()
+        self._thread = None
+
+    @property
+    def running(self):
+        """ True if the writer thread is running """
+        return self._thread is not None
+
+    def start(self):
+        """ Create the database if needed and start the writer thread
+
+            :returns bool: True if started
+        """
+        if self.running:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            for statement in _SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+        except (OSError, sqlite3.Error) as err:
+            core.logger(err_log=f'events journal {self.path} cannot be used because {err}')
+            return False
+        self._thread = threading.Thread(target=self._write, args=(connection,), name='events journal', daemon=True)
+        self._thread.start()
+        core.logger(trace_log=f'events journal {self.path} started')
+        return True
+
+    def stop(self):
+        """ Write the pending events and stop the writer thread """
+        if not self.running:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(10)
+        self._thread = None
+
+    def processChanged(self, dev, previous: tuple, values_dict: dict):
+        """ Add the status change of a process device - nothing if the journal is not running
+
+            :param indigo.Device dev: the device
+            :param tuple previous: status, process id, cpu and memory usage before the change
+            :param dict values_dict: states just read
+        """
+        if not self.running:
+            return
+        (old_status, old_pid, old_cpu, old_mem) = previous
+        new_status = values_dict.get('PStatus', old_status)
+        if values_dict.get('onOffState') is False:
+            # usage at exit is the last one read while running
+            (event, pid, cpu, mem) = (STOP, old_pid, old_cpu, old_mem)
+        elif values_dict.get('onOffState') is True and old_status == 'off':
+            (event, pid, cpu, mem) = (START, values_dict.get('ProcessID'), 0, 0)
+        else:
+            (event, pid, cpu, mem) = (STATE, values_dict.get('ProcessID', old_pid), old_cpu, old_mem)
+        exit_status = values_dict.get('LastExitStatus')
+        with self._lock:
+            self._pending.append((
+                time.time(), dev.id, dev.name, event, int(_number(pid)), old_status, new_status,
+                _number(cpu), _number(mem), None if exit_status is None else int(exit_status)
+            ))
+
+    def flush(self):
+        """ Hand the events added since the last call to the writer thread - to be called once per cycle """
+        with self._lock:
+            (events, self._pending) = (self._pending, [])
+        if events and self.running:
+            self._queue.put(events)
+
+    def _write(self, connection):
+        """ Writer thread: one transaction per batch, and the retention """
+        last_purge = 0
+        while True:
+            events = self._queue.get()
+            if events is None:
+                break
+            try:
+                with connection:
+                    connection.executemany(_INSERT, events)
+                    if time.time() - last_purge >= _PURGE_INTERVAL:
+                        cursor = connection.execute(
+                            'DELETE FROM events WHERE at < ?', (time.time() - self.retention_days * 86400,)
+                        )
+                        last_purge = time.time()
+                        if cursor.rowcount > 0:
+                            core.logger(trace_log=f'{cursor.rowcount} events older than retention deleted')
+            except sqlite3.Error as err:
+                core.logger(err_log=f'{len(events)} events cannot be written in the journal because {err}')
+        connection.close()
+
+    def statistics(self, dev_id: int, days: float = 7, now: float = None):
+        """ Aggregates of the events of a device over a period
+
+            :param int dev_id: device id
+            :param float days: period, ending now, in days
+            :param float now: end of the period, now if None
+            :returns dict: starts, stops, state changes, uptime percentage of the known part of the period, last
+                           start and last stop times (0 if none) - None if the journal cannot be read
+        """
+        now = time.time() if now is None else now
+        since = now - days * 86400
+        try:
+            connection = sqlite3.connect(f'file:{self.path}?mode=ro', uri=True, timeout=5)
+            try:
+                before = connection.execute(
+                    'SELECT new_status FROM events WHERE device_id = ? AND at < ? ORDER BY at DESC LIMIT 1',
+                    (dev_id, since)
+                ).fetchone()
+                events = connection.execute(
+                    'SELECT at, event, new_status FROM events WHERE device_id = ? AND at >= ? AND at <= ? ORDER BY at',
+                    (dev_id, since, now)
+                ).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as err:
+            core.logger(err_log=f'events journal {self.path} cannot be read because {err}')
+            return None
+
+        stats = {'starts': 0, 'stops': 0, 'changes': 0, 'uptimePc': 0.0, 'lastStart': 0, 'lastStop': 0}
+        # running time over the part of the period the journal knows about
+        if before is not None:
+            (known_since, running) = (since, before[0] != 'off')
+        elif events:
+            (known_since, running) = (events[0][0], events[0][1] != START)
+        else:
+            return stats
+        (up_time, last_time) = (0.0, known_since)
+        for (at, event, new_status) in events:
+            if running:
+                up_time += at - last_time
+            last_time = at
+            running = new_status != 'off'
+            if event == START:
+                stats['starts'] += 1
+                stats['lastStart'] = at
+            elif event == STOP:
+                stats['stops'] += 1
+                stats['lastStop'] = at
+            else:
+                stats['changes'] += 1
+        if running:
+            up_time += now - last_time
+        if now > known_since:
+            stats['uptimePc'] = round(up_time * 100 / (now - known_since), 2)
+        return stats
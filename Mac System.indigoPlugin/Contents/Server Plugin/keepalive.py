@@ -0,0 +1,167 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in disks keep-alive scheduler
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    A disk goes to sleep after some idle time. Each kept-awake volume is checked twice per keep-alive interval,
+    at its own staggered time: if its disk did some input/output since the previous check it cannot be sleeping
+    and is left alone, otherwise a file is touched on the volume.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import re
+import sys
+import time
+from bipIndigoFramework import core, shellscript
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# partition name to whole disk name: disk4s2 -> disk4
+_repWholeDisk = re.compile(r"(disk[0-9]+)s[0-9]+$")
+# fraction of the golden ratio, spreads any number of volumes evenly over the interval
+_STAGGER = 0.6180339887
+# I/O counters are read once for all the volumes due at the same time
+_COUNTERS_TTL = 5
+
+
+########################################
+def read_io_counters():
+    """ Number of input/output operations done by each disk since boot
+
+        :returns dict: disk name -> number of operations, empty if unknown
+    """
+    counters = {}
+    if sys.platform == 'darwin':
+        iostat = shellscript.run(pscript='iostat -Id -n 64', cache_ttl=_COUNTERS_TTL, cache_tag='volume')
+        if iostat is None:
+            return counters
+        lines = iostat.split('\n')
+        if len(lines) < 3:
+            return counters
+        # disk names on the first line, then KB/t, transfers and MB for each disk
+        names = lines[0].split()
+        values = lines[2].split()
+        for index, name in enumerate(names):
+            try:
+                counters[name] = int(float(values[3 * index + 1]))
+            except (IndexError, ValueError):
+                break
+        return counters
+
+    try:
+        with open('/proc/diskstats') as diskstats_file:
+            for line in diskstats_file:
+                fields = line.split()
+                if len(fields) >= 8:
+                    # reads completed + writes completed
+                    counters[fields[2]] = int(fields[3]) + int(fields[7])
+    except OSError as err:
+        core.logger(err_log=f'cannot read disks activity because {err}')
+    return counters
+
+
+########################################
+class KeepAlive:
+    """ Per volume keep-alive checks """
+    def __init__(self, interval: int = 600):
+        """ Constructor
+
+            :param int interval: maximum time in seconds a kept-awake disk may stay idle
+        """
+        self.interval = interval
+        self._nextCheck = {}        # volume key -> time of next check
+        self._lastCounter = {}      # volume key -> disk operations at the previous check
+        self._counters = (0, {})    # (read time, disk counters)
+
+    def changeInterval(self, interval: int):
+        """ Change the interval - checks already scheduled are kept, they are closer than the new interval
+
+            :param int interval: interval in seconds
+        """
+        self.interval = interval
+
+    def forget(self, key):
+        """ Stop checking a volume
+
+            :param key: volume key
+        """
+        self._nextCheck.pop(key, None)
+        self._lastCounter.pop(key, None)
+
+    def checks(self):
+        """ Next check of each volume, to be kept across a restart
+
+            :returns dict: volume key -> time of next check
+        """
+        return dict(self._nextCheck)
+
+    def restoreChecks(self, checks: dict):
+        """ Resume the checks scheduled before a restart
+
+            :param dict checks: volume key -> time of next check
+        """
+        self._nextCheck.update(checks)
+
+    def isDue(self, key):
+        """ True if the volume has to be checked now - the first check of a volume is staggered with the others
+
+            :param key: volume key
+        """
+        now = time.time()
+        if key not in self._nextCheck:
+            offset = ((len(self._nextCheck) + 1) * _STAGGER) % 1
+            self._nextCheck[key] = now + offset * self.interval / 2
+            core.logger(trace_log=f'first keep-alive check of {key} in {int(offset * self.interval / 2)} seconds')
+        if now < self._nextCheck[key]:
+            return False
+        self._nextCheck[key] = now + self.interval / 2
+        return True
+
+    def wasActive(self, key, disk: str):
+        """ True if the disk did some input/output since the previous check of the volume
+
+            :param key: volume key
+            :param str disk: disk device name, as disk4s2 or sda1
+        """
+        if time.time() - self._counters[0] > _COUNTERS_TTL:
+            self._counters = (time.time(), read_io_counters())
+        counters = self._counters[1]
+        if disk not in counters:
+            match = _repWholeDisk.match(disk)
+            disk = match.group(1) if match else disk
+        counter = counters.get(disk)
+        previous = self._lastCounter.get(key)
+        self._lastCounter[key] = counter
+        return counter is not None and previous is not None and counter != previous
+
+    @staticmethod
+    def touch(path: str):
+        """ Update the access and modification times of a file, creating it if needed - without any process start
+
+            :param str path: file path
+            :returns bool: True if success
+        """
+        try:
+            with open(path, 'a'):
+                os.utime(path)
+        except OSError as err:
+            core.logger(err_log=f'cannot touch {path} because {err}')
+            return False
+        return True
@@ -0,0 +1,65 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in launchctl helper
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Stand-in for "launchctl list" on systems without launchd (Linux): every running process is listed as a job
+    which label is its name. Jobs of a fixture file given with -f (lines "pid status label", pid "-" when the job
+    is not running) are added, so that ended jobs and exit statuses can be tested.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import argparse
+import os
+import sys
+
+
+def main():
+    """ Print the jobs list in the launchctl list layout """
+    parser = argparse.ArgumentParser(description='launchctl list stand-in')
+    parser.add_argument('command', choices=['list'])
+    parser.add_argument('-f', dest='fixture', help='file of additional jobs')
+    args = parser.parse_args()
+
+    jobs = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/comm', 'rb') as comm_file:
+                label = comm_file.read().decode('utf-8', 'replace').strip()
+        except OSError:
+            # process ended meanwhile
+            continue
+        jobs.setdefault(label, (entry, '0'))
+
+    if args.fixture:
+        with open(args.fixture) as fixture_file:
+            for line in fixture_file:
+                fields = line.split(None, 2)
+                if len(fields) == 3:
+                    jobs[fields[2].strip()] = (fields[0], fields[1])
+
+    lines = ['PID\tStatus\tLabel']
+    lines.extend(f'{pid}\t{status}\t{label}' for label, (pid, status) in sorted(jobs.items()))
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in metrics endpoint
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    An optional HTTP server, bound to localhost, serves the latest states of the devices and the counters of the
+    plug-in:
+        /metrics        Prometheus text format
+        /metrics.json   JSON
+    The dialog thread gives the states it has just read, the server only reads this in-memory copy: a scrape never
+    runs a probe nor calls the Indigo server, and runs in its own threads.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+from bipIndigoFramework import core, osascript, shellscript
+
+DEFAULT_PORT = 9463
+_PREFIX = 'macsystem'
+
+
+########################################
+def _label(value):
+    """ Prometheus label value, escaped """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+########################################
+class Metrics:
+    """ Latest device states and plug-in counters, and the HTTP server publishing them """
+    def __init__(self):
+        """ Constructor """
+        self._lock = threading.Lock()
+        self._devices = {}          # device id -> (name, device type, states)
+        self._started = time.time()
+        self._cycles = 0
+        self._cycleTime = 0.0
+        self._lastCycleTime = 0.0
+        self._server = None
+        self._thread = None
+
+    def start(self, port: int = DEFAULT_PORT, host: str = '127.0.0.1'):
+        """ Start the HTTP server
+
+            :param int port: TCP port
+            :param str host: address to bind to, localhost only by default
+            :returns bool: True if started
+        """
+        self.stop()
+        metrics = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):  # noqa - http.server naming
+                # scrapers may add a query string
+                path = urllib.parse.urlsplit(self.path).path
+                if path == '/metrics':
+                    (body, content_type) = (metrics.prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+                elif path == '/metrics.json':
+                    (body, content_type) = (json.dumps(metrics.json(), default=str), 'application/json')
+                else:
+                    self.send_error(404)
+                    return
+                body = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, log_format, *args):
+                pass
+
+        try:
+            self._server = http.server.ThreadingHTTPServer((host, port), _Handler)
+        except OSError as err:
+            core.logger(err_log=f'metrics endpoint cannot be started on port {port} because {err}')
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics endpoint', daemon=True)
+        self._thread.start()
+        core.logger(msg_log=f'metrics endpoint on http://{host}:{port}/metrics')
+        return True
+
+    def stop(self):
+        """ Stop the HTTP server """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self._thread = None
+
+    def update(self, dev, values_dict: dict):
+        """ Record the states just read for a device - nothing if the server is not running
+
+            :param indigo.Device dev: the device, its states are copied the first time
+            :param dict values_dict: states names and values
+        """
+        if self._server is None:
+            return
+        with self._lock:
+            known = self._devices.get(dev.id)
+            states = dict(dev.states) if known is None else known[2]
+            states.update(values_dict)
+            self._devices[dev.id] = (dev.name, dev.deviceTypeId, states)
+
+    def forget(self, dev_id: int):
+        """ Forget a device which communication stopped
+
+            :param int dev_id: device id
+        """
+        with self._lock:
+            self._devices.pop(dev_id, None)
+
+    def cycleDone(self, duration: float):
+        """ Count one dialog cycle
+
+            :param float duration: time spent in the cycle, in seconds
+        """
+        with self._lock:
+            self._cycles += 1
+            self._cycleTime += duration
+            self._lastCycleTime = duration
+
+    def _copy(self):
+        """ Consistent copy of the devices and counters """
+        with self._lock:
+            devices = {
+                dev_id: (name, type_id, dict(states)) for dev_id, (name, type_id, states) in self._devices.items()
+            }
+            counters = {
+                'uptime_seconds': round(time.time() - self._started, 1),
+                'cycles_total': self._cycles,
+                'cycle_seconds_sum': round(self._cycleTime, 4),
+                'cycle_seconds_last': round(self._lastCycleTime, 4),
+                'shell_forks_total': shellscript.forkCount,
+                'applescript_forks_total': osascript.forkCount
+            }
+        return devices, counters
+
+    def json(self):
+        """ JSON view
+
+            :returns dict: plugin counters and devices states
+        """
+        (devices, counters) = self._copy()
+        return {
+            'plugin': counters,
+            'devices': [
+                {'id': dev_id, 'name': name, 'type': type_id, 'states': states}
+                for dev_id, (name, type_id, states) in devices.items()
+            ]
+        }
+
+    def prometheus(self):
+        """ Prometheus text view - numeric and boolean states only
+
+            :returns str: the exposition text
+        """
+        (devices, counters) = self._copy()
+        lines = []
+        for key, value in counters.items():
+            kind = 'counter' if key.endswith('_total') or key.endswith('_sum') else 'gauge'
+            lines.append(f'# TYPE {_PREFIX}_{key} {kind}')
+            lines.append(f'{_PREFIX}_{key} {value}')
+
+        lines.append(f'# TYPE {_PREFIX}_device_state gauge')
+        for dev_id, (name, type_id, states) in devices.items():
+            labels = f'id="{dev_id}",device="{_label(name)}",type="{_label(type_id)}"'
+            for state, value in states.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                elif not isinstance(value, (int, float)):
+                    continue
+                lines.append(f'{_PREFIX}_device_state{{{labels},state="{_label(state)}"}} {value}')
+        return '\n'.join(lines) + '\n'
@@ -81,12 +81,44 @@
     Rev 3.0.4 : XXXXX by DaveL17  202311 XX TODO: update date
                 - Fixes bug in applescript commands that used comments
                 - Fixes references to Indigo forums
+                - Identical probes of several devices share one shell execution per cycle
+                - Optional streaming process table source (one long-lived top sampler instead of ps forks)
+                - Pluggable process table sources, with native libproc (macOS) and /proc (Linux) readers
+                - Immediate detection of process exits (kqueue on macOS, pidfd on Linux)
+                - Periodic data read applies to all devices, not only the first one of the loop
+                - Immediate detection of volume mounts and unmounts by watching /Volumes
+                - Applescripts (quit, close windows) are compiled once instead of on every action
+                - Optional persistent applescript host instead of one osascript process per script
+                - Group actions: turn on, turn off or close windows of a list of devices in one dispatch
+                - Daemon stop command is run as a shell command
+                - Application devices aggregate cpu and memory of their child processes
+                - Cpu usage measured from cpu time deltas, with 1, 5 and 15 minutes averages and peak
+                - New top processes device: the processes using the most cpu and memory
+                - Daemon status can be read from launchd jobs instead of the process list
+                - Process start time is read once per process life, other data come from the process table
+                - Disk keep-alive is skipped when the disk is in use, staggered across volumes and done in-process
+                - Power settings read in one pmset command, new power settings device
+                - Scaling benchmark (tools/bench) with stand-in indigo module and system commands
+                - Optional record and replay of the commands output, parser benchmark on the recorded commands
+                - Warm restart: timers schedules, update requests and process start times are resumed after a restart
+                - Faster startup: one upgrade per device, no dumps if not debugging, probes read during device startup
+                - Optional metrics endpoint on localhost (Prometheus and JSON) serving the latest states
+                - Application, helper, daemon and volume devices can be on a remote Mac, through persistent ssh sessions
+                - New system device: load averages, memory pressure, swap and process count from one host snapshot
+                - Volume usage history (hour, day and week), fill rate and time to full prediction
+                - Events journal of the process devices (SQLite), with restart count and uptime statistics
+                - Probes of a cycle run concurrently by an asyncio engine, the cycle takes the time of the slowest one
 """
 ####################################################################################
 
+import concurrent.futures
 import pipes
+import time
 import interface
-from bipIndigoFramework import core, corethread, shellscript, osascript, relaydimmer
+import journal
+import metrics
+import statecache
+from bipIndigoFramework import asyncengine, core, corethread, shellscript, osascript, relaydimmer
 
 try:
     import indigo  # noqa
@@ -94,6 +126,11 @@ try:
 except ImportError:
     pass
 
+# number of shell commands run at the same time by a group action
+_GROUP_ACTION_WORKERS = 4
+# devices with an on/off state, the ones group actions apply to
+_RELAY_DEVICE_TYPES = ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon', 'bip.ms.volume')
+
 
 ################################################################################
 class Plugin(indigo.PluginBase):
@@ -125,18 +162,42 @@ class Plugin(indigo.PluginBase):
         core.debug_flags(self.pluginPrefs)
         # startup call
         core.logger(trace_log='startup called')
-        interface.init()
+        capture_mode = self.pluginPrefs.get('commandCapture', 'off')
+        interface.init(
+            self.pluginPrefs.get('processSource', 'ps'),
+            self.pluginPrefs.get('applescriptHost', False),
+            capture_mode=None if capture_mode == 'off' else capture_mode,
+            capture_path=self.pluginPrefs.get('captureFile', '').strip() or None
+        )
         corethread.init()
+        interface.pruneVolumeHistories(indigo.devices.iter('self'))
+        # first process table and volumes probes read while the devices are started
+        interface.prewarm()
+        # warm restart: resume from what was known when the plugin stopped
+        self.stateCache = statecache.StateCache()
+        if self.stateCache.load():
+            interface.restoreProcessStartTimes(self.stateCache.startTimes())
+            interface.restoreKeepAliveChecks(self.stateCache.keepAliveChecks())
+        # optional metrics endpoint
+        self.metrics = metrics.Metrics()
+        if self.pluginPrefs.get('metricsServer', False):
+            self.metrics.start(int(self.pluginPrefs.get('metricsPort', metrics.DEFAULT_PORT)))
+        # optional events journal
+        self.journal = journal.Journal(retention_days=float(self.pluginPrefs.get('journalDays', 30)))
+        if self.pluginPrefs.get('eventsJournal', True):
+            self.journal.start()
         core.dumppluginproperties()
 
         core.logger(trace_log='end of startup')
 
-    @staticmethod
-    def shutdown():
+    def shutdown(self):
         """ Plugin shut down """
         core.logger(trace_log='shutdown called')
         core.dumppluginproperties()
         # do some cleanup here
+        self.metrics.stop()
+        self.journal.stop()
+        interface.shutdown()
         core.logger(trace_log='end of shutdown')
 
     ######################
@@ -147,30 +208,57 @@ class Plugin(indigo.PluginBase):
         core.dumpdeviceproperties(dev)
         core.dumpdevicestates(dev)
 
-        # upgrade version if needed
+        # upgrade version if needed - properties and states gathered to be upgraded at once
+        u_dict = {}
+        u_states = []
         if dev.deviceTypeId == 'bip.ms.application':
-            u_dict = {
+            props = dev.pluginProps
+            u_dict.update({
                 'closeWindows': False,
                 'processSpecial': False,
-                'ApplicationProcessName': dev.pluginProps['ApplicationID'],
+                'ApplicationProcessName': props['ApplicationID'],
                 'windowcloseSpecial': False,
-                'directoryPath': (dev.pluginProps['ApplicationPathName'])[:-5-len(dev.pluginProps['ApplicationID'])],
-                'windowcloseScript': f'Tell application "{dev.pluginProps["ApplicationID"]}" to close every window',
-                'ApplicationStopPathName': f'Tell application "{dev.pluginProps["ApplicationID"]}" to quit',
-                'ApplicationStartPathName': 'open ' + pipes.quote(dev.pluginProps['ApplicationPathName'])
-            }
+                'directoryPath': (props['ApplicationPathName'])[:-5-len(props['ApplicationID'])],
+                'windowcloseScript': f'Tell application "{props["ApplicationID"]}" to close every window',
+                'ApplicationStopPathName': f'Tell application "{props["ApplicationID"]}" to quit',
+                'ApplicationStartPathName': 'open ' + pipes.quote(props['ApplicationPathName'])
+            })
+            u_states += ['TotalCpu', 'TotalRss', 'ChildCount']
+
+        if dev.deviceTypeId in ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon'):
+            u_states += ['PCpuAvg1', 'PCpuAvg5', 'PCpuAvg15', 'PCpuPeak']
+
+        if dev.deviceTypeId == 'bip.ms.daemon':
+            u_dict.update({'statusSource': 'ps', 'launchdLabel': ''})
+            u_states += ['LastExitStatus']
+
+        if dev.deviceTypeId in ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon', 'bip.ms.volume'):
+            u_dict.update({'host': ''})
+
+        if dev.deviceTypeId == 'bip.ms.volume':
+            u_states += ['FillRate', 'TimeToFull', 'FullDate']
+
+        if u_dict:
             core.upgradeDeviceProperties(dev, u_dict)
+        if u_states:
+            core.upgradeDeviceStates(dev, u_states)
 
         core.logger(trace_log=f'end of "{dev.name}" device_start_comm')
 
-    @staticmethod
-    def device_stop_comm(dev):
+    def device_stop_comm(self, dev):
         """ Device communication stopped """
         core.logger(trace_log=f'device_stop_comm called: {dev.name} ({dev.id:d} - {dev.deviceTypeId})')
+        self.metrics.forget(dev.id)
         core.dumpdeviceproperties(dev)
         core.dumpdevicestates(dev)
         core.logger(trace_log=f'end of "{dev.name}" device_stop_comm')
 
+    def device_deleted(self, dev):
+        """ Device deleted - replaces the default one, which only stops the device communication """
+        self.device_stop_comm(dev)
+        if dev.deviceTypeId == 'bip.ms.volume':
+            interface.deleteVolumeHistory(dev)
+
     ########################################
     # Update thread
     ########################################
@@ -178,14 +266,9 @@ class Plugin(indigo.PluginBase):
         """ """
         core.logger(trace_log='run_concurrent_thread initiated')
 
-        # init spinner timer
-        ps_value = int(self.pluginPrefs.get('disksleepTime', 0))
-
-        if ps_value > 0:
-            ps_value = (ps_value-1)*60
-        else:
-            ps_value = 600
-        next_disk_spin = corethread.DialogTimer('Next disk spin', ps_value)
+        # init keep-alive interval and power settings read timer
+        interface.setDiskSleepTime(int(self.pluginPrefs.get('disksleepTime', 0)))
+        read_power_settings = corethread.DialogTimer('Read power settings', 300)
 
         # init full data read timer for volumes
         read_volume_data = corethread.DialogTimer('Read volume data', 60)
@@ -193,29 +276,54 @@ class Plugin(indigo.PluginBase):
         # init full data read timer for applications
         read_application_data = corethread.DialogTimer('Read application data', 60, 30)
 
+        # refresh timers of the top processes and system devices, one per device
+        device_timers = {}
+
+        # resume the schedules and the update requests saved when the plugin stopped, save them periodically
+        timers = {
+            'power': read_power_settings,
+            'volume': read_volume_data,
+            'application': read_application_data
+        }
+        for key, timer in timers.items():
+            self.stateCache.restoreTimer(key, timer)
+        self.stateCache.restoreUpdateRequests(indigo.devices.iter('self'))
+        save_state_cache = corethread.DialogTimer('Save state cache', 300, 300)
+        save_state_cache.isTime()  # not on the first cycle
+
         # loop
         try:
             while True:
                 corethread.sleepWake()
 
-                # Test if time to spin
-                time_to_spin = next_disk_spin.isTime()
-                if time_to_spin:
-                    # get disk sleep value
-                    ps_value = shellscript.run(
-                        pscript="pmset -g | grep disksleep | sed -e s/[a-z]//g | sed -e 's/ //g'"
+                # Test if time to read the power settings again
+                time_to_read_power_settings = read_power_settings.isTime()
+                if time_to_read_power_settings:
+                    power_settings = interface.getPowerSettings(refresh=True)
+                    disk_sleep = power_settings.get('disksleep') if power_settings is not None else None
+                    if isinstance(disk_sleep, int):
+                        # set property and keep-alive interval if needed
+                        updates_dict = core.updatepluginprops({'disksleepTime': disk_sleep})
+                        if len(updates_dict) > 0:
+                            interface.setDiskSleepTime(disk_sleep)
+                    elif power_settings is not None:
+                        core.logger(err_log=f'unexpected disk sleep setting {disk_sleep}, keeping the previous one')
+
+                # timers are checked once for all the devices
+                time_to_read_application_data = read_application_data.isTime()
+                time_to_read_volume_data = read_volume_data.isTime()
+
+                # processes that ended and volumes mounted or unmounted since last loop
+                exited_pids = interface.processExits()
+                changed_volumes = interface.volumeChanges()
+                # probes of the cycle run concurrently, the devices then share their results
+                if self.pluginPrefs.get('concurrentProbes', True):
+                    interface.prefetchProbes(
+                        indigo.devices.iter('self'), exited_pids, time_to_read_application_data,
+                        time_to_read_volume_data or len(changed_volumes) > 0
                     )
-                    try:
-                        ps_value = int(ps_value)
-                    except ValueError:
-                        ps_value = 0
-                    # set property and timer if needed
-                    updates_dict = core.updatepluginprops({'disksleepTime': ps_value})
-                    if len(updates_dict) > 0:
-                        if ps_value > 0:
-                            next_disk_spin.changeInterval((ps_value-1) * 60)
-                        else:
-                            next_disk_spin.changeInterval(600)
+                # one cpu time sample of all the running processes of the devices
+                interface.sampleCpu(time_to_read_application_data)
 
                 for dev in indigo.devices.iter('self'):
                     values_dict = {}
@@ -226,10 +334,19 @@ class Plugin(indigo.PluginBase):
                     if ((dev.deviceTypeId in ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon')) and
                             dev.configured and
                             dev.enabled):
-                        # states
-                        (success, values_dict) = interface.getProcessStatus(dev, values_dict)
-                        # update
+                        # states - a running process with a watched exit needs no scan until the next data read,
+                        # so a change between running, idle, stopped or zombie shows at that read, an exit at once
+                        pid = int(dev.states['ProcessID'] or 0)
+                        if (pid in exited_pids or time_to_read_application_data or
+                                interface.deviceHost(dev) is not None or not interface.isProcessWatched(pid)):
+                            (success, values_dict) = interface.getProcessStatus(dev, values_dict)
+                        else:
+                            values_dict['ProcessID'] = dev.states['ProcessID']
+                        # update - the status change goes to the events journal
+                        previous = tuple(dev.states[key] for key in ('PStatus', 'ProcessID', 'PCpu', 'PMem'))
                         updates_dict = core.updatestates(dev, values_dict)
+                        if 'PStatus' in updates_dict:
+                            self.journal.processChanged(dev, previous, values_dict)
                         # special images
                         core.specialimage(
                             dev,
@@ -250,9 +367,10 @@ class Plugin(indigo.PluginBase):
                             if dev.pluginProps['closeWindows'] and (updates_dict['onOffState']):
                                 self.close_window_action(dev)
 
-                        time_to_read_application_data = read_application_data.isTime()
                         if time_to_read_application_data or corethread.isUpdateRequested(dev):
-                            (success, values_dict) = interface.getProcessData(values_dict)
+                            (success, values_dict) = interface.getProcessData(dev, values_dict)
+                            if dev.deviceTypeId == 'bip.ms.application':
+                                (success, values_dict) = interface.getProcessGroupData(dev, values_dict)
                             core.updatestates(dev, values_dict)
 
                     ##########
@@ -261,9 +379,8 @@ class Plugin(indigo.PluginBase):
                     elif dev.deviceTypeId == 'bip.ms.volume' and dev.configured and dev.enabled:
                         # states
                         (success, values_dict) = interface.getVolumeStatus(dev, values_dict)
-                        # spin if needed
-                        if time_to_spin:
-                            (success, values_dict) = interface.spinVolume(dev, values_dict)
+                        # spin if needed - each volume has its own keep-alive schedule
+                        (success, values_dict) = interface.spinVolume(dev, values_dict)
                         # update
                         updates_dict = core.updatestates(dev, values_dict)
                         # special images
@@ -274,20 +391,89 @@ class Plugin(indigo.PluginBase):
                         )
 
                         # do we need to read full data ?
-                        if 'onOffState' in updates_dict:
+                        if 'onOffState' in updates_dict or dev.pluginProps['VolumeID'] in changed_volumes:
                             corethread.setUpdateRequest(dev, 3)
 
-                        time_to_read_volume_data = read_volume_data.isTime()
                         if time_to_read_volume_data or corethread.isUpdateRequested(dev):
                             (success, values_dict) = interface.getVolumeData(dev, values_dict)
                             core.updatestates(dev, values_dict)
 
-                # wait
-                corethread.sleepNext(10)  # in seconds
+                    ##########
+                    # Power settings device
+                    ########################
+                    elif dev.deviceTypeId == 'bip.ms.power' and dev.configured and dev.enabled:
+                        if time_to_read_power_settings or corethread.isUpdateRequested(dev):
+                            (success, values_dict) = interface.getPowerStatus(values_dict)
+                            core.updatestates(dev, values_dict)
+
+                    ##########
+                    # Top processes device
+                    ########################
+                    elif dev.deviceTypeId == 'bip.ms.topprocesses' and dev.configured and dev.enabled:
+                        timer = self.device_timer(dev, device_timers, timers, f'top{dev.id}')
+                        if timer.isTime() or corethread.isUpdateRequested(dev):
+                            (success, values_dict) = interface.getTopProcesses(dev, values_dict)
+                            core.updatestates(dev, values_dict)
+
+                    ##########
+                    # System device
+                    ########################
+                    elif dev.deviceTypeId == 'bip.ms.system' and dev.configured and dev.enabled:
+                        timer = self.device_timer(dev, device_timers, timers, f'system{dev.id}')
+                        if timer.isTime() or corethread.isUpdateRequested(dev):
+                            (success, values_dict) = interface.getSystemStatus(values_dict)
+                            core.updatestates(dev, values_dict)
+
+                    # latest states for the metrics endpoint
+                    if values_dict:
+                        self.metrics.update(dev, values_dict)
+
+                if save_state_cache.isTime():
+                    self.save_state_cache(timers)
+                # events of the cycle written in one batch by the journal thread
+                self.journal.flush()
+                self.metrics.cycleDone(time.time() - self.wakeup)
+
+                # wait - process exits, mounts and unmounts end the wait
+                corethread.sleepNext(10, interface.wakeEvent())  # in seconds
         except self.StopThread:
             # do any cleanup here
+            self.save_state_cache(timers)
+            asyncengine.close()
             core.logger(trace_log='end of run_concurrent_thread')
 
+    def device_timer(self, dev, device_timers, timers, key):
+        """ Refresh timer of a device that has its own refresh interval, created the first time
+
+            Args:
+                dev: current device, with its refreshInterval property
+                device_timers: dictionary of device id: timer
+                timers: dictionary of the timers saved in the state cache
+                key: key of the timer in the state cache
+            Returns:
+                the timer, its interval following the device property
+        """
+        interval = int(dev.pluginProps.get('refreshInterval', 60))
+        timer = device_timers.get(dev.id)
+        if timer is None:
+            timer = corethread.DialogTimer(f'Refresh {dev.name}', interval)
+            device_timers[dev.id] = timer
+            timers[key] = timer
+            self.stateCache.restoreTimer(key, timer)
+        elif timer.interval != interval:
+            timer.changeInterval(interval)
+        return timer
+
+    def save_state_cache(self, timers):
+        """ Save what is known now, to resume from it on next start
+
+            Args:
+                timers: dictionary of key: dialog timer
+        """
+        self.stateCache.save(
+            timers, indigo.devices.iter('self'), interface.processStartTimes(), interface.keepAliveChecks()
+        )
+
     ########################################
     # Relay / Dimmer Action callback
     ######################
@@ -301,36 +487,203 @@ class Plugin(indigo.PluginBase):
             return
 
         if action_id == indigo.kDeviceGeneralAction.RequestStatus:
+            interface.invalidate(dev)
             corethread.setUpdateRequest(dev)
             return
 
+        # status update will be done by run_concurrent_thread
+        (kind, script) = self.host_command(dev, *self.action_command(dev, action_id))
+        if kind == 'shell':
+            shellscript.run(script, host=interface.deviceHost(dev))
+        elif kind == 'applescript':
+            osascript.run(script)
+
+        # the action makes the shared probes results obsolete
+        interface.invalidate(dev)
+
+    @staticmethod
+    def action_command(dev, action_id):
+        """ Command that does a turn on or turn off action
+
+            Args:
+                dev: current device
+                action_id: kDimmerRelayAction.TurnOn or kDimmerRelayAction.TurnOff
+            Returns:
+                ('shell', shell script) or ('applescript', applescript) or (None, None) if nothing to do
+        """
         ##########
         # Application device
         ########################
-        # status update will be done by run_concurrent_thread
         if dev.deviceTypeId in ('bip.ms.application', 'bip.ms.helper', 'bip.ms.daemon'):
             if action_id == indigo.kDimmerRelayAction.TurnOn:
-                shellscript.run(dev.pluginProps['ApplicationStartPathName'])
+                return 'shell', dev.pluginProps['ApplicationStartPathName']
 
-            elif action_id == indigo.kDimmerRelayAction.TurnOff:
+            if action_id == indigo.kDimmerRelayAction.TurnOff:
                 if dev.pluginProps['forceQuit']:
-                    shellscript.run(f"kill {dev.states['ProcessID']}")
-                else:
-                    osascript.run(f"{dev.pluginProps['ApplicationStopPathName']}")
+                    return 'shell', f"kill {dev.states['ProcessID']}"
+                if dev.deviceTypeId == 'bip.ms.application':
+                    return 'applescript', f"{dev.pluginProps['ApplicationStopPathName']}"
+                # daemon managers are shell commands
+                return 'shell', dev.pluginProps['ApplicationStopPathName']
 
         ##########
         # Volume device
         ########################
         elif dev.deviceTypeId == 'bip.ms.volume':
-            # status update will be done by run_concurrent_thread
+            # remote hosts are Macs
+            diskutil = interface.DISKUTIL if interface.deviceHost(dev) is None else '/usr/sbin/diskutil'
             if (action_id == indigo.kDimmerRelayAction.TurnOn) and (dev.states['VStatus'] == 'notmounted'):
-                shellscript.run(pscript=f"/usr/sbin/diskutil mount {dev.states['VolumeDevice']}")
+                return 'shell', f"{diskutil} mount {dev.states['VolumeDevice']}"
 
-            elif action_id == indigo.kDimmerRelayAction.TurnOff:
+            if action_id == indigo.kDimmerRelayAction.TurnOff:
                 if dev.pluginProps['forceQuit']:
-                    shellscript.run(pscript=f"/usr/sbin/diskutil umount force {dev.states['VolumeDevice']}")
+                    return 'shell', f"{diskutil} umount force {dev.states['VolumeDevice']}"
+                return 'shell', f"{diskutil} umount {dev.states['VolumeDevice']}"
+
+        return None, None
+
+    @staticmethod
+    def host_command(dev, kind, script):
+        """ Command of an action as run on the host of the device
+
+            Args:
+                dev: current device
+                kind: 'shell', 'applescript' or None
+                script: the script
+            Returns:
+                (kind, script), the applescripts of a remote device being run by osascript in a shell script
+        """
+        if kind == 'applescript' and interface.deviceHost(dev) is not None:
+            return 'shell', f"osascript -e {pipes.quote(script)}"
+        return kind, script
+
+    ########################################
+    # Group actions callbacks
+    ######################
+    def groupTurnOnCBM(self, action):
+        """ Turn on a list of devices """
+        return self.group_action(action, indigo.kDimmerRelayAction.TurnOn)
+
+    def groupTurnOffCBM(self, action):
+        """ Turn off a list of devices """
+        return self.group_action(action, indigo.kDimmerRelayAction.TurnOff)
+
+    def groupCloseWindowsCBM(self, action):
+        """ Close the windows of a list of applications """
+        return self.group_action(action, 'closeWindows')
+
+    def group_action(self, action, action_id):
+        """ Do one action on a list of devices in one dispatch:
+            all the applescripts are merged in one script, shell commands run concurrently
+
+            Args:
+                action: indigo action, with the list of devices ids in the 'devices' property
+                action_id: kDimmerRelayAction.TurnOn, kDimmerRelayAction.TurnOff or 'closeWindows'
+            Returns:
+                dictionary of devices ids (as strings) and True if the action succeeded
+        """
+        applescripts = {}
+        shellscripts = {}
+        results = {}
+
+        for dev_id in action.props.get('devices', []):
+            dev = indigo.devices[int(dev_id)]
+            if dev.deviceTypeId not in _RELAY_DEVICE_TYPES:
+                core.logger(err_log=f'device "{dev.name}" has no on/off state, group action ignored')
+                results[str(dev.id)] = False
+                continue
+            if action_id == 'closeWindows':
+                core.logger(trace_log=f'requesting device "{dev.name}" action closewindows')
+                (kind, script) = self.host_command(dev, 'applescript', dev.pluginProps['windowcloseScript'])
+            elif relaydimmer.check_action(dev, action_id) is None:
+                # already done
+                results[str(dev.id)] = True
+                continue
+            else:
+                (kind, script) = self.host_command(dev, *self.action_command(dev, action_id))
+
+            if kind == 'applescript':
+                applescripts[dev] = script
+            elif kind == 'shell':
+                shellscripts[dev] = script
+            else:
+                results[str(dev.id)] = True
+
+        # one applescript for all, each device script protected to get its own result
+        if len(applescripts) > 0:
+            merged_script = 'set bipResults to {}\n'
+            for script in applescripts.values():
+                merged_script += (
+                    'try\n' + script + '\nset end of bipResults to "ok"\n'
+                    'on error bipError\nset end of bipResults to bipError\nend try\n'
+                )
+            merged_script += 'set AppleScript\'s text item delimiters to "||"\nreturn bipResults as text'
+            osa_values = osascript.run(merged_script, [str(dev.id) for dev in applescripts])
+            for dev in applescripts:
+                if not osa_values or osa_values.get(str(dev.id)) != 'ok':
+                    error = osa_values.get(str(dev.id), 'script failed') if osa_values else 'script failed'
+                    core.logger(err_log=f'action on device "{dev.name}" failed because {error}')
+                    results[str(dev.id)] = False
                 else:
-                    shellscript.run(pscript=f"/usr/sbin/diskutil umount {dev.states['VolumeDevice']}")
+                    results[str(dev.id)] = True
+
+        # shell commands in parallel, with a bounded number of processes
+        if len(shellscripts) > 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=_GROUP_ACTION_WORKERS) as executor:
+                futures = {
+                    executor.submit(shellscript.run, script, host=interface.deviceHost(dev)): dev
+                    for dev, script in shellscripts.items()
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    results[str(futures[future].id)] = future.result() is not None
+
+        for dev in list(applescripts) + list(shellscripts):
+            interface.invalidate(dev)
+            corethread.setUpdateRequest(dev)
+
+        nb_failed = list(results.values()).count(False)
+        core.logger(msg_log=f'group action done on {len(results)} devices, {nb_failed} failed')
+        return results
+
+    ########################################
+    # Events journal callbacks
+    ######################
+    def deviceStatisticsCBM(self, action):
+        """ Statistics of a device from the events journal
+
+            Args:
+                action: indigo action, with the device id in the 'device' property and the period in 'days'
+            Returns:
+                dictionary of starts, stops, changes, uptimePc, lastStart and lastStop, or None if unknown
+        """
+        return self.device_statistics(int(action.props.get('device', 0)), float(action.props.get('days', 7)))
+
+    def deviceStatisticsMenu(self, values_dict, menu_item_id):
+        """ Statistics of a device menu item """
+        self.device_statistics(int(values_dict.get('device', 0)), float(values_dict.get('days', 7)))
+        return True
+
+    def device_statistics(self, dev_id, days):
+        """ Read and log the statistics of a device from the events journal
+
+            Args:
+                dev_id: device id
+                days: period, in days
+            Returns:
+                dictionary of starts, stops, changes, uptimePc, lastStart and lastStop, or None if unknown
+        """
+        if dev_id not in indigo.devices:
+            core.logger(err_log=f'no device {dev_id} for statistics')
+            return None
+        dev = indigo.devices[dev_id]
+        stats = self.journal.statistics(dev_id, days)
+        if stats is not None:
+            last_start = time.strftime('%c', time.localtime(stats['lastStart'])) if stats['lastStart'] else 'none'
+            core.logger(msg_log=(
+                f'"{dev.name}" over {days:g} days: {stats["starts"]} starts, {stats["stops"]} stops, '
+                f'up {stats["uptimePc"]} % of the time, last start {last_start}'
+            ))
+        return stats
 
     ########################################
     # other callbacks
@@ -339,11 +692,14 @@ class Plugin(indigo.PluginBase):
         """ Close window action item"""
         self.close_window_action(indigo.devices[action.deviceId])
 
-    @staticmethod
-    def close_window_action(dev):
+    def close_window_action(self, dev):
         """ Close window action """
         core.logger(trace_log=f'requesting device "{dev.name}" action closewindows')
-        osascript.run(f"{dev.pluginProps['windowcloseScript']}")
+        (kind, script) = self.host_command(dev, 'applescript', dev.pluginProps['windowcloseScript'])
+        if kind == 'shell':
+            shellscript.run(script, host=interface.deviceHost(dev))
+        else:
+            osascript.run(script)
 
     ########################################
     # Prefs UI methods (works with PluginConfig.xml):
@@ -357,6 +713,23 @@ class Plugin(indigo.PluginBase):
         # manage debug flag
         values_dict = core.debug_flags(values_dict)
 
+        # metrics endpoint port
+        if values_dict.get('metricsServer', False):
+            port = str(values_dict.get('metricsPort', '')).strip()
+            if not port.isdigit() or not 1024 <= int(port) <= 65535:
+                errors_dict = indigo.Dict()
+                errors_dict['metricsPort'] = 'The port must be a number between 1024 and 65535'
+                return False, values_dict, errors_dict
+
+        # events journal retention
+        try:
+            if float(values_dict.get('journalDays', 30)) <= 0:
+                raise ValueError
+        except ValueError:
+            errors_dict = indigo.Dict()
+            errors_dict['journalDays'] = 'The retention must be a number of days, more than 0'
+            return False, values_dict, errors_dict
+
         core.logger(trace_log='end of validating Prefs')
         return True, values_dict
 
@@ -366,6 +739,12 @@ class Plugin(indigo.PluginBase):
         core.logger(trace_log=f'validating Device Config called for: ({dev_id:d} - {type_id})')
         core.dumpdict(values_dict, 'input value dict %s is %s', level=core.MSG_STATES_DEBUG)
 
+        # previous scripts of the device, to forget their compiled form if they change
+        try:
+            old_props = indigo.devices[dev_id].pluginProps
+        except KeyError:
+            old_props = {}
+
         # applications and helpers
         if type_id in ('bip.ms.application', 'bip.ms.helper'):
             if (values_dict['ApplicationID'])[-4:] == '.app':
@@ -402,6 +781,11 @@ class Plugin(indigo.PluginBase):
                 f"{pipes.quote(values_dict['ApplicationPathName'])} {values_dict['ApplicationStartArgument']}"
             )
 
+            if values_dict.get('statusSource') == 'launchd' and len(values_dict.get('launchdLabel', '')) == 0:
+                errors_dict = indigo.Dict()
+                errors_dict['launchdLabel'] = 'The launchd job label is needed to read the status from launchd'
+                return False, values_dict, errors_dict
+
             if len(values_dict['ApplicationStopPathName']) == 0:
                 values_dict['forceQuit'] = True
             else:
@@ -410,6 +794,20 @@ class Plugin(indigo.PluginBase):
                     f"{pipes.quote(values_dict['ApplicationPathName'])} {values_dict['ApplicationStopArgument']}"
                 )
 
+        for key in ('ApplicationStopPathName', 'windowcloseScript'):
+            if key in old_props and old_props[key] != values_dict.get(key, old_props[key]):
+                osascript.invalidate(old_props[key])
+
+        # top processes and system
+        if type_id in ('bip.ms.topprocesses', 'bip.ms.system'):
+            try:
+                if int(values_dict['refreshInterval']) < 10:
+                    raise ValueError
+            except ValueError:
+                errors_dict = indigo.Dict()
+                errors_dict['refreshInterval'] = 'The refresh interval must be a number of seconds, 10 or more'
+                return False, values_dict, errors_dict
+
         core.dumpdict(values_dict, 'output value dict %s is %s', level=core.MSG_STATES_DEBUG)
         core.logger(trace_log='end of validating Device Config')
         return True, values_dict
@@ -0,0 +1,827 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in process sources
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import bisect
+import ctypes
+import ctypes.util
+import heapq
+import os
+import re
+import select
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from bipIndigoFramework import core, shellscript
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# one line of the process table - state is a ps state code, unknown values are None
+#   pcpu: % cpu, rss: resident memory in bytes, start: start time (epoch), cputime: user+system cpu time in seconds,
+#   ppid: parent process id
+Process = namedtuple(
+    'Process', ['pid', 'state', 'args', 'pcpu', 'rss', 'start', 'cputime', 'ppid'],
+    defaults=[None, None, None, None, None]
+)
+
+_repPsLine = re.compile(r" *([0-9]+) +([0-9]+) +(.)\S* +([0-9.,]+) +([0-9]+) +([0-9:.,-]+) +(.*)$")
+_repTopLine = re.compile(r" *([0-9]+) +([0-9]+) +(\S+) +([0-9.]+) +([0-9.]+)([BKMGT]?)\S* +([0-9:.]+) +(.*)$")
+
+# /proc state codes to ps state codes
+_procStateDict = {'D': 'U', 't': 'T', 'X': 'Z'}
+
+# top state names to ps state codes
+_topStateDict = {
+    'running': 'R',
+    'sleeping': 'S',
+    'idle': 'I',
+    'stopped': 'T',
+    'halted': 'T',
+    'stuck': 'U',
+    'zombie': 'Z'
+}
+_memUnitDict = {'': 1, 'B': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+# process table command of PsSource
+PS_COMMAND = "ps -awxc -opid,ppid,state,pcpu,rss,time,args"
+
+
+########################################
+class Snapshot:
+    """ Process table at a given time """
+    def __init__(self, processes: list, timestamp: float = None):
+        """ Constructor
+
+            :param list processes: list of Process
+            :param float timestamp: capture time, now if None
+        """
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.processes = processes
+        # all args in one text, so that a device search is a single regex scan
+        self._text = ''.join(f" {process.args}\n" for process in processes)
+        self._offsets = []
+        offset = 0
+        for process in processes:
+            self._offsets.append(offset)
+            offset += len(process.args) + 2
+        self._pids = None
+        self._children = None
+
+    def get(self, pid: int):
+        """ Process of a given pid
+
+            :param int pid: process id
+            :returns Process: the process or None if not running
+        """
+        if self._pids is None:
+            self._pids = {process.pid: process for process in self.processes}
+        return self._pids.get(pid)
+
+    def children(self, pid: int):
+        """ Child processes of a process - the parent to children index is built once per snapshot
+
+            :param int pid: process id
+            :returns list: list of Process
+        """
+        if self._children is None:
+            self._children = {}
+            for process in self.processes:
+                if process.ppid is not None and process.ppid != process.pid:
+                    self._children.setdefault(process.ppid, []).append(process)
+        return self._children.get(pid, [])
+
+    def descendants(self, pid: int):
+        """ All the processes started by a process, directly or not
+
+            :param int pid: process id
+            :returns list: list of Process
+        """
+        descendants = []
+        to_visit = [pid]
+        while to_visit:
+            for child in self.children(to_visit.pop()):
+                descendants.append(child)
+                to_visit.append(child.pid)
+        return descendants
+
+    def top(self, count: int, field: str):
+        """ Processes with the highest value of a field - bounded heap selection, the table is not sorted
+
+            :param int count: number of processes
+            :param str field: Process field, as 'pcpu' or 'rss'
+            :returns list: list of Process, highest first
+        """
+        return heapq.nlargest(count, self.processes, key=lambda process: getattr(process, field) or 0)
+
+    def find(self, pattern: str):
+        """ First process which args matches the pattern
+
+            :param str pattern: regular expression, searched on the args preceded by a space
+            :returns Process: the process found or None
+        """
+        match = re.search(pattern, self._text, re.MULTILINE)
+        if match is None:
+            return None
+        return self.processes[bisect.bisect_right(self._offsets, match.start()) - 1]
+
+
+########################################
+class ProcessSource:
+    """ Base of the process table sources
+
+        A source gives snapshots of the whole process table, and the details of one process. Details are computed
+        from the snapshot, except the start time which is read once per process life when the snapshot lacks it.
+    """
+    name = ''
+    _invalid = False
+
+    def __init__(self, ttl: float = 5):
+        """ Constructor
+
+            :param float ttl: time during which a snapshot is reused
+        """
+        self.ttl = ttl
+        self._snapshot = None
+        # pid -> (start time, start time as text), forgotten when the process leaves the process table
+        self._startTimes = {}
+        self._startTimesChecked = None
+
+    def start(self):
+        """ Start the source - nothing to do for a polled source """
+
+    def stop(self):
+        """ Stop the source - nothing to do for a polled source """
+
+    def invalidate(self):
+        """ Forget the last snapshot - it is still used to compute the cpu usage of the next one """
+        self._invalid = True
+
+    def needs_capture(self):
+        """ True if the next snapshot reads the process table again """
+        snapshot = self._snapshot
+        return snapshot is None or self._invalid or time.time() - snapshot.timestamp >= self.ttl
+
+    def snapshot(self):
+        """ Returns the current process table, captured at most once per ttl
+
+            :returns Snapshot: the snapshot, or None if the process table cannot be read
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and not self._invalid and time.time() - snapshot.timestamp < self.ttl:
+            return snapshot
+        processes = self._capture()
+        if processes is None:
+            return None
+        self._snapshot = Snapshot(_cpu_usage(processes, snapshot))
+        self._invalid = False
+        return self._snapshot
+
+    def _capture(self):
+        """ Read the process table - polled sources read it here, the others give their snapshots otherwise
+
+            :returns list: list of Process, or None if error
+        """
+        core.logger(err_log=f'process table source {self.name or type(self).__name__} cannot be read by polling')
+        return None
+
+    def total_memory(self):
+        """ Physical memory size in bytes, 0 if unknown """
+        return 0
+
+    def start_time(self, pid: int):
+        """ Start time of a process, for sources which snapshot does not give it
+
+            :param int pid: process id
+            :returns float: start time (epoch), or None if unknown
+        """
+        return None
+
+    def prefetch_start_times(self):
+        """ Read at once the start times of all the processes, for sources which snapshot does not give them """
+
+    def start_times(self):
+        """ Start times read so far, to be kept across a restart
+
+            :returns dict: pid -> (start time, start time as text)
+        """
+        return dict(self._startTimes)
+
+    def restore_start_times(self, start_times: dict):
+        """ Reuse start times read before a restart - the ones of ended processes are forgotten on next snapshot
+
+            :param dict start_times: pid -> (start time, start time as text)
+        """
+        self._startTimes.update(start_times)
+        self._startTimesChecked = None
+
+    def details(self, pid: int):
+        """ Detailed data of one process: the start time is kept for the process life, elapsed time is derived from
+            it, cpu and memory usage come from the snapshot
+
+            :param int pid: process id
+            :returns dict: LStart, PCpu, PMem and ETime (in seconds) states values,
+                           or {} if the process is not running, or None if error
+        """
+        snapshot = self.snapshot()
+        if snapshot is None:
+            return None
+
+        # forget the processes that ended, once per snapshot
+        if snapshot is not self._startTimesChecked:
+            for ended_pid in [cached for cached in self._startTimes if snapshot.get(cached) is None]:
+                del self._startTimes[ended_pid]
+            self._startTimesChecked = snapshot
+
+        process = snapshot.get(pid)
+        if process is None:
+            return {}
+
+        # a start time different from the cached one means the pid has been reused
+        cached = self._startTimes.get(pid)
+        if cached is None or (process.start is not None and process.start != cached[0]):
+            start = process.start if process.start is not None else self.start_time(pid)
+            if start is None:
+                return None
+            cached = (start, time.strftime('%a %b %e %H:%M:%S %Y', time.localtime(start)))
+            self._startTimes[pid] = cached
+
+        elapsed = max(time.time() - cached[0], 0)
+        if process.pcpu is not None:
+            pcpu = process.pcpu
+        elif process.cputime is not None and elapsed > 0:
+            pcpu = 100 * process.cputime / elapsed
+        else:
+            pcpu = 0
+        memory = self.total_memory()
+        return {
+            'LStart': cached[1],
+            'PCpu': round(pcpu, 1),
+            'PMem': round(100 * process.rss / memory, 1) if memory and process.rss is not None else 0,
+            'ETime': int(elapsed)
+        }
+
+
+########################################
+class PsSource(ProcessSource):
+    """ Process table read from the ps command """
+    name = 'ps'
+
+    def __init__(self, ttl: float = 5, host: str = None):
+        """ Constructor
+
+            :param float ttl: time during which a snapshot is reused
+            :param str host: host which process table is read, through shellscript transport, or None for this host
+        """
+        super().__init__(ttl)
+        self.host = host
+        self._memory = None
+        # pid -> start time as printed by ps, read for all the processes at once, and the time it was read
+        self._lstart = {}
+        self._lstartTime = 0
+
+    def _capture(self):
+        """ Read the process table from ps """
+        pstable = shellscript.run(PS_COMMAND, cache_ttl=self.ttl, cache_tag='process', host=self.host)
+        if pstable is None:
+            return None
+        return parse_ps_table(pstable)
+
+    def total_memory(self):
+        """ Physical memory size in bytes, read once """
+        if self._memory is None:
+            if self.host is None:
+                self._memory = _physical_memory()
+            else:
+                # remote hosts are Macs
+                memsize = shellscript.run(pscript='sysctl -n hw.memsize', host=self.host)
+                self._memory = int(memsize) if memsize and memsize.strip().isdigit() else 0
+        return self._memory
+
+    def prefetch_start_times(self):
+        """ Read the start times of all the processes in one ps, to be parsed when asked """
+        lstart = shellscript.run(pscript="ps -A -o pid=,lstart=", host=self.host)
+        if lstart is None:
+            return
+        self._lstart = {}
+        for line in lstart.split('\n'):
+            fields = line.split(None, 1)
+            if len(fields) == 2 and fields[0].isdigit():
+                self._lstart[int(fields[0])] = fields[1]
+        self._lstartTime = time.time()
+
+    def start_time(self, pid: int):
+        """ Start time of a process, read from ps - or from the prefetched ones if recent enough """
+        lstart = self._lstart.pop(pid, None)
+        if lstart is None or time.time() - self._lstartTime > 60:
+            lstart = shellscript.run(pscript=f"ps -o lstart= -p {pid}", host=self.host)
+        if not lstart:
+            return None
+        try:
+            return time.mktime(time.strptime(lstart.strip(), '%a %b %d %H:%M:%S %Y'))
+        except ValueError:
+            core.logger(err_log=f'unexpected process start time "{lstart.strip()}" for process {pid}')
+            return None
+
+
+########################################
+class ProcSource(ProcessSource):
+    """ Process table read from the /proc file system (Linux) - no fork at all """
+    name = 'proc'
+
+    def __init__(self, ttl: float = 5, root: str = '/proc'):
+        """ Constructor
+
+            :param float ttl: time during which a snapshot is reused
+            :param str root: mount point of the proc file system
+        """
+        super().__init__(ttl)
+        self.root = root
+        self._ticks = os.sysconf('SC_CLK_TCK')
+        self._page_size = os.sysconf('SC_PAGE_SIZE')
+        self._boot_time = 0
+        self._memory = 0
+        with open(f'{root}/stat', 'rb') as stat_file:
+            for line in stat_file:
+                if line.startswith(b'btime '):
+                    self._boot_time = int(line.split()[1])
+        with open(f'{root}/meminfo', 'rb') as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith(b'MemTotal:'):
+                    self._memory = int(line.split()[1]) * 1024
+
+    def total_memory(self):
+        """ Physical memory size in bytes """
+        return self._memory
+
+    def _capture(self):
+        """ Read the process table from /proc """
+        processes = []
+        for entry in os.listdir(self.root):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f'{self.root}/{entry}/stat', 'rb') as stat_file:
+                    stat = stat_file.read().decode('utf-8', 'replace')
+                name = stat[stat.index('(') + 1:stat.rindex(')')]
+                fields = stat[stat.rindex(')') + 2:].split()
+                if len(name) == 15:
+                    # the kernel truncates names - get the real one from the command line
+                    with open(f'{self.root}/{entry}/cmdline', 'rb') as cmdline_file:
+                        argv0 = cmdline_file.read().split(b'\0', 1)[0].decode('utf-8', 'replace')
+                    if argv0:
+                        name = os.path.basename(argv0)
+            except (OSError, ValueError):
+                # process ended meanwhile
+                continue
+            processes.append(
+                Process(
+                    int(entry),
+                    _procStateDict.get(fields[0], fields[0]),
+                    name,
+                    rss=int(fields[21]) * self._page_size,
+                    start=self._boot_time + int(fields[19]) / self._ticks,
+                    cputime=(int(fields[11]) + int(fields[12])) / self._ticks,
+                    ppid=int(fields[1])
+                )
+            )
+        return processes
+
+
+########################################
+class _ProcBsdInfo(ctypes.Structure):
+    """ struct proc_bsdinfo from sys/proc_info.h """
+    _fields_ = [
+        ('pbi_flags', ctypes.c_uint32),
+        ('pbi_status', ctypes.c_uint32),
+        ('pbi_xstatus', ctypes.c_uint32),
+        ('pbi_pid', ctypes.c_uint32),
+        ('pbi_ppid', ctypes.c_uint32),
+        ('pbi_uid', ctypes.c_uint32),
+        ('pbi_gid', ctypes.c_uint32),
+        ('pbi_ruid', ctypes.c_uint32),
+        ('pbi_rgid', ctypes.c_uint32),
+        ('pbi_svuid', ctypes.c_uint32),
+        ('pbi_svgid', ctypes.c_uint32),
+        ('rfu_1', ctypes.c_uint32),
+        ('pbi_comm', ctypes.c_char * 16),
+        ('pbi_name', ctypes.c_char * 32),
+        ('pbi_nfiles', ctypes.c_uint32),
+        ('pbi_pgid', ctypes.c_uint32),
+        ('pbi_pjobc', ctypes.c_uint32),
+        ('e_tdev', ctypes.c_uint32),
+        ('e_tpgid', ctypes.c_uint32),
+        ('pbi_nice', ctypes.c_int32),
+        ('pbi_start_tvsec', ctypes.c_uint64),
+        ('pbi_start_tvusec', ctypes.c_uint64)
+    ]
+
+
+class _ProcTaskInfo(ctypes.Structure):
+    """ struct proc_taskinfo from sys/proc_info.h """
+    _fields_ = [
+        ('pti_virtual_size', ctypes.c_uint64),
+        ('pti_resident_size', ctypes.c_uint64),
+        ('pti_total_user', ctypes.c_uint64),
+        ('pti_total_system', ctypes.c_uint64),
+        ('pti_threads_user', ctypes.c_uint64),
+        ('pti_threads_system', ctypes.c_uint64),
+        ('pti_policy', ctypes.c_int32),
+        ('pti_faults', ctypes.c_int32),
+        ('pti_pageins', ctypes.c_int32),
+        ('pti_cow_faults', ctypes.c_int32),
+        ('pti_messages_sent', ctypes.c_int32),
+        ('pti_messages_received', ctypes.c_int32),
+        ('pti_syscalls_mach', ctypes.c_int32),
+        ('pti_syscalls_unix', ctypes.c_int32),
+        ('pti_csw', ctypes.c_int32),
+        ('pti_threadnum', ctypes.c_int32),
+        ('pti_numrunning', ctypes.c_int32),
+        ('pti_priority', ctypes.c_int32)
+    ]
+
+
+class _ProcTaskAllInfo(ctypes.Structure):
+    """ struct proc_taskallinfo from sys/proc_info.h """
+    _fields_ = [('pbsd', _ProcBsdInfo), ('ptinfo', _ProcTaskInfo)]
+
+
+class _MachTimebaseInfo(ctypes.Structure):
+    """ struct mach_timebase_info from mach/mach_time.h """
+    _fields_ = [('numer', ctypes.c_uint32), ('denom', ctypes.c_uint32)]
+
+
+########################################
+class LibprocSource(ProcessSource):
+    """ Process table read through libproc and sysctl (macOS) - no fork at all
+
+        Task information (cpu, memory) of processes owned by other users is not readable without privileges:
+        these processes are reported with their state only.
+    """
+    name = 'libproc'
+
+    _PROC_PIDTASKALLINFO = 2
+    _PROC_PIDTBSDINFO = 3
+    # pbi_status values to ps state codes
+    _statusDict = {1: 'I', 2: 'R', 3: 'S', 4: 'T', 5: 'Z'}
+
+    def __init__(self, ttl: float = 5):
+        """ Constructor
+
+            :param float ttl: time during which a snapshot is reused
+        """
+        super().__init__(ttl)
+        self._libproc = ctypes.CDLL(ctypes.util.find_library('proc'), use_errno=True)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        # cpu times are given in mach absolute time units
+        timebase = _MachTimebaseInfo()
+        self._libc.mach_timebase_info(ctypes.byref(timebase))
+        self._time_unit = timebase.numer / timebase.denom / 1e9
+
+        memsize = ctypes.c_uint64(0)
+        size = ctypes.c_size_t(ctypes.sizeof(memsize))
+        self._libc.sysctlbyname(b'hw.memsize', ctypes.byref(memsize), ctypes.byref(size), None, 0)
+        self._memory = memsize.value
+
+    def total_memory(self):
+        """ Physical memory size in bytes """
+        return self._memory
+
+    def _capture(self):
+        """ Read the process table from libproc """
+        count = self._libproc.proc_listallpids(None, 0)
+        if count <= 0:
+            core.logger(err_log=f'libproc process list failed with error {ctypes.get_errno()}')
+            return None
+        # some margin for processes started meanwhile
+        pids = (ctypes.c_int * (count + 64))()
+        count = self._libproc.proc_listallpids(pids, ctypes.sizeof(pids))
+
+        processes = []
+        allinfo = _ProcTaskAllInfo()
+        bsdinfo = _ProcBsdInfo()
+        for pid in pids[:count]:
+            if self._libproc.proc_pidinfo(
+                    pid, self._PROC_PIDTASKALLINFO, 0, ctypes.byref(allinfo), ctypes.sizeof(allinfo)
+            ) == ctypes.sizeof(allinfo):
+                bsd = allinfo.pbsd
+                task = allinfo.ptinfo
+                state = self._statusDict.get(bsd.pbi_status, '')
+                if state == 'R' and task.pti_numrunning == 0:
+                    state = 'S'
+                rss = task.pti_resident_size
+                cputime = (task.pti_total_user + task.pti_total_system) * self._time_unit
+            elif self._libproc.proc_pidinfo(
+                    pid, self._PROC_PIDTBSDINFO, 0, ctypes.byref(bsdinfo), ctypes.sizeof(bsdinfo)
+            ) == ctypes.sizeof(bsdinfo):
+                bsd = bsdinfo
+                state = self._statusDict.get(bsd.pbi_status, '')
+                rss = None
+                cputime = None
+            else:
+                # process ended meanwhile
+                continue
+            processes.append(
+                Process(
+                    pid,
+                    state,
+                    (bsd.pbi_name or bsd.pbi_comm).decode('utf-8', 'replace'),
+                    rss=rss,
+                    start=bsd.pbi_start_tvsec + bsd.pbi_start_tvusec / 1e6,
+                    cputime=cputime,
+                    ppid=bsd.pbi_ppid
+                )
+            )
+        return processes
+
+
+########################################
+class StreamSource(ProcessSource):
+    """ Process table read continuously from a long-lived sampler process (top on macOS)
+
+        The sampler prints a table of processes every interval, each sample starting with a "Processes:" line.
+        Samples are parsed as they come out of the pipe, the polling thread only reads the latest one.
+    """
+    name = 'stream'
+
+    def __init__(self, interval: int = 5, command: list = None):
+        """ Constructor
+
+            :param int interval: sampling interval in seconds
+            :param list command: sampler command line, top or the stand-in sampler helper if None
+        """
+        self.interval = interval
+        if command is not None:
+            self.command = command
+        elif sys.platform == 'darwin':
+            self.command = ['top', '-l', '0', '-s', str(interval), '-stats', 'pid,ppid,state,cpu,mem,time,command']
+        else:
+            self.command = [
+                sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'samplerhelper.py'),
+                '-s', str(interval)
+            ]
+        super().__init__(interval)
+        self._fallback = PsSource()
+        self._proc = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """ Start the sampler and its reader thread """
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='process sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the sampler """
+        self._stopping.set()
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.terminate()
+        if self._thread is not None:
+            self._thread.join(2)
+
+    def invalidate(self):
+        """ Forget the last samples until the next one """
+        self._snapshot = None
+        self._fallback.invalidate()
+
+    def total_memory(self):
+        """ Physical memory size in bytes """
+        return self._fallback.total_memory()
+
+    def prefetch_start_times(self):
+        """ Read the start times of all the processes from ps """
+        self._fallback.prefetch_start_times()
+
+    def start_time(self, pid: int):
+        """ Start time of a process - samples have no start time, read it from ps """
+        return self._fallback.start_time(pid)
+
+    def snapshot(self):
+        """ Returns the latest sample - or a ps snapshot if the sampler is late or not running
+
+            :returns Snapshot: the snapshot, or None if the process table cannot be read
+        """
+        sample = self._snapshot
+        if sample is None or time.time() - sample.timestamp > 3 * self.interval:
+            core.logger(trace_log='no recent process sample, using ps')
+            return self._fallback.snapshot()
+        return sample
+
+    def _run(self):
+        """ Reader thread: (re)starts the sampler and parses its output """
+        backoff = 1
+        while not self._stopping.is_set():
+            started = time.time()
+            try:
+                core.logger(trace_log=f'starting process sampler {self.command[0]}')
+                self._proc = subprocess.Popen(
+                    self.command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, close_fds=True)
+                self._read(self._proc.stdout.fileno())
+                self._proc.stdout.close()
+                self._proc.wait()
+            except OSError as err:
+                core.logger(err_log=f'process sampler cannot be started because {err}')
+
+            if self._stopping.is_set():
+                break
+
+            # restart, more slowly if it keeps on dying
+            if time.time() - started > 60:
+                backoff = 1
+            core.logger(err_log=f'process sampler stopped, restarting in {backoff} seconds')
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _read(self, fd: int):
+        """ Parse the sampler output incrementally; a sample is complete when the next one starts or when the
+            sampler has been quiet for a while
+
+            :param int fd: file descriptor of the sampler output
+        """
+        pending = b''
+        rows = None
+        while not self._stopping.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.2)
+            if not ready:
+                if rows:
+                    self._publish(rows)
+                    rows = None
+                continue
+
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                break
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                line = line.decode('utf-8', 'replace')
+                if line.startswith('Processes:'):
+                    if rows:
+                        self._publish(rows)
+                    rows = None
+                elif line.lstrip().startswith('PID'):
+                    rows = []
+                elif rows is not None:
+                    process = parse_top_line(line)
+                    if process is not None:
+                        rows.append(process)
+
+    def _publish(self, rows: list):
+        """ Make a sample the latest snapshot
+
+            :param list rows: list of Process
+        """
+        self._snapshot = Snapshot(rows)
+        core.logger(trace_log=f'process sampler published {len(rows)} processes')
+
+
+########################################
+def _physical_memory():
+    """ Physical memory size in bytes, from sysctl on macOS and /proc/meminfo elsewhere
+
+        :returns int: size, 0 if unknown
+    """
+    if sys.platform == 'darwin':
+        memsize = shellscript.run(pscript='sysctl -n hw.memsize')
+        return int(memsize) if memsize and memsize.strip().isdigit() else 0
+    try:
+        with open('/proc/meminfo', 'rb') as meminfo_file:
+            for line in meminfo_file:
+                if line.startswith(b'MemTotal:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+########################################
+def cputime_seconds(text: str):
+    """ Convert a cpu or elapsed time as printed by ps and top ([dd-][hh:]mm:ss[.cc]) to seconds
+
+        :param str text: time as text
+        :returns float: seconds, or None if the text is not a time
+    """
+    (days, _, clock) = text.replace(',', '.').rpartition('-')
+    seconds = 0.0
+    try:
+        for part in clock.split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds + int(days or 0) * 86400
+    except ValueError:
+        return None
+
+
+########################################
+def parse_ps_table(text: str):
+    """ Parse the output of ps -awxc -opid,ppid,state,pcpu,rss,time,args
+
+        :param str text: ps output, header line included
+        :returns list: list of Process
+    """
+    processes = []
+    for line in text.split('\n')[1:]:
+        match = _repPsLine.match(line)
+        if match is not None:
+            processes.append(
+                Process(
+                    int(match.group(1)),
+                    match.group(3),
+                    match.group(7),
+                    pcpu=float(match.group(4).replace(',', '.')),
+                    rss=int(match.group(5)) * 1024,
+                    cputime=cputime_seconds(match.group(6)),
+                    ppid=int(match.group(2))
+                )
+            )
+    return processes
+
+
+########################################
+def parse_top_line(line: str):
+    """ Parse one process line of the top sampler
+
+        :param str line: line of the process list
+        :returns Process: the process, or None if the line is not a process line
+    """
+    match = _repTopLine.match(line)
+    if match is None:
+        return None
+    return Process(
+        int(match.group(1)),
+        _topStateDict.get(match.group(3), '?'),
+        match.group(8).rstrip(),
+        pcpu=float(match.group(4)),
+        rss=int(float(match.group(5)) * _memUnitDict[match.group(6)]),
+        cputime=cputime_seconds(match.group(7)),
+        ppid=int(match.group(2))
+    )
+
+
+########################################
+def _cpu_usage(processes: list, previous: Snapshot):
+    """ Set the cpu usage of processes for which the source only gives the cpu time: usage since the previous
+        snapshot, or since the process start if it is new
+
+        :param list processes: list of Process
+        :param Snapshot previous: previous snapshot, or None
+        :returns list: list of Process
+    """
+    now = time.time()
+    for index, process in enumerate(processes):
+        if process.pcpu is not None or process.cputime is None:
+            continue
+        before = previous.get(process.pid) if previous is not None else None
+        if before is not None and before.start == process.start and before.cputime is not None:
+            elapsed = now - previous.timestamp
+            cputime = process.cputime - before.cputime
+        else:
+            elapsed = now - process.start
+            cputime = process.cputime
+        processes[index] = process._replace(pcpu=round(100 * cputime / elapsed, 1) if elapsed > 0 else 0.0)
+    return processes
+
+
+########################################
+def get_source(name: str):
+    """ Create the process source from its name
+
+        :param str name: 'ps', 'stream', 'proc', 'libproc', or 'native' for the zero-fork source of the platform
+        :returns: the process source, ps if the name is unknown or the source is not available on this system
+    """
+    if name == 'native':
+        if sys.platform == 'darwin':
+            name = LibprocSource.name
+        elif os.path.isdir('/proc/self'):
+            name = ProcSource.name
+
+    try:
+        if name == StreamSource.name:
+            return StreamSource()
+        if name == ProcSource.name:
+            return ProcSource()
+        if name == LibprocSource.name:
+            return LibprocSource()
+    except (OSError, AttributeError, TypeError) as err:
+        core.logger(err_log=f'process source {name} is not available because {err}, using ps')
+    return PsSource()
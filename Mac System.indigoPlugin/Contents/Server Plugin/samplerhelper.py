@@ -0,0 +1,109 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in process sampler helper
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Stand-in for "top -l 0 -s N -stats pid,ppid,state,cpu,mem,time,command" on systems without macOS top (Linux):
+    prints the process table read from /proc every N seconds, in the same layout as top.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import argparse
+import os
+import sys
+import time
+
+# /proc states to top state names
+_procStateDict = {
+    'R': 'running',
+    'S': 'sleeping',
+    'I': 'idle',
+    'D': 'stuck',
+    'T': 'stopped',
+    't': 'stopped',
+    'Z': 'zombie'
+}
+
+_TICKS = os.sysconf('SC_CLK_TCK')
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def read_processes():
+    """ Read the process table from /proc
+
+        :returns dict: pid -> (state, cpu time in seconds, rss in bytes, command, parent pid)
+    """
+    processes = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'rb') as stat_file:
+                stat = stat_file.read().decode('utf-8', 'replace')
+        except OSError:
+            # process ended meanwhile
+            continue
+        command = stat[stat.index('(') + 1:stat.rindex(')')]
+        fields = stat[stat.rindex(')') + 2:].split()
+        processes[int(entry)] = (
+            fields[0],
+            (int(fields[11]) + int(fields[12])) / _TICKS,
+            int(fields[21]) * _PAGE_SIZE,
+            command,
+            int(fields[1])
+        )
+    return processes
+
+
+def main():
+    """ Print a sample every interval until killed """
+    parser = argparse.ArgumentParser(description='top-like process sampler')
+    parser.add_argument('-s', dest='interval', type=float, default=5, help='sampling interval in seconds')
+    parser.add_argument('-l', dest='samples', type=int, default=0, help='number of samples, 0 for infinite')
+    args = parser.parse_args()
+
+    previous = {}
+    previous_time = time.time()
+    count = 0
+    while True:
+        now = time.time()
+        processes = read_processes()
+        lines = [f'Processes: {len(processes)} total', '', 'PID    PPID   STATE    %CPU MEM    TIME     COMMAND']
+        for pid, (state, cpu_time, rss, command, ppid) in sorted(processes.items()):
+            if pid in previous and now > previous_time:
+                pcpu = 100 * (cpu_time - previous[pid][1]) / (now - previous_time)
+            else:
+                pcpu = 0.0
+            minutes, seconds = divmod(cpu_time, 60)
+            lines.append(
+                f'{pid:<6} {ppid:<6} {_procStateDict.get(state, "unknown"):<8} {pcpu:.1f} {rss // 1024}K '
+                f'{int(minutes):02d}:{seconds:05.2f} {command}'
+            )
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
+
+        previous, previous_time = processes, now
+        count += 1
+        if count == args.samples:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
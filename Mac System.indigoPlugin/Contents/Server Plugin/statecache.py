@@ -0,0 +1,161 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in warm restart state cache
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    What the plug-in knows at a given time is saved in a small JSON file, periodically and when it stops, and read
+    again when it starts, so that a restart resumes where the plug-in left:
+    - the next elapse of the dialog timers, instead of reading all the data of all the devices on the first cycle
+    - the pending update requests, and the states of the devices, a device which states changed while the plug-in
+      was stopped being updated on the first cycle
+    - the start time of the processes, instead of one ps per process - only if the host has not restarted since,
+      process ids being reused after a restart
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import json
+import os
+import time
+import hostinfo
+from bipIndigoFramework import core, corethread
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# format of the file, a file of another version is ignored
+VERSION = 1
+
+
+########################################
+class StateCache:
+    """ Plug-in state saved across restarts """
+    def __init__(self, path: str = None, max_age: float = 86400):
+        """ Constructor
+
+            :param str path: cache file, statecache.json in the plugin preferences folder if None
+            :param float max_age: a cache older than this number of seconds is ignored
+        """
+        if path is None:
+            path = os.path.join(
+                indigo.server.getInstallFolderPath(), 'Preferences', 'Plugins', indigo.activePlugin.pluginId,
+                'statecache.json'
+            )
+        self.path = path
+        self.max_age = max_age
+        self._boot = None
+        self._data = {}
+
+    def _boot_time(self):
+        """ Host boot time, read once """
+        if self._boot is None:
+            self._boot = hostinfo.boot_time()
+        return self._boot
+
+    def load(self):
+        """ Read the cache file
+
+            :returns bool: True if a usable cache has been read
+        """
+        self._data = {}
+        try:
+            with open(self.path) as cache_file:
+                data = json.load(cache_file)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as err:
+            core.logger(err_log=f'state cache {self.path} ignored because {err}')
+            return False
+
+        if data.get('version') != VERSION or time.time() - data.get('saved', 0) > self.max_age:
+            core.logger(trace_log='state cache too old, ignored')
+            return False
+        if data.get('boot') != self._boot_time():
+            core.logger(trace_log='host restarted since the state cache was saved, process data ignored')
+            data['startTimes'] = {}
+        self._data = data
+        core.logger(trace_log=f'state cache saved {time.time() - data["saved"]:.0f} seconds ago loaded')
+        return True
+
+    def startTimes(self):
+        """ Process start times
+
+            :returns dict: pid -> (start time, start time as text)
+        """
+        return {int(pid): tuple(value) for pid, value in self._data.get('startTimes', {}).items()}
+
+    def keepAliveChecks(self):
+        """ Next keep-alive check of the volumes
+
+            :returns dict: device id -> time of the next check
+        """
+        return {int(dev_id): due for dev_id, due in self._data.get('keepAlive', {}).items()}
+
+    def restoreTimer(self, key: str, timer: corethread.DialogTimer):
+        """ Resume the schedule of a dialog timer
+
+            :param str key: timer key, as in save
+            :param corethread.DialogTimer timer: the timer, just created
+        """
+        next_due = self._data.get('timers', {}).get(key)
+        if next_due is not None:
+            timer.restore(next_due)
+
+    def restoreUpdateRequests(self, devices):
+        """ Stack again the update requests pending when the cache was saved, and one for the devices which states
+            are not the saved ones
+
+            :param devices: iterable of the devices of the plug-in
+        """
+        requests = self._data.get('updateRequests', {})
+        states = self._data.get('states', {})
+        for dev in devices:
+            key = str(dev.id)
+            if key in requests:
+                corethread.setUpdateRequest(dev, requests[key])
+            elif key not in states or any(dev.states.get(name) != value for name, value in states[key].items()):
+                corethread.setUpdateRequest(dev)
+
+    def save(self, timers: dict, devices, start_times: dict, keep_alive_checks: dict):
+        """ Write the cache file - written aside then renamed, a stop while writing leaves the previous one
+
+            :param dict timers: key -> corethread.DialogTimer
+            :param devices: iterable of the devices of the plug-in
+            :param dict start_times: pid -> (start time, start time as text)
+            :param dict keep_alive_checks: device id -> time of the next check
+        """
+        requests = indigo.activePlugin._requestedUpdate  # noqa
+        data = {
+            'version': VERSION,
+            'saved': round(time.time(), 1),
+            'boot': self._boot_time(),
+            'timers': {key: round(timer.nextDue, 1) for key, timer in timers.items() if timer.nextDue is not None},
+            'updateRequests': {str(dev_id): count for dev_id, count in requests.items() if count > 0},
+            'states': {str(dev.id): dict(dev.states) for dev in devices},
+            'startTimes': {str(pid): value for pid, value in start_times.items()},
+            'keepAlive': {str(dev_id): round(due, 1) for dev_id, due in keep_alive_checks.items()}
+        }
+        temp_path = self.path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, 'w') as cache_file:
+                json.dump(data, cache_file, separators=(',', ':'), default=str)
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            core.logger(err_log=f'state cache cannot be saved in {self.path} because {err}')
+            return
+        core.logger(trace_log=f'state cache saved ({len(data["states"])} devices)')
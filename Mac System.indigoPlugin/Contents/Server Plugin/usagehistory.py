@@ -0,0 +1,252 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in volume usage history
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    The used bytes of each volume are kept in three ring buffers of averages, one per tier:
+        hour    60 slots of 1 minute
+        day     96 slots of 15 minutes
+        week    168 slots of 1 hour
+    so that the memory of a volume is the same whatever the uptime. The buffers live in a small file mapped in
+    memory, which is the history itself: nothing to load at start, nothing to save at stop.
+    A linear fit of the last day (or of the last hour if the day has too few points) gives the fill rate, and the
+    time left before the volume is full at this rate.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import mmap
+import os
+import re
+import struct
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# tier name, slot duration in seconds, number of slots
+TIERS = (('hour', 60, 60), ('day', 900, 96), ('week', 3600, 168))
+# least number of points of a fit
+MIN_FIT_POINTS = 3
+
+_MAGIC = b'BIPVUH01'
+# per tier: stored slots, next slot, current slot number, sum and count of the samples of the current slot
+_TIER_HEADER = struct.Struct('<qqqdq')
+# one slot: time (middle of the slot) and average used bytes
+_SLOT = struct.Struct('<dd')
+_repFileName = re.compile(r'volume-([0-9]+)\.bin$')
+
+
+########################################
+def default_folder():
+    """ History folder in the plugin preferences folder """
+    return os.path.join(
+        indigo.server.getInstallFolderPath(), 'Preferences', 'Plugins', indigo.activePlugin.pluginId, 'history'
+    )
+
+
+########################################
+def file_path(folder: str, dev_id: int):
+    """ History file of a volume device
+
+        :param str folder: history folder
+        :param int dev_id: device id
+        :returns str: file path
+    """
+    return os.path.join(folder, f'volume-{dev_id}.bin')
+
+
+########################################
+def prune(folder: str, dev_ids):
+    """ Delete the history files of the devices that no longer exist
+
+        :param str folder: history folder
+        :param dev_ids: ids of the existing volume devices
+        :returns int: number of files deleted
+    """
+    try:
+        names = os.listdir(folder)
+    except FileNotFoundError:
+        return 0
+    except OSError as err:
+        core.logger(err_log=f'volume history folder {folder} cannot be read because {err}')
+        return 0
+    dev_ids = set(dev_ids)
+    deleted = 0
+    for name in names:
+        match = _repFileName.match(name)
+        if match is not None and int(match.group(1)) not in dev_ids:
+            try:
+                os.remove(os.path.join(folder, name))
+                deleted += 1
+            except OSError as err:
+                core.logger(err_log=f'volume history {name} cannot be deleted because {err}')
+    if deleted > 0:
+        core.logger(trace_log=f'{deleted} volume histories of deleted devices removed')
+    return deleted
+
+
+########################################
+def _file_size():
+    """ Size of a history file """
+    return len(_MAGIC) + sum(_TIER_HEADER.size + slots * _SLOT.size for (_, _, slots) in TIERS)
+
+
+########################################
+def linear_fit(points: list):
+    """ Least squares line through points
+
+        :param list points: (x, y) tuples, at least 2 with different x
+        :returns tuple: (slope, intercept), or None if the line cannot be computed
+    """
+    count = len(points)
+    if count < 2:
+        return None
+    mean_x = sum(x for (x, _) in points) / count
+    mean_y = sum(y for (_, y) in points) / count
+    variance = sum((x - mean_x) ** 2 for (x, _) in points)
+    if variance == 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for (x, y) in points) / variance
+    return slope, mean_y - slope * mean_x
+
+
+########################################
+class UsageHistory:
+    """ Used bytes history of one volume, in a memory mapped file """
+    def __init__(self, path: str):
+        """ Constructor - the file is opened on first use
+
+            :param str path: history file, created if needed
+        """
+        self.path = path
+        self._file = None
+        self._map = None
+        # offset of the header and of the slots of each tier
+        self._offsets = []
+        offset = len(_MAGIC)
+        for (_, _, slots) in TIERS:
+            self._offsets.append((offset, offset + _TIER_HEADER.size))
+            offset += _TIER_HEADER.size + slots * _SLOT.size
+
+    def open(self):
+        """ Map the file, a new or unreadable file starting an empty history
+
+            :returns bool: True if the history can be used
+        """
+        if self._map is not None:
+            return True
+        size = _file_size()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._file = open(self.path, 'a+b')
+            if os.fstat(self._file.fileno()).st_size != size:
+                self._file.truncate(0)
+                self._file.truncate(size)
+            self._map = mmap.mmap(self._file.fileno(), size)
+        except (OSError, ValueError) as err:
+            core.logger(err_log=f'volume history {self.path} cannot be used because {err}')
+            self.close()
+            return False
+        if self._map[:len(_MAGIC)] != _MAGIC:
+            self._map[:] = bytes(size)
+            self._map[:len(_MAGIC)] = _MAGIC
+            core.logger(trace_log=f'new volume history {self.path}')
+        return True
+
+    def close(self):
+        """ Unmap and close the file """
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def delete(self):
+        """ Close and delete the file """
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as err:
+            core.logger(err_log=f'volume history {self.path} cannot be deleted because {err}')
+
+    def add(self, timestamp: float, used: float):
+        """ Add a sample to all the tiers - a slot gets the average of its samples when the next one starts
+
+            :param float timestamp: sample time
+            :param float used: used bytes
+        """
+        if not self.open():
+            return
+        for (tier, (_, period, slots)) in enumerate(TIERS):
+            (header, data) = self._offsets[tier]
+            (stored, following, current, total, count) = _TIER_HEADER.unpack_from(self._map, header)
+            slot = int(timestamp // period)
+            if count > 0 and slot != current:
+                _SLOT.pack_into(self._map, data + following * _SLOT.size, (current + 0.5) * period, total / count)
+                following = (following + 1) % slots
+                stored = min(stored + 1, slots)
+                (total, count) = (0.0, 0)
+            _TIER_HEADER.pack_into(self._map, header, stored, following, slot, total + used, count + 1)
+
+    def points(self, tier_name: str):
+        """ Points of a tier, oldest first, the current slot included
+
+            :param str tier_name: 'hour', 'day' or 'week'
+            :returns list: (time, average used bytes) tuples
+        """
+        if not self.open():
+            return []
+        tier = [name for (name, _, _) in TIERS].index(tier_name)
+        (_, period, slots) = TIERS[tier]
+        (header, data) = self._offsets[tier]
+        (stored, following, current, total, count) = _TIER_HEADER.unpack_from(self._map, header)
+        points = [
+            _SLOT.unpack_from(self._map, data + ((following - stored + index) % slots) * _SLOT.size)
+            for index in range(stored)
+        ]
+        if count > 0:
+            points.append(((current + 0.5) * period, total / count))
+        return points
+
+    def forecast(self, capacity: float, timestamp: float):
+        """ Fill rate and time left before the volume is full, from the last day or the last hour
+
+            :param float capacity: volume size in bytes
+            :param float timestamp: now
+            :returns tuple: (fill rate in bytes per hour, seconds before full or None if not filling), or None if
+                            there is not enough history
+        """
+        for tier_name in ('day', 'hour'):
+            period = [duration * slots for (name, duration, slots) in TIERS if name == tier_name][0]
+            points = [(x, y) for (x, y) in self.points(tier_name) if timestamp - x <= period]
+            if len(points) >= MIN_FIT_POINTS:
+                break
+        else:
+            return None
+
+        line = linear_fit(points)
+        if line is None:
+            return None
+        (slope, intercept) = line
+        if slope <= 0:
+            return slope * 3600, None
+        return slope * 3600, max((capacity - (slope * timestamp + intercept)) / slope, 0)
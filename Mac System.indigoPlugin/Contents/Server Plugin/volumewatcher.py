@@ -0,0 +1,208 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in mounted volumes watcher
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import ctypes
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from bipIndigoFramework import core
+
+try:
+    import indigo  # noqa
+except ImportError:
+    pass
+
+# inotify constants from sys/inotify.h
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_ONLYDIR = 0x01000000
+
+
+########################################
+class VolumeWatcher:
+    """ Keep the set of mounted volumes, i.e. the entries of the mount directory, up to date
+
+        The directory is watched with kqueue EVFILT_VNODE on macOS and inotify on Linux: mounts and unmounts are
+        reported as soon as they happen. The directory is read again every reconcile_interval seconds anyway, as a
+        safety net for missed events.
+    """
+    def __init__(self, mount_dir: str = '/Volumes', reconcile_interval: int = 300, event: threading.Event = None):
+        """ Constructor
+
+            :param str mount_dir: directory where the volumes are mounted
+            :param int reconcile_interval: seconds between two full reads of the directory
+            :param threading.Event event: event set on each change, a new one if None
+        """
+        self.mount_dir = mount_dir
+        self.reconcile_interval = reconcile_interval
+        self.event = threading.Event() if event is None else event
+        if hasattr(select, 'kqueue'):
+            self.method = 'kqueue'
+        elif sys.platform.startswith('linux'):
+            self.method = 'inotify'
+        else:
+            self.method = None
+
+        self._lock = threading.Lock()
+        self._volumes = None
+        self._changed = set()
+        self._thread = None
+        self._stopping = False
+        self._wakeup_read, self._wakeup_write = (None, None)
+
+    @property
+    def running(self):
+        """ True if the volumes set is maintained by the watcher """
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def volumes(self):
+        """ Names of the mounted volumes """
+        return self._volumes
+
+    def start(self):
+        """ Start the watcher thread """
+        if self.method is None:
+            core.logger(trace_log='mounted volumes watching is not supported on this system')
+            return
+        try:
+            watch_fd = self._open_watch()
+        except OSError as err:
+            core.logger(trace_log=f'{self.mount_dir} cannot be watched because {err}')
+            return
+
+        self._stopping = False
+        self._wakeup_read, self._wakeup_write = os.pipe()
+        self._volumes = self._list()
+        self._thread = threading.Thread(target=self._run, args=(watch_fd,), name='volume watcher', daemon=True)
+        self._thread.start()
+        core.logger(trace_log=f'volume watcher started on {self.mount_dir} using {self.method}')
+
+    def stop(self):
+        """ Stop the watcher thread """
+        if self._thread is None:
+            return
+        self._stopping = True
+        os.write(self._wakeup_write, b'x')
+        self._thread.join(2)
+        self._thread = None
+        os.close(self._wakeup_read)
+        os.close(self._wakeup_write)
+
+    def changed(self):
+        """ Volumes mounted or unmounted since the last call
+
+            :returns set: volumes names
+        """
+        with self._lock:
+            changed = self._changed
+            self._changed = set()
+        return changed
+
+    def _list(self):
+        """ Read the mount directory
+
+            :returns set: entries names
+        """
+        try:
+            return set(os.listdir(self.mount_dir))
+        except OSError as err:
+            core.logger(err_log=f'cannot read {self.mount_dir} because {err}')
+            return set()
+
+    def _reconcile(self):
+        """ Read the mount directory again and record the differences """
+        volumes = self._list()
+        with self._lock:
+            changed = volumes ^ self._volumes
+            self._volumes = volumes
+            self._changed |= changed
+        if len(changed) > 0:
+            core.logger(trace_log=f'volumes mounted or unmounted: {", ".join(sorted(changed))}')
+            self.event.set()
+
+    def _open_watch(self):
+        """ Create the kernel watch on the mount directory
+
+            :returns int: file descriptor to wait on
+        """
+        if self.method == 'kqueue':
+            self._dir_fd = os.open(self.mount_dir, getattr(os, 'O_EVTONLY', os.O_RDONLY))
+            kqueue = select.kqueue()
+            kqueue.control(
+                [select.kevent(
+                    self._dir_fd, select.KQ_FILTER_VNODE, select.KQ_EV_ADD | select.KQ_EV_CLEAR,
+                    select.KQ_NOTE_WRITE | select.KQ_NOTE_DELETE | select.KQ_NOTE_RENAME
+                )], 0
+            )
+            self._kqueue = kqueue
+            return kqueue.fileno()
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        inotify_fd = libc.inotify_init1(os.O_CLOEXEC)
+        if inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(
+                inotify_fd, os.fsencode(self.mount_dir),
+                _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE_SELF | _IN_ONLYDIR
+        ) < 0:
+            errno = ctypes.get_errno()
+            os.close(inotify_fd)
+            raise OSError(errno, f'inotify_add_watch failed on {self.mount_dir}')
+        return inotify_fd
+
+    def _run(self, watch_fd: int):
+        """ Watcher thread
+
+            :param int watch_fd: file descriptor of the kernel watch
+        """
+        next_reconcile = time.time() + self.reconcile_interval
+        try:
+            while not self._stopping:
+                ready, _, _ = select.select(
+                    [watch_fd, self._wakeup_read], [], [], max(next_reconcile - time.time(), 0)
+                )
+                if self._wakeup_read in ready:
+                    os.read(self._wakeup_read, 64)
+                if watch_fd in ready:
+                    # only the fact that something changed is needed
+                    if self.method == 'kqueue':
+                        self._kqueue.control(None, 16, 0)
+                    else:
+                        buffer = os.read(watch_fd, 4096)
+                        if len(buffer) >= 8 and struct.unpack_from('iI', buffer)[1] & _IN_DELETE_SELF:
+                            core.logger(err_log=f'{self.mount_dir} has been deleted, volume watcher stops')
+                            break
+                    self._reconcile()
+                elif time.time() >= next_reconcile:
+                    self._reconcile()
+                    next_reconcile = time.time() + self.reconcile_interval
+        finally:
+            if self.method == 'kqueue':
+                self._kqueue.close()
+                os.close(self._dir_fd)
+            else:
+                os.close(watch_fd)
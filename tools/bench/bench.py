@@ -0,0 +1,314 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in scaling benchmark
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Runs the plug-in dialog thread outside of Indigo, with the stand-in indigo module and fake system commands,
+    for scenarios of 10, 100 and 1000 devices (half applications, half volumes). Each scenario runs in its own
+    process so that its peak memory is its own.
+
+    The dialog loop runs back to back: each cycle stands for 10 seconds of plug-in life, dialog timers and shared
+    probe caches follow that virtual time.
+
+    Usage:
+        python3 tools/bench/bench.py                          run and print the results
+        python3 tools/bench/bench.py -o results.json          also save them
+        python3 tools/bench/bench.py -b baseline.json         compare with a previous run, exit code 1 on regression
+        python3 tools/bench/bench.py -r captures              also record the commands output for parsers.py
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(BENCH_DIR)), 'Mac System.indigoPlugin', 'Contents', 'Server Plugin'
+)
+SCENARIOS = (10, 100, 1000)
+# virtual seconds per dialog cycle, the plugin pace
+CYCLE_TIME = 10
+# compared metrics: name -> True if higher is worse
+COMPARED = {
+    'startup_ms': True,
+    'first_correct_state_ms': True,
+    'latency_p50': True,
+    'latency_p90': True,
+    'latency_p99': True,
+    'forks_per_cycle': True,
+    'server_calls_per_cycle': True,
+    'peak_rss_kb': True
+}
+
+
+########################################
+def percentile(values, fraction):
+    """ Nearest rank percentile
+
+        :param list values: measures
+        :param float fraction: 0.5 for the median
+        :returns float: the percentile
+    """
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+########################################
+def run_scenario(nb_devices, nb_cycles, sleep_scale, record_dir=None):
+    """ Run the dialog thread on one scenario - in the current process
+
+        :param int nb_devices: number of devices, half applications half volumes
+        :param int nb_cycles: number of dialog cycles measured
+        :param float sleep_scale: real sleep time of the plugin sleeps, as a fraction of the requested time
+        :param str record_dir: folder to record the commands output to, None not to record
+        :returns dict: measures
+    """
+    sys.path[:0] = [BENCH_DIR, PLUGIN_DIR]
+    import fixtures
+    import indigo
+
+    work_dir = tempfile.mkdtemp(prefix='bipbench')
+    fixtures_dir = os.path.join(work_dir, 'fixtures')
+    nb_applications = nb_devices // 2
+    nb_volumes = nb_devices - nb_applications
+    mount_dir = fixtures.write(fixtures_dir, nb_applications, nb_volumes)
+    os.environ['BENCH_FIXTURES'] = fixtures_dir
+    os.environ['PATH'] = os.path.join(BENCH_DIR, 'fakebin') + os.pathsep + os.environ['PATH']
+    indigo.installFolder = work_dir
+    indigo.sleepScale = sleep_scale
+
+    import plugin
+    import interface
+    from bipIndigoFramework import corethread, osascript, shellscript
+
+    interface.VOLUMES_DIR = mount_dir
+    interface.DISKUTIL = 'diskutil'
+    interface.DF = 'df'
+
+    # dialog timers on virtual time
+    clock = {'now': 0.0}
+    timers = []
+
+    class _NoTimer:
+        def cancel(self):
+            pass
+
+    def virtual_run(timer):
+        timer.timeElapsed = True
+        timer.nextDue = clock['now'] + (timer.initial_interval or timer.interval)
+        timer.initial_interval = 0
+        timer._timer = _NoTimer()
+        if timer not in timers:
+            timers.append(timer)
+
+    corethread.DialogTimer._run = virtual_run
+
+    # devices
+    devices_xml = os.path.join(PLUGIN_DIR, 'Devices.xml')
+    prefs = {'logLevel': '1', 'disksleepTime': 10}
+    if record_dir is not None:
+        prefs['commandCapture'] = 'record'
+        prefs['captureFile'] = os.path.join(os.path.abspath(record_dir), f'capture-{nb_devices}.jsonl.gz')
+    instance = plugin.Plugin('com.bip.ms', 'Mac System', 'bench', prefs)
+    for index in range(nb_applications):
+        props = {
+            'ApplicationID': fixtures.application_name(index), 'nameSpecial': False, 'directoryPath': '/Applications',
+            'processSpecial': False, 'windowcloseSpecial': False, 'closeWindows': False, 'forceQuit': False
+        }
+        (_, props) = instance.validate_device_config_ui(props, 'bip.ms.application', 1000 + index)
+        indigo.devices.add(indigo.device_from_definition(
+            devices_xml, 1000 + index, f'Application {index}', 'bip.ms.application', props
+        ))
+    for index in range(nb_volumes):
+        props = {'VolumeID': fixtures.volume_name(index), 'forceQuit': False, 'keepAwaken': True}
+        indigo.devices.add(indigo.device_from_definition(
+            devices_xml, 100000 + index, f'Volume {index}', 'bip.ms.volume', props
+        ))
+
+    # expected states, as written in the fixtures
+    expected = {1000 + index: index % fixtures.NOT_RUNNING != 0 for index in range(nb_applications)}
+    expected.update({100000 + index: True for index in range(nb_volumes)})
+
+    def states_correct():
+        return all(indigo.devices[dev_id].states['onOffState'] == state for dev_id, state in expected.items())
+
+    started = time.time()
+    instance.startup()
+    for dev in indigo.devices.iter('self'):
+        instance.device_start_comm(dev)
+    startup_time = time.time() - started
+
+    # stands for any process device when the process table has to be read again
+    process_device = indigo.Device(0, 'bench', 'bip.ms.application', {}, {}, None)
+
+    # one measure per cycle, taken when the dialog thread goes to sleep
+    cycles = []
+    counters = {}
+    correct = {}
+
+    def forks():
+        return shellscript.forkCount + osascript.forkCount
+
+    def snapshot_counters():
+        counters['forks'] = forks()
+        counters['calls'] = sum(indigo.serverCalls.values())
+        counters['sleep'] = indigo.sleepRequested
+
+    def end_of_cycle(sleep_time, wake_event=None):
+        cycles.append({
+            'latency': time.time() - indigo.activePlugin.wakeup,
+            'forks': forks() - counters['forks'],
+            'server_calls': sum(indigo.serverCalls.values()) - counters['calls'],
+            'sleep_requested': indigo.sleepRequested - counters['sleep']
+        })
+        if 'time' not in correct and states_correct():
+            correct['time'] = time.time() - started
+        if len(cycles) >= nb_cycles:
+            raise instance.StopThread()
+        # next cycle, CYCLE_TIME later: timers may be due, probes results are obsolete
+        clock['now'] += CYCLE_TIME
+        for timer in timers:
+            if clock['now'] >= timer.nextDue:
+                timer.timeElapsed = True
+                timer.nextDue += timer.interval
+        shellscript.invalidate()
+        interface.invalidate(process_device)
+        snapshot_counters()
+
+    corethread.sleepNext = end_of_cycle
+    snapshot_counters()
+    server_calls = dict(indigo.serverCalls)
+    instance.run_concurrent_thread()
+    instance.shutdown()
+
+    latencies = [cycle['latency'] * 1000 for cycle in cycles]
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'devices': nb_devices,
+        'cycles': len(cycles),
+        'startup_ms': round(startup_time * 1000, 2),
+        'startup_server_calls': sum(server_calls.values()),
+        'first_correct_state_ms': round(correct['time'] * 1000, 2) if 'time' in correct else None,
+        'first_cycle_ms': round(latencies[0], 2),
+        'latency_p50': round(percentile(latencies, 0.5), 2),
+        'latency_p90': round(percentile(latencies, 0.9), 2),
+        'latency_p99': round(percentile(latencies, 0.99), 2),
+        'latency_max': round(max(latencies), 2),
+        'forks_per_cycle': round(statistics.mean(cycle['forks'] for cycle in cycles), 2),
+        'server_calls_per_cycle': round(statistics.mean(cycle['server_calls'] for cycle in cycles), 2),
+        'sleep_requested_per_cycle': round(statistics.mean(cycle['sleep_requested'] for cycle in cycles), 2),
+        'server_calls': dict(indigo.serverCalls),
+        'errors': len(indigo.errors),
+        # kilobytes on Linux, bytes on macOS
+        'peak_rss_kb': rss // 1024 if sys.platform == 'darwin' else rss
+    }
+
+
+########################################
+def compare(results, baseline, tolerance):
+    """ Print the differences with a baseline
+
+        :param dict results: results of this run
+        :param dict baseline: results of a previous run
+        :param float tolerance: allowed increase, 0.2 for 20 %
+        :returns list: regressions found, as texts
+    """
+    regressions = []
+    for scenario, measures in results['scenarios'].items():
+        reference = baseline.get('scenarios', {}).get(scenario)
+        if reference is None:
+            print(f'{scenario} devices: not in the baseline')
+            continue
+        for metric, higher_is_worse in COMPARED.items():
+            (new, old) = (measures.get(metric), reference.get(metric))
+            if new is None or old is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            flag = ''
+            if (change if higher_is_worse else -change) > tolerance:
+                flag = '  <-- regression'
+                regressions.append(f'{scenario} devices {metric}: {old} -> {new}')
+            print(f'{scenario:>5} devices {metric:<24} {old:>12} -> {new:>12} ({change:+.0%}){flag}')
+    return regressions
+
+
+########################################
+def main():
+    """ Run the scenarios, each in its own process """
+    parser = argparse.ArgumentParser(description='macOS System plug-in scaling benchmark')
+    parser.add_argument('-d', '--devices', type=int, nargs='+', default=list(SCENARIOS), help='scenarios sizes')
+    parser.add_argument('-c', '--cycles', type=int, default=30, help='dialog cycles per scenario')
+    parser.add_argument('-s', '--sleep-scale', type=float, default=0.0,
+                        help='fraction of the plugin sleeps really slept, 0 to only count them')
+    parser.add_argument('-o', '--output', help='JSON file to save the results to')
+    parser.add_argument('-b', '--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2, help='allowed increase before regression')
+    parser.add_argument('-r', '--record', help='folder to record the commands output to, one file per scenario')
+    parser.add_argument('--scenario', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        # child process: one scenario, results on stdout
+        print(json.dumps(run_scenario(args.scenario, args.cycles, args.sleep_scale, args.record)))
+        return 0
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cycles': args.cycles,
+        'scenarios': {}
+    }
+    for nb_devices in args.devices:
+        command = [
+            sys.executable, os.path.abspath(__file__), '--scenario', str(nb_devices), '--cycles', str(args.cycles),
+            '--sleep-scale', str(args.sleep_scale)
+        ]
+        if args.record:
+            command += ['--record', args.record]
+        child = subprocess.run(command, stdout=subprocess.PIPE, check=True)
+        measures = json.loads(child.stdout.decode('utf-8').strip().splitlines()[-1])
+        results['scenarios'][str(nb_devices)] = measures
+        print(
+            f'{nb_devices:>5} devices: startup {measures["startup_ms"]} ms, first correct state '
+            f'{measures["first_correct_state_ms"]} ms, latency p50 {measures["latency_p50"]} ms p90 {measures["latency_p90"]} ms '
+            f'p99 {measures["latency_p99"]} ms, {measures["forks_per_cycle"]} forks/cycle, '
+            f'{measures["server_calls_per_cycle"]} server calls/cycle, peak RSS {measures["peak_rss_kb"]} KB'
+        )
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    Stand-in system commands for the macOS System plug-in benchmarks
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Usage: fakecommand.py <command> [arguments]
+    Prints the fixture of the command found in the $BENCH_FIXTURES folder, as written by fixtures.py.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import sys
+
+
+def fixture(name):
+    """ Content of a fixture file, '' if missing """
+    try:
+        with open(os.path.join(os.environ.get('BENCH_FIXTURES', '.'), name)) as fixture_file:
+            return fixture_file.read()
+    except FileNotFoundError:
+        return ''
+
+
+def main(command, args):
+    """ Print what the real command would print
+
+        :returns int: exit code
+    """
+    if command == 'ps':
+        if 'pid=,lstart=' in args:
+            # start time of all the processes
+            lstart = fixture('lstart.txt')
+            for line in fixture('ps.txt').split('\n')[1:]:
+                if line.strip():
+                    sys.stdout.write(f'{line.split()[0]:>5} {lstart}')
+        elif '-p' in args:
+            # start time of one process
+            sys.stdout.write(fixture('lstart.txt'))
+        else:
+            sys.stdout.write(fixture('ps.txt'))
+    elif command == 'diskutil':
+        if args[:1] == ['list']:
+            sys.stdout.write(fixture('diskutil.txt'))
+        else:
+            sys.stdout.write(f'Volume on {args[-1]} {args[0]}ed\n')
+    elif command == 'df':
+        sys.stdout.write(fixture('df.txt'))
+    elif command == 'pmset':
+        sys.stdout.write(fixture('pmset.txt'))
+    elif command == 'osacompile':
+        # osacompile -o output -e script
+        with open(args[args.index('-o') + 1], 'w') as compiled_file:
+            compiled_file.write(args[-1])
+    elif command == 'osascript':
+        sys.stdout.write('\n')
+    else:
+        sys.stderr.write(f'{command}: not a benchmark command\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1], sys.argv[2:]))
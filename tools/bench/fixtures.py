@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    Fixtures of the macOS System plug-in benchmarks
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Writes the outputs of ps, diskutil, df and pmset for a scenario, in the layouts of macOS, so that the fake
+    commands can print them.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import random
+
+# processes that are not devices, as on a usual Mac
+BACKGROUND_PROCESSES = 400
+# one application out of NOT_RUNNING is not running
+NOT_RUNNING = 5
+
+PMSET = """System-wide power settings:
+Currently in use:
+ standby              1
+ Sleep On Power Button 1
+ hibernatefile        /var/vm/sleepimage
+ powernap             1
+ networkoversleep     0
+ disksleep            10
+ sleep                0 (sleep prevented by coreaudiod, powerd)
+ hibernatemode        3
+ ttyskeepawake        1
+ displaysleep         10
+ tcpkeepalive         1
+ lowpowermode         0
+ womp                 1
+"""
+
+
+def application_name(index):
+    """ Name of the application of the index-th application device """
+    return f'App{index:04d}'
+
+
+def volume_name(index):
+    """ Name of the volume of the index-th volume device """
+    return f'Volume{index:04d}'
+
+
+def write(folder, applications, volumes, seed=0):
+    """ Write the fixtures of a scenario
+
+        :param str folder: fixtures folder, created if needed
+        :param int applications: number of application devices
+        :param int volumes: number of volume devices
+        :param int seed: random seed, the same seed gives the same fixtures
+        :returns str: folder of the mounted volumes
+    """
+    rand = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+
+    # process table: ps -awxc -opid,ppid,state,pcpu,rss,time,args
+    lines = ['  PID  PPID STAT  %CPU    RSS      TIME COMMAND']
+    pid = 100
+    for index in range(BACKGROUND_PROCESSES):
+        pid += rand.randint(1, 20)
+        lines.append(
+            f'{pid:5d} {1:5d} Ss   {rand.random() * 3:4.1f} {rand.randint(1000, 90000):6d} '
+            f'{rand.randint(0, 59):3d}:{rand.random() * 60:05.2f} daemon{index:04d}'
+        )
+    for index in range(applications):
+        pid += rand.randint(1, 20)
+        if index % NOT_RUNNING != 0:
+            lines.append(
+                f'{pid:5d} {1:5d} S    {rand.random() * 30:4.1f} {rand.randint(10000, 900000):6d} '
+                f'{rand.randint(0, 59):3d}:{rand.random() * 60:05.2f} {application_name(index)}'
+            )
+    with open(os.path.join(folder, 'ps.txt'), 'w') as fixture_file:
+        fixture_file.write('\n'.join(lines) + '\n')
+    with open(os.path.join(folder, 'lstart.txt'), 'w') as fixture_file:
+        fixture_file.write('Mon Oct 19 03:01:41 2026\n')
+
+    # diskutil list - type in columns 6-32, size in 57-67, device from 68
+    lines = ['/dev/disk0 (internal, physical):', '   #:                       TYPE NAME                    SIZE       IDENTIFIER']
+    for index in range(volumes):
+        lines.append(
+            f'{1:>5}:{"Apple_HFS":>26} {volume_name(index):<23}{"500.1 GB":>10} disk{index + 2}s1'
+        )
+    with open(os.path.join(folder, 'diskutil.txt'), 'w') as fixture_file:
+        fixture_file.write('\n'.join(lines) + '\n')
+
+    # df
+    lines = ['Filesystem    512-blocks      Used Available Capacity  Mounted on']
+    for index in range(volumes):
+        used = rand.randint(1000, 970000000)
+        lines.append(
+            f'/dev/disk{index + 2}s1  976490576 {used} {976490576 - used} 50% /Volumes/{volume_name(index)}'
+        )
+    with open(os.path.join(folder, 'df.txt'), 'w') as fixture_file:
+        fixture_file.write('\n'.join(lines) + '\n')
+
+    with open(os.path.join(folder, 'pmset.txt'), 'w') as fixture_file:
+        fixture_file.write(PMSET)
+
+    # mounted volumes
+    mount_dir = os.path.join(folder, 'Volumes')
+    for index in range(volumes):
+        os.makedirs(os.path.join(mount_dir, volume_name(index)), exist_ok=True)
+    return mount_dir
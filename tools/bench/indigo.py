@@ -0,0 +1,214 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    Stand-in indigo module for the macOS System plug-in benchmarks
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Just enough of the indigo server API for the plug-in to run outside of Indigo. Every call that would reach the
+    server is counted in serverCalls, every sleep request in sleepRequested. Sleeps are shortened by sleepScale.
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import collections
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+
+# measurements
+serverCalls = collections.Counter()
+sleepRequested = 0.0
+sleepScale = 0.0
+errors = []
+_countLock = threading.Lock()
+
+activePlugin = None
+installFolder = '/tmp'
+
+
+def _count(call):
+    """ Count one call to the server """
+    with _countLock:
+        serverCalls[call] += 1
+
+
+########################################
+class Dict(dict):
+    """ indigo.Dict """
+
+
+class List(list):
+    """ indigo.List """
+
+
+class _Enumeration:
+    """ Any attribute is its own name """
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return f'{self._name}.{attribute}'
+
+
+kStateImageSel = _Enumeration('kStateImageSel')
+kDimmerRelayAction = _Enumeration('kDimmerRelayAction')
+kDeviceGeneralAction = _Enumeration('kDeviceGeneralAction')
+
+
+########################################
+class Device:
+    """ indigo.Device """
+    def __init__(self, dev_id, name, device_type_id, plugin_props, states, display_state_id):
+        self.id = dev_id
+        self.name = name
+        self.deviceTypeId = device_type_id
+        self.pluginProps = Dict(plugin_props)
+        self.states = Dict(states)
+        self.displayStateId = display_state_id
+        self.configured = True
+        self.enabled = True
+
+    def updateStateOnServer(self, key, value):
+        _count('updateStateOnServer')
+        if key not in self.states:
+            raise KeyError(f'state {key} is not defined for device "{self.name}"')
+        self.states[key] = value
+
+    def updateStateImageOnServer(self, image):
+        _count('updateStateImageOnServer')
+
+    def replacePluginPropsOnServer(self, props):
+        _count('replacePluginPropsOnServer')
+        self.pluginProps = Dict(props)
+
+    def stateListOrDisplayStateIdChanged(self):
+        _count('stateListOrDisplayStateIdChanged')
+
+
+class _Devices:
+    """ indigo.devices """
+    def __init__(self):
+        self._devices = {}
+
+    def add(self, dev):
+        self._devices[dev.id] = dev
+
+    def clear(self):
+        self._devices.clear()
+
+    def iter(self, selector=None):
+        _count('devices.iter')
+        return iter(list(self._devices.values()))
+
+    def __getitem__(self, dev_id):
+        _count('devices[]')
+        return self._devices[int(dev_id)]
+
+    def __len__(self):
+        return len(self._devices)
+
+
+devices = _Devices()
+
+
+########################################
+class server:  # noqa - indigo.server is a module in Indigo
+    """ indigo.server """
+    @staticmethod
+    def log(message, *args, **kwargs):
+        _count('server.log')
+
+    @staticmethod
+    def getInstallFolderPath():
+        return installFolder
+
+
+########################################
+class PluginBase:
+    """ indigo.PluginBase """
+    class StopThread(Exception):
+        """ Raised by sleep when the plugin stops """
+
+    def __init__(self, plugin_id, plugin_display_name, plugin_version, plugin_prefs):
+        global activePlugin
+
+        self.pluginId = plugin_id
+        self.pluginDisplayName = plugin_display_name
+        self.pluginVersion = plugin_version
+        self.pluginPrefs = Dict(plugin_prefs)
+        activePlugin = self
+
+    def __del__(self):
+        pass
+
+    def sleep(self, seconds):
+        global sleepRequested
+
+        with _countLock:
+            sleepRequested += seconds
+        if sleepScale > 0:
+            time.sleep(seconds * sleepScale)
+
+    def debugLog(self, message):
+        _count('debugLog')
+
+    def errorLog(self, message):
+        _count('errorLog')
+        errors.append(message)
+        sys.stderr.write(f'plugin error: {message}\n')
+
+
+########################################
+def device_from_definition(devices_xml, dev_id, name, device_type_id, plugin_props):
+    """ Create a device with the states and default properties of its definition in Devices.xml
+
+        :param str devices_xml: path of Devices.xml
+        :param int dev_id: device id
+        :param str name: device name
+        :param str device_type_id: device type, as bip.ms.application
+        :param dict plugin_props: properties, added to the defaults
+        :returns Device: the device
+    """
+    for definition in ElementTree.parse(devices_xml).getroot():
+        if definition.get('id') == device_type_id:
+            break
+    else:
+        raise KeyError(f'device type {device_type_id} is not defined in {devices_xml}')
+
+    props = {}
+    for field in definition.iter('Field'):
+        default = field.get('defaultValue')
+        if field.get('type') == 'checkbox':
+            props[field.get('id')] = default == 'true'
+        elif default is not None:
+            props[field.get('id')] = default
+    props.update(plugin_props)
+
+    states = {}
+    for state in definition.iter('State'):
+        value_type = state.find('ValueType')
+        if value_type.text is not None and value_type.text.strip() == 'Number':
+            states[state.get('id')] = 0
+        elif value_type.text is not None and value_type.text.strip() == 'Boolean':
+            states[state.get('id')] = False
+        else:
+            states[state.get('id')] = ''
+    if definition.get('type') == 'relay':
+        states['onOffState'] = False
+        display_state_id = 'onOffState'
+    else:
+        display_state_id = definition.findtext('UiDisplayStateId')
+
+    return Device(dev_id, name, device_type_id, props, states, display_state_id)
@@ -0,0 +1,269 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in parsers benchmark
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Runs the parsers of the plug-in on the outputs of a capture file, as recorded by the plug-in (commands capture
+    option) or by bench.py -r, or on the benchmark fixtures. Each parser is timed on each recorded output, and a
+    digest of what it parsed is kept, so that a change of parser can be checked against a previous run on the same
+    corpus: same digest, and no slower than the tolerance.
+
+    Parsers and the commands whose outputs they get:
+        ps          ps -awxc ...            processes.parse_ps_table
+        diskutil    diskutil list           interface.parseDiskList, each volume of the output
+        df          df                      interface.parseDiskFree, each device of the output
+        pmset       pmset -g                hostinfo.parse_settings
+        launchctl   launchctl list          interface.parseLaunchdJobs
+        hostmem     sysctl ...; vm_stat     hostinfo.parse_host_memory
+
+    Usage:
+        python3 tools/bench/parsers.py capture.jsonl.gz           run on a capture file
+        python3 tools/bench/parsers.py -f 1000                    run on the fixtures of 1000 devices
+        python3 tools/bench/parsers.py -f 1000 -o results.json    also save the results
+        python3 tools/bench/parsers.py -f 1000 -b baseline.json   compare with a previous run, exit code 1 on regression
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import re
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(BENCH_DIR)), 'Mac System.indigoPlugin', 'Contents', 'Server Plugin'
+)
+sys.path[:0] = [BENCH_DIR, PLUGIN_DIR]
+
+import fixtures  # noqa: E402
+import indigo  # noqa: E402
+import hostinfo  # noqa: E402
+import interface  # noqa: E402
+import processes  # noqa: E402
+from bipIndigoFramework import capture  # noqa: E402
+
+# volume lines of diskutil list, the name being in the same columns as the type
+_repDiskListVolume = re.compile(r"^ +[0-9]+:")
+_repDiskFreeDevice = re.compile(r"^/dev/(\S+)", re.MULTILINE)
+
+
+########################################
+def parse_ps(text):
+    """ Processes of a ps output """
+    return processes.parse_ps_table(text)
+
+
+def parse_diskutil(text):
+    """ Each volume of a diskutil list output, searched as the volume devices do """
+    volumes = [line[33:56].strip() for line in text.split('\n') if _repDiskListVolume.match(line)]
+    return [interface.parseDiskList(text, volume) for volume in volumes if volume]
+
+
+def parse_df(text):
+    """ Each device of a df output, searched as the volume devices do """
+    return [interface.parseDiskFree(text, device) for device in _repDiskFreeDevice.findall(text)]
+
+
+def parse_pmset(text):
+    """ Power settings of a pmset -g output """
+    return hostinfo.parse_settings(text)[0]
+
+
+def parse_launchctl(text):
+    """ Jobs of a launchctl list output """
+    return interface.parseLaunchdJobs(text)
+
+
+def parse_hostmem(text):
+    """ Memory and swap of a host metrics output """
+    return hostinfo.parse_host_memory(text)
+
+
+# parser name -> (test of the command, parser)
+PARSERS = {
+    'ps': (lambda command: command.startswith('ps -awxc'), parse_ps),
+    'diskutil': (lambda command: command.endswith('diskutil list'), parse_diskutil),
+    'df': (lambda command: command.endswith('df'), parse_df),
+    'pmset': (lambda command: command.startswith('pmset -g'), parse_pmset),
+    'launchctl': (lambda command: command.endswith('launchctl list'), parse_launchctl),
+    'hostmem': (lambda command: command == hostinfo.HOST_METRICS_COMMAND, parse_hostmem)
+}
+
+
+########################################
+def parser_of(command):
+    """ Parser of the output of a command
+
+        :param str command: recorded command
+        :returns str: parser name, or None if no parser is benchmarked for this command
+    """
+    for name, (test, _) in PARSERS.items():
+        if test(command):
+            return name
+    return None
+
+
+########################################
+def fixtures_corpus(nb_devices):
+    """ Records made of the benchmark fixtures, as if the plugin had run once with nb_devices devices
+
+        :param int nb_devices: number of devices, half applications half volumes
+        :returns list: records
+    """
+    folder = os.path.join(tempfile.mkdtemp(prefix='bipparsers'), 'fixtures')
+    fixtures.write(folder, nb_devices // 2, nb_devices - nb_devices // 2)
+    records = []
+    for command, name in (
+        ('ps -awxc -opid,ppid,state,pcpu,rss,time,args', 'ps.txt'),
+        ('/usr/sbin/diskutil list', 'diskutil.txt'),
+        ('/bin/df', 'df.txt'),
+        ('pmset -g', 'pmset.txt')
+    ):
+        with open(os.path.join(folder, name)) as fixture_file:
+            records.append({'k': 'shell', 'c': command, 'o': fixture_file.read(), 'e': '', 't': 0.0})
+    return records
+
+
+########################################
+def run(records, repeat):
+    """ Time the parsers on the records
+
+        :param list records: capture records
+        :param int repeat: runs of each parser on each output, the best one is kept
+        :returns dict: parser name -> measures
+    """
+    results = {}
+    for record in records:
+        if record['k'] != 'shell':
+            continue
+        name = parser_of(record['c'])
+        if name is None:
+            continue
+        parser = PARSERS[name][1]
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parsed = parser(record['o'])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        measures = results.setdefault(name, {'outputs': 0, 'bytes': 0, 'items': 0, 'seconds': 0.0, 'digest': ''})
+        measures['outputs'] += 1
+        measures['bytes'] += len(record['o'])
+        measures['items'] += len(parsed)
+        measures['seconds'] += best
+        measures['digest'] = hashlib.sha1(
+            (measures['digest'] + repr(parsed)).encode('utf-8', 'surrogateescape')
+        ).hexdigest()
+
+    for measures in results.values():
+        measures['us_per_output'] = round(measures['seconds'] * 1e6 / measures['outputs'], 1)
+        measures['mb_per_s'] = round(measures['bytes'] / measures['seconds'] / 1e6, 2) if measures['seconds'] else 0
+        measures['seconds'] = round(measures['seconds'], 6)
+    return results
+
+
+########################################
+def compare(results, baseline, tolerance):
+    """ Print the differences with a baseline
+
+        :param dict results: results of this run
+        :param dict baseline: results of a previous run
+        :param float tolerance: allowed slow down, 0.2 for 20 %
+        :returns list: regressions found, as texts
+    """
+    same_corpus = results['corpus'] == baseline.get('corpus')
+    if not same_corpus:
+        print('not the same corpus as the baseline, parsed data are not compared')
+    regressions = []
+    for name, measures in results['parsers'].items():
+        reference = baseline.get('parsers', {}).get(name)
+        if reference is None:
+            print(f'{name}: not in the baseline')
+            continue
+        if same_corpus and measures['digest'] != reference['digest']:
+            regressions.append(f'{name}: parsed data changed ({reference["items"]} -> {measures["items"]} items)')
+            print(f'{name:<10} parsed data changed  <-- regression')
+        (new, old) = (measures['us_per_output'], reference['us_per_output'])
+        change = (new - old) / old if old else 0.0
+        flag = ''
+        if change > tolerance:
+            flag = '  <-- regression'
+            regressions.append(f'{name}: {old} -> {new} us per output')
+        print(f'{name:<10} {old:>12} -> {new:>12} us per output ({change:+.0%}){flag}')
+    return regressions
+
+
+########################################
+def main():
+    """ Run the parsers on a corpus """
+    parser = argparse.ArgumentParser(description='macOS System plug-in parsers benchmark')
+    parser.add_argument('capture', nargs='*', help='capture files')
+    parser.add_argument('-f', '--fixtures', type=int, help='use the fixtures of this number of devices')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='runs of each parser, the best one is kept')
+    parser.add_argument('-o', '--output', help='JSON file to save the results to')
+    parser.add_argument('-b', '--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2, help='allowed slow down before regression')
+    args = parser.parse_args()
+
+    # the framework logs through the active plugin
+    indigo.PluginBase('com.bip.ms', 'Mac System', 'parsers', {}).logLevel = 0
+    records = []
+    for path in args.capture:
+        records.extend(capture.load(path))
+    if args.fixtures:
+        records.extend(fixtures_corpus(args.fixtures))
+    if not records:
+        parser.error('no capture file and no fixtures')
+
+    corpus = hashlib.sha1()
+    for record in records:
+        corpus.update(record['c'].encode('utf-8', 'surrogateescape'))
+        corpus.update(record['o'].encode('utf-8', 'surrogateescape'))
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'records': len(records),
+        'corpus': corpus.hexdigest(),
+        'parsers': run(records, args.repeat)
+    }
+    for name, measures in results['parsers'].items():
+        print(
+            f'{name:<10} {measures["outputs"]:>5} outputs {measures["bytes"]:>10} bytes {measures["items"]:>8} items '
+            f'{measures["us_per_output"]:>12} us/output {measures["mb_per_s"]:>8} MB/s'
+        )
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} regressions')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
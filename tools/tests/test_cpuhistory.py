@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+####################################################################################
+"""
+    macOS System plug-in cpu usage history tests
+    By Bernard Philippe (bip.philippe) (C) 2015
+
+    Usage:
+        python3 -m unittest discover tools/tests
+
+    This program is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+    License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any
+    later version.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+    warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+    details.
+
+    You should have received a copy of the GNU General Public License along with this program; if not, write to the
+    Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.#
+"""
+####################################################################################
+
+import os
+import sys
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(TESTS_DIR)), 'Mac System.indigoPlugin', 'Contents', 'Server Plugin'
+)
+sys.path[:0] = [os.path.join(os.path.dirname(TESTS_DIR), 'bench'), PLUGIN_DIR]
+
+import cpuhistory  # noqa: E402
+import processes  # noqa: E402
+
+PID = 100
+START = 1000.0
+
+
+########################################
+def _usage_at(spacings: list, load: float):
+    """ Usage figures after samples of a process running at a constant load
+
+        :param list spacings: seconds between two samples
+        :param float load: cpu seconds per wall clock second
+        :returns dict: usage figures after the last sample
+    """
+    history = cpuhistory.CpuHistory()
+    history.track(PID)
+    now = START
+    for spacing in [0] + spacings:
+        now += spacing
+        process = processes.Process(PID, 'R', 'daemon', 0.0, 0, START, (now - START) * load)
+        history.update(processes.Snapshot([process], now))
+    return history.usage(PID)
+
+
+########################################
+class CpuHistoryTest(unittest.TestCase):
+    """ Windows averages of the cpu history """
+    def test_dialog_pace(self):
+        usage = _usage_at([10] * 100, 0.5)
+        for key in ('PCpu', 'PCpuAvg1', 'PCpuAvg5', 'PCpuAvg15', 'PCpuPeak'):
+            self.assertEqual(usage[key], 50.0, key)
+
+    def test_spacing_over_one_minute(self):
+        # the data read pace of the ps source
+        for spacing in (60, 60.5, 90):
+            usage = _usage_at([spacing] * 20, 0.5)
+            for key in ('PCpu', 'PCpuAvg1', 'PCpuAvg5', 'PCpuAvg15', 'PCpuPeak'):
+                self.assertEqual(usage[key], 50.0, f'{key} at {spacing} s')
+
+    def test_gap_over_all_windows(self):
+        # one sample after a long sleep closes every window with the same older sample
+        usage = _usage_at([10] * 10 + [1000], 0.25)
+        for key in ('PCpu', 'PCpuAvg1', 'PCpuAvg5', 'PCpuAvg15'):
+            self.assertEqual(usage[key], 25.0, key)
+
+    def test_windows_after_gap(self):
+        # a 400 s busy gap ending 30 s ago closes both the 1 and 5 minutes windows on the sample after it
+        history = cpuhistory.CpuHistory()
+        history.track(PID)
+        cputime = 0.0
+        now = START
+        for (spacing, load) in [(0, 0.0), (400, 1.0)] + [(10, 0.0)] * 3:
+            now += spacing
+            cputime += spacing * load
+            history.update(processes.Snapshot([processes.Process(PID, 'R', 'daemon', 0.0, 0, START, cputime)], now))
+        usage = history.usage(PID)
+        self.assertEqual(usage['PCpu'], 0.0)
+        self.assertEqual(usage['PCpuAvg1'], 0.0)
+        self.assertEqual(usage['PCpuAvg5'], 0.0)
+        self.assertEqual(usage['PCpuAvg15'], round(400 * 100 / 430, 1))
+        self.assertEqual(usage['PCpuPeak'], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()